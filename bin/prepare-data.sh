@@ -3,21 +3,30 @@ if [[ "${TEST_HOST}x" == "x" ]]; then
     exit 1
 fi
 
-if [ ! -f "./gemini" ]; then
-    echo "downloading gemini"
-    wget https://github.com/scylladb/gemini/releases/download/v1.7.2/gemini_1.7.2_Linux_x86_64.tar.gz -O gemini.tar.gz
-    tar xzf gemini.tar.gz
-    rm gemini.tar.gz
+SEED=${POPULATE_SEED:-$RANDOM}
+TABLES=${POPULATE_TABLES:-8}
+ROWS=${POPULATE_ROWS:-100000}
+PROCESSES=${POPULATE_PROCESSES:-4}
+# keyspace is dropped first so that schema and data match the seed, an existing schema of another seed
+# would be kept by CREATE ... IF NOT EXISTS; POPULATE_KEEP_SCHEMA=1 keeps it e.g. to add rows of the same seed
+EXTRA_FLAGS="--drop" # "--drop --replication-factor 3"
+if [[ "${POPULATE_KEEP_SCHEMA}" == "1" ]]; then
+    EXTRA_FLAGS=""
 fi
 
-echo "starting gemini on ${TEST_HOST}"
-
-DURATION=1m
-CQL_FEATURES=basic
-EXTRA_FLAGS="" # "--use-counters --use-lwt"
-SEED=$RANDOM
-
-./gemini --test-cluster=$TEST_HOST --mode=write --fail-fast --cql-features=$CQL_FEATURES --max-tables 8 --duration $DURATION --level warn --seed $SEED --drop-schema $EXTRA_FLAGS --concurrency 2
+if [[ "${POPULATE_ENGINE}" == "gemini" ]]; then
+    if [ ! -f "./gemini" ]; then
+        echo "downloading gemini"
+        wget https://github.com/scylladb/gemini/releases/download/v1.7.2/gemini_1.7.2_Linux_x86_64.tar.gz -O gemini.tar.gz
+        tar xzf gemini.tar.gz
+        rm gemini.tar.gz
+    fi
+    echo "starting gemini on ${TEST_HOST}"
+    ./gemini --test-cluster=$TEST_HOST --mode=write --fail-fast --cql-features=basic --max-tables $TABLES --duration 1m --level warn --seed $SEED --drop-schema --concurrency 2
+else
+    echo "populating ${TEST_HOST} with seed ${SEED}"
+    python -m test.common.cql.populate --seed $SEED --tables $TABLES --rows $ROWS --processes $PROCESSES $EXTRA_FLAGS
+fi
 TEST_RESULT=$?
 
 if [[ $TEST_RESULT -eq 0 ]]; then
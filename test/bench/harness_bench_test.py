@@ -0,0 +1,242 @@
+import gc
+import json
+import tracemalloc
+
+import pytest
+
+from test.common.config.bench_config import BenchConfig
+from test.common.cql.statements import prepared_statements
+from test.common.fake.fixtures import *
+from test.common.fake.stargate import FakeStargate
+from test.common.rest.row_stream import CHUNK_SIZE, RowStream
+from test.common.test.objects import select_tables_for_test, some_table_data_with_keys
+from test.common.test.row_compare import RowComparator
+from test.common.test.corpus import CorpusWriter, read_corpus
+from test.common.test.range_digest import DigestReconciler
+from test.common.test.replay import ReplayComparator
+from test.common.test.schema_index import table_schema
+from test.common.test.table_scan import TableScanComparator, rest_table_scan
+from test.common.test.write_fuzz import WriteFuzzer
+
+pytest.importorskip('pytest_benchmark')
+
+
+class TestHarnessBenchmarks:
+    """
+    Harness performance measured against offline stand-in of Stargate (no cluster needed), e.g.
+        pytest test/bench --benchmark-autosave
+        pytest test/bench --benchmark-compare
+    to track rows compared per second, memory per sampled row and startup time across commits.
+    """
+
+    def _sample(self, cql_session, n):
+        return [(ks, table, list(some_table_data_with_keys(cql_session, ks, table, n, seed=1)))
+                for ks, table in select_tables_for_test(cql_session, skip_system=True)]
+
+    def test_rows_compared_per_second(self, benchmark, offline_stargate):
+        """
+        REST and CQL requests and comparison of sampled rows, end to end
+        """
+        cql_session = offline_stargate.cql_session()
+        rest_v1 = offline_stargate.rest_v1()
+        samples = self._sample(cql_session, BenchConfig().sample_size)
+        n_rows = sum(len(data) for _, _, data in samples)
+
+        def compare_all():
+            comparator = RowComparator(cql_session, rest_v1)
+            return [m for ks, table, data in samples for m in comparator.compare_rows_by_pk(ks, table, data)]
+
+        mismatches = benchmark(compare_all)
+        assert not mismatches, '\n\n'.join(mismatches)
+        _record_rows_per_second(benchmark, n_rows)
+
+    def test_rows_compared_per_second_rest_v2(self, benchmark, offline_stargate):
+        """
+        Same as test_rows_compared_per_second with keys looked up in batches by REST V2 `where` queries
+        """
+        cql_session = offline_stargate.cql_session()
+        rest_v2 = offline_stargate.rest_v2()
+        samples = self._sample(cql_session, BenchConfig().sample_size)
+        n_rows = sum(len(data) for _, _, data in samples)
+
+        def compare_all():
+            comparator = RowComparator(cql_session, rest_v2)
+            return [m for ks, table, data in samples for m in comparator.compare_rows_by_pk(ks, table, data)]
+
+        mismatches = benchmark(compare_all)
+        assert not mismatches, '\n\n'.join(mismatches)
+        _record_rows_per_second(benchmark, n_rows)
+
+    def test_comparison_rows_per_second(self, benchmark, offline_stargate):
+        """
+        Only comparison of already fetched rows, i.e. CPU spent in checks
+        """
+        cql_session = offline_stargate.cql_session()
+        rest_v1 = offline_stargate.rest_v1()
+        comparator = RowComparator(cql_session, rest_v1)
+        pairs = []
+        for ks, table, data in self._sample(cql_session, BenchConfig().sample_size):
+            schema = table_schema(cql_session, ks, table)
+            for row, key_columns in data:
+                key = [row[c] for c in key_columns]
+                statement = prepared_statements(cql_session).select_by_key(ks, table, key_columns)
+                cql_rows = cql_session.execute(statement, key).all()
+                rest_rows = rest_v1.get_table_rows_by_pk(ks, table, schema.rest_key_values(row, key_columns))
+                pairs.append((ks, table, cql_rows, rest_rows.value['rows']))
+        n_rows = sum(len(cql_rows) for _, _, cql_rows, _ in pairs)
+
+        def compare_all():
+            return [m for ks, table, cql_rows, rest_rows in pairs
+                    for m in comparator.compare_rows(ks, table, '', '', cql_rows, rest_rows)]
+
+        mismatches = benchmark(compare_all)
+        assert not mismatches, '\n\n'.join(mismatches)
+        _record_rows_per_second(benchmark, n_rows)
+
+    def test_rows_scanned_per_second(self, benchmark, offline_stargate):
+        """
+        Full scan of all tables paged with CQL and REST and merge-joined
+        """
+        cql_session = offline_stargate.cql_session()
+        rest_v1 = offline_stargate.rest_v1()
+        tables = select_tables_for_test(cql_session, skip_system=True)
+
+        def scan_all():
+            comparator = TableScanComparator(cql_session, rest_v1, max_rows=0)
+            mismatches = [m for ks, table in tables for m in comparator.compare_table(ks, table)]
+            return mismatches, comparator.rows_compared
+
+        mismatches, n_rows = benchmark(scan_all)
+        assert not mismatches, '\n\n'.join(mismatches)
+        _record_rows_per_second(benchmark, n_rows)
+
+    def test_rows_reconciled_per_second(self, benchmark, offline_stargate):
+        """
+        Token range digests of all tables computed from CQL and REST scans and compared
+        """
+        cql_session = offline_stargate.cql_session()
+        rest_v1 = offline_stargate.rest_v1()
+        tables = select_tables_for_test(cql_session, skip_system=True)
+
+        def reconcile_all():
+            reconciler = DigestReconciler(cql_session, rest_v1)
+            return [m for ks, table in tables for m in reconciler.reconcile_table(ks, table)]
+
+        mismatches = benchmark(reconcile_all)
+        assert not mismatches, '\n\n'.join(mismatches)
+        _record_rows_per_second(benchmark, offline_stargate.rows())
+
+    def test_rows_replayed_per_second(self, benchmark, offline_stargate, tmp_path):
+        """
+        Comparisons replayed from a recorded corpus, i.e. reading and decoding plus checks
+        """
+        cql_session = offline_stargate.cql_session()
+        rest_v1 = offline_stargate.rest_v1()
+        comparator = RowComparator(cql_session, rest_v1)
+        comparator.recorder = CorpusWriter(str(tmp_path / 'bench.corpus'))
+        for ks, table, data in self._sample(cql_session, BenchConfig().sample_size):
+            comparator.compare_rows_by_pk(ks, table, data)
+        comparator.recorder.close()
+
+        def replay_all():
+            replayed = list(ReplayComparator().replay(read_corpus(comparator.recorder.path)))
+            return [m for _, mismatches in replayed for m in mismatches], len(replayed)
+
+        mismatches, n_rows = benchmark(replay_all)
+        assert not mismatches, '\n\n'.join(mismatches)
+        _record_rows_per_second(benchmark, n_rows)
+
+    def test_rest_rows_streamed_per_second(self, benchmark, offline_stargate):
+        """
+        Incremental decoding of a wide REST response read in chunks, peak memory should not grow with its size
+        """
+        cql_session = offline_stargate.cql_session()
+        rest_v1 = offline_stargate.rest_v1()
+        rows = []
+        for ks, table in select_tables_for_test(cql_session, skip_system=True):
+            rows.extend(row for res in rest_table_scan(rest_v1, ks, table, 1000) for row in res.value['rows'])
+        body = json.dumps({'count': len(rows), 'rows': rows}).encode()
+        del rows
+
+        def decode_all():
+            chunks = (body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+            return sum(1 for _ in RowStream(chunks))
+
+        n_rows = benchmark(decode_all)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            decode_all()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info['body_bytes'] = len(body)
+        benchmark.extra_info['peak_bytes'] = peak
+        _record_rows_per_second(benchmark, n_rows)
+
+    def test_rows_written_per_second(self, benchmark):
+        """
+        REST writes of random rows verified with CQL, on its own stand-in so other benchmarks see the same data
+        """
+        config = BenchConfig()
+        with FakeStargate(seed=config.seed, tables=config.tables, columns=config.columns, rows_per_table=0,
+                          type_mix=config.type_mix) as stargate:
+            cql_session = stargate.cql_session()
+            rest_v1 = stargate.rest_v1()
+            tables = select_tables_for_test(cql_session, skip_system=True)
+            fuzzer = WriteFuzzer(cql_session, rest_v1)
+
+            def write_all():
+                return [m for ks, table in tables
+                        for m in fuzzer.fuzz_table(ks, table, config.sample_size, seed=1)]
+
+            mismatches = benchmark(write_all)
+            assert not mismatches, '\n\n'.join(mismatches)
+            _record_rows_per_second(benchmark, stargate.rows())
+
+    def test_memory_per_sampled_row(self, benchmark, offline_stargate):
+        """
+        Sampling rows consumed one by one, memory should not grow with the sample size
+        """
+        cql_session = offline_stargate.cql_session()
+        tables = select_tables_for_test(cql_session, skip_system=True)
+        n = BenchConfig().sample_size
+
+        def sample_all():
+            count = 0
+            for ks, table in tables:
+                for _ in some_table_data_with_keys(cql_session, ks, table, n, seed=1):
+                    count += 1
+            return count
+
+        count = benchmark(sample_all)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            sample_all()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info['rows'] = count
+        benchmark.extra_info['peak_bytes'] = peak
+        benchmark.extra_info['bytes_per_row'] = peak / count if count else 0
+
+    def test_startup_time(self, benchmark, offline_stargate):
+        """
+        From a new session to the first request: authentication, tables selection and schema indexes
+        """
+
+        def startup():
+            cql_session = offline_stargate.cql_session()
+            rest_v1 = offline_stargate.rest_v1()
+            for ks, table in select_tables_for_test(cql_session, skip_system=True):
+                table_schema(cql_session, ks, table)
+            assert rest_v1.list_keyspaces().ok
+
+        benchmark(startup)
+
+
+def _record_rows_per_second(benchmark, n_rows):
+    benchmark.extra_info['rows'] = n_rows
+    if benchmark.stats:  # not measured with --benchmark-disable
+        benchmark.extra_info['rows_per_second'] = n_rows / benchmark.stats.stats.mean
@@ -0,0 +1,17 @@
+import os
+
+
+class BenchConfig:
+    """
+    Size of the offline stand-in used by benchmarks in test/bench
+    """
+
+    def __init__(self):
+        self.seed = int(os.environ.get('BENCH_SEED', '0'))
+        self.tables = int(os.environ.get('BENCH_TABLES', '4'))
+        self.columns = int(os.environ.get('BENCH_COLUMNS', '8'))
+        self.rows_per_table = int(os.environ.get('BENCH_ROWS', '2000'))
+        self.sample_size = int(os.environ.get('BENCH_SAMPLE_SIZE', '200'))
+        type_mix = os.environ.get('BENCH_TYPE_MIX', '')
+        # e.g. "int;text;map<text, int>" with equal weights
+        self.type_mix = {t.strip(): 1 for t in type_mix.split(';') if t.strip()} or None
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from test.common.config.test_config import TestConfig
 
@@ -6,7 +7,9 @@ from test.common.config.test_config import TestConfig
 class RESTApiConfig:
 
     def __init__(self):
-        self.host = TestConfig.test_host()
+        self.hosts = TestConfig.test_hosts()
+        # node used for authentication
+        self.host = self.hosts[0].split(':')[0]
         self.username = TestConfig.username()
         self.password = TestConfig.password()
         self.auth_api_port = int(os.environ.get('REST_AUTH_PORT', '8081'))
@@ -14,11 +17,31 @@ class RESTApiConfig:
         self.api_prefix = os.environ.get('REST_API_PREFIX', '')
         if self.api_prefix and not self.api_prefix.startswith('/'):
             self.api_prefix = '/' + self.api_prefix
+        # round_robin, least_outstanding or latency, see test.common.rest.balancing
+        self.balancing = os.environ.get('REST_BALANCING', 'round_robin')
+        self.eject_errors = int(os.environ.get('REST_EJECT_ERRORS', '3'))
+        self.eject_seconds = float(os.environ.get('REST_EJECT_SECONDS', '30'))
+        # keys looked up in a single REST V2 request and rows per page of its responses
+        self.v2_batch_keys = int(os.environ.get('REST_V2_BATCH_KEYS', '100'))
+        self.v2_page_size = int(os.environ.get('REST_V2_PAGE_SIZE', '1000'))
+        self.token_ttl = int(os.environ.get('REST_TOKEN_TTL', '1800'))
+        self.token_cache = os.environ.get('REST_TOKEN_CACHE', os.path.join(
+            tempfile.gettempdir(), 'stargate-fuzz-token-{h}-{p}-{u}.json'.format(
+                h=self.host, p=self.auth_api_port, u=self.username)))
 
     def auth_api_url_base(self):
         return 'http://{host}:{port}{prefix}/v1/auth'.format(
             host=self.host, port=self.auth_api_port, prefix=self.api_prefix)
 
-    def v1_url_base(self):
-        return 'http://{host}:{port}{prefix}/v1'.format(
-            host=self.host, port=self.rest_api_port, prefix=self.api_prefix)
+    def rest_url_base(self, host=None):
+        """
+        :param host: one of hosts, `host` or `host:port`, the first one by default
+        :return: url of REST APIs of the node, versions are below it
+        """
+        host = host or self.hosts[0]
+        if ':' not in host:
+            host = '{h}:{p}'.format(h=host, p=self.rest_api_port)
+        return 'http://{host}{prefix}'.format(host=host, prefix=self.api_prefix)
+
+    def v1_url_base(self, host=None):
+        return self.rest_url_base(host) + '/v1'
@@ -1,17 +1,50 @@
 import logging
 import os
+import tempfile
 
 
 class TestConfig:
     """
     Test configuration e.g.
+    - Stargate nodes (coordinators) from TEST_HOSTS variable, comma separated, TEST_HOST if not set
     - list of tables to skip from SKIP_TABLES variable e.g. SKIP_TABLES="system.local"
+    - number of requests kept in flight from TEST_CONCURRENCY variable
+    - rows sampling parameters from TEST_SAMPLE_SIZE, TEST_SAMPLE_SHARDS, TEST_SAMPLE_SPLITS
+      and TEST_SAMPLE_FETCH_SIZE variables
+    - full table scan parameters from TEST_SCAN_MODE, TEST_SCAN_PAGE_SIZE, TEST_SCAN_WINDOW, TEST_SCAN_MAX_ROWS,
+      TEST_SCAN_MAX_MISMATCHES and TEST_DIGEST_DEPTH variables
+    - directory to record compared rows to from TEST_RECORD_CORPUS variable
+    - write path fuzzing parameters from TEST_WRITE_SIZE and TEST_WRITE_UPDATE_FRACTION variables
+    - wall clock budget of fuzz tests from TEST_TIME_BUDGET and file their stats persist in from TEST_SCHEDULE_STATS
+    - part of the work done by this client of a distributed run from TEST_SHARD e.g. "2/8", global seed of the run
+      from TEST_SEED and file the client's results are written to from TEST_SHARD_REPORT
     """
 
     LOG = logging.getLogger(__name__)
     HOST = os.environ.get('TEST_HOST', 'localhost')
+    HOSTS = [x.strip() for x in os.environ.get('TEST_HOSTS', HOST).split(',') if x.strip()]
     USERNAME = os.environ.get('TEST_USERNAME', 'cassandra')
     PASSWORD = os.environ.get('TEST_PASSWORD', 'cassandra')
+    CONCURRENCY = int(os.environ.get('TEST_CONCURRENCY', '16'))
+    SAMPLE_SIZE = int(os.environ.get('TEST_SAMPLE_SIZE', '100'))
+    SAMPLE_SHARDS = int(os.environ.get('TEST_SAMPLE_SHARDS', '1'))
+    SAMPLE_SPLITS = int(os.environ.get('TEST_SAMPLE_SPLITS', '32'))
+    SAMPLE_FETCH_SIZE = int(os.environ.get('TEST_SAMPLE_FETCH_SIZE', '100'))
+    SCAN_MODE = os.environ.get('TEST_SCAN_MODE', 'rows')
+    SCAN_PAGE_SIZE = int(os.environ.get('TEST_SCAN_PAGE_SIZE', '1000'))
+    SCAN_WINDOW = int(os.environ.get('TEST_SCAN_WINDOW', '1000'))
+    SCAN_MAX_ROWS = int(os.environ.get('TEST_SCAN_MAX_ROWS', '10000'))
+    SCAN_MAX_MISMATCHES = int(os.environ.get('TEST_SCAN_MAX_MISMATCHES', '100'))
+    DIGEST_DEPTH = int(os.environ.get('TEST_DIGEST_DEPTH', '12'))
+    RECORD_CORPUS = os.environ.get('TEST_RECORD_CORPUS', '')
+    WRITE_SIZE = int(os.environ.get('TEST_WRITE_SIZE', '100'))
+    WRITE_UPDATE_FRACTION = float(os.environ.get('TEST_WRITE_UPDATE_FRACTION', '0.2'))
+    TIME_BUDGET = float(os.environ.get('TEST_TIME_BUDGET', '0'))
+    SCHEDULE_STATS = os.environ.get('TEST_SCHEDULE_STATS', os.path.join(
+        tempfile.gettempdir(), 'stargate-fuzz-schedule-{h}.json'.format(h=HOST)))
+    SHARD = os.environ.get('TEST_SHARD', '0/1')
+    SEED = os.environ.get('TEST_SEED', '')
+    SHARD_REPORT = os.environ.get('TEST_SHARD_REPORT', '')
 
     default_tables_to_skip = [
         ('system', 'prepared_statements'),  # it is changing fast, can differ between calls
@@ -23,6 +56,13 @@ class TestConfig:
     def test_host(cls):
         return cls.HOST
 
+    @classmethod
+    def test_hosts(cls):
+        """
+        :return: list of Stargate nodes, each `host` or `host:port` (port of REST API)
+        """
+        return cls.HOSTS
+
     @classmethod
     def username(cls):
         return cls.USERNAME
@@ -31,6 +71,120 @@ class TestConfig:
     def password(cls):
         return cls.PASSWORD
 
+    @classmethod
+    def concurrency(cls):
+        return cls.CONCURRENCY
+
+    @classmethod
+    def sample_size(cls):
+        return cls.SAMPLE_SIZE
+
+    @classmethod
+    def sample_shards(cls):
+        return cls.SAMPLE_SHARDS
+
+    @classmethod
+    def sample_splits(cls):
+        return cls.SAMPLE_SPLITS
+
+    @classmethod
+    def sample_fetch_size(cls):
+        return cls.SAMPLE_FETCH_SIZE
+
+    @classmethod
+    def scan_mode(cls):
+        """
+        :return: 'rows' to compare full scans row by row, 'digest' to compare token range digests first
+        """
+        return cls.SCAN_MODE
+
+    @classmethod
+    def scan_page_size(cls):
+        return cls.SCAN_PAGE_SIZE
+
+    @classmethod
+    def scan_window(cls):
+        return cls.SCAN_WINDOW
+
+    @classmethod
+    def scan_max_rows(cls):
+        """
+        :return: max number of rows compared per table by full scan, 0 for whole table
+        """
+        return cls.SCAN_MAX_ROWS
+
+    @classmethod
+    def scan_max_mismatches(cls):
+        return cls.SCAN_MAX_MISMATCHES
+
+    @classmethod
+    def digest_depth(cls):
+        """
+        :return: depth of the digest tree, the ring is split into 2^depth leaf ranges
+        """
+        return cls.DIGEST_DEPTH
+
+    @classmethod
+    def record_corpus(cls):
+        """
+        :return: directory compared rows are recorded to (see test.common.test.corpus), empty if not recording
+        """
+        return cls.RECORD_CORPUS
+
+    @classmethod
+    def write_size(cls):
+        """
+        :return: number of random rows written to every table by write path tests
+        """
+        return cls.WRITE_SIZE
+
+    @classmethod
+    def write_update_fraction(cls):
+        """
+        :return: fraction of written rows updated by key after they are added
+        """
+        return cls.WRITE_UPDATE_FRACTION
+
+    @classmethod
+    def time_budget(cls):
+        """
+        :return: seconds of wall clock split between fuzzed tables (see test.common.test.scheduler), 0 to sample
+                 TEST_SAMPLE_SIZE rows from every table
+        """
+        return cls.TIME_BUDGET
+
+    @classmethod
+    def schedule_stats(cls):
+        """
+        :return: file stats of time budgeted runs are kept in, empty to not persist them
+        """
+        return cls.SCHEDULE_STATS
+
+    @classmethod
+    def client_shard(cls):
+        """
+        :return: (shard, shards) of a distributed run, this client tests only its part of tables and token ranges
+        """
+        shard, _, shards = cls.SHARD.partition('/')
+        shard, shards = int(shard), int(shards or 1)
+        if not 0 <= shard < shards:
+            raise ValueError("invalid shard {}, expected <shard>/<shards> with 0 <= shard < shards".format(cls.SHARD))
+        return shard, shards
+
+    @classmethod
+    def seed(cls):
+        """
+        :return: global seed of the run, rows sampled from every table depend only on it, None for random samples
+        """
+        return int(cls.SEED) if cls.SEED else None
+
+    @classmethod
+    def shard_report(cls):
+        """
+        :return: json file results of this client are written to (see test.common.test.shard_report), empty if none
+        """
+        return cls.SHARD_REPORT
+
     @classmethod
     def skip_table(cls, keyspace, table):
         return (keyspace, table) in cls.get_tables_to_skip()
@@ -1,4 +1,5 @@
 import os
+import threading
 
 from cassandra.cluster import Cluster
 from cassandra.policies import RoundRobinPolicy
@@ -8,27 +9,104 @@ from test.common.config.test_config import TestConfig
 
 class CQLConfig:
     def __init__(self):
-        self.host = TestConfig.test_host()
+        # contact points, RoundRobinPolicy spreads queries over all nodes discovered from them
+        self.hosts = [x.split(':')[0] for x in TestConfig.test_hosts()]
         self.username = os.environ.get('CQL_USERNAME', 'cassandra')
         self.password = os.environ.get('CQL_PASSWORD', 'cassandra')
+        self.prepared_cache_size = int(os.environ.get('CQL_PREPARED_CACHE_SIZE', '256'))
+        # full: driver loads metadata of the whole schema on connect, lazy: only tables used by tests, on demand
+        self.schema_metadata = os.environ.get('CQL_SCHEMA_METADATA', 'full')
+        keyspaces = os.environ.get('CQL_KEYSPACES', '')
+        self.keyspaces = [x.strip() for x in keyspaces.split(',') if x.strip()]
 
 
 class CQLConnection:
 
+    _shared_session = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared_session(cls):
+        """
+        One session per process reused by fixtures and test collection, closed with shutdown_shared()
+        """
+        with cls._shared_lock:
+            if cls._shared_session is None:
+                cls._shared_session = cls().connect()
+            return cls._shared_session
+
+    @classmethod
+    def shutdown_shared(cls):
+        with cls._shared_lock:
+            if cls._shared_session is not None:
+                cls._shared_session.cluster.shutdown()
+                cls._shared_session = None
+
     def connect(self):
         config = CQLConfig()
         # TODO: support authentication
         # auth_provider = PlainTextAuthProvider(username=config.username, password=config.password)
-        # cluster = Cluster([config.host], auth_provider=auth_provider)
-        cluster = Cluster([config.host],
+        # cluster = Cluster(config.hosts, auth_provider=auth_provider)
+        cluster = Cluster(config.hosts,
                           protocol_version=4,
-                          load_balancing_policy=RoundRobinPolicy())
+                          load_balancing_policy=RoundRobinPolicy(),
+                          schema_metadata_enabled=config.schema_metadata != 'lazy')
         session = cluster.connect()
         from cassandra.query import dict_factory
         session.row_factory = dict_factory
         return session
 
 
+_metadata_lock = threading.Lock()
+
+
+def lazy_schema_metadata(cql_session):
+    return not cql_session.cluster.schema_metadata_enabled
+
+
+def cql_schema_version(cql_session):
+    """
+    :return: schema version of the node answering the query as string, None if it can't be read
+    """
+    try:
+        rows = list(cql_session.execute('SELECT schema_version FROM system.local'))
+    except Exception:
+        return None
+    return str(rows[0]['schema_version']) if rows else None
+
+
+def cql_schema_names(cql_session):
+    """
+    Names of all keyspaces and their tables, read from system_schema if metadata is loaded lazily
+    :return: dict keyspace -> sorted list of tables, sorted by keyspace
+    """
+    if not lazy_schema_metadata(cql_session):
+        return {ks: sorted(metadata.tables) for ks, metadata in sorted(cql_keyspaces(cql_session).items())}
+    keyspaces = cql_session.execute('SELECT keyspace_name FROM system_schema.keyspaces')
+    names = {row['keyspace_name']: [] for row in keyspaces}
+    for row in cql_session.execute('SELECT keyspace_name, table_name FROM system_schema.tables'):
+        names.setdefault(row['keyspace_name'], []).append(row['table_name'])
+    return {ks: sorted(tables) for ks, tables in sorted(names.items())}
+
+
+def _load_table_metadata(cql_session, ks_name, table):
+    """
+    Loads metadata of the keyspace (without tables), its user types and the table, skips schema agreement wait
+    """
+    cluster = cql_session.cluster
+    with _metadata_lock:
+        ks = cluster.metadata.keyspaces.get(ks_name, None)
+        if ks is not None and table in ks.tables:
+            return
+        if ks is None:
+            cluster.refresh_keyspace_metadata(ks_name, max_schema_agreement_wait=0)
+            query = 'SELECT type_name FROM system_schema.types WHERE keyspace_name=%s'
+            for row in cql_session.execute(query, (ks_name,)):
+                cluster.refresh_user_type_metadata(ks_name, row['type_name'], max_schema_agreement_wait=0)
+        if ks_name in cluster.metadata.keyspaces:
+            cluster.refresh_table_metadata(ks_name, table, max_schema_agreement_wait=0)
+
+
 def cql_keyspaces(cql_session):
     return cql_session.cluster.metadata.keyspaces
 
@@ -39,23 +117,7 @@ def cql_tables(cql_session, ks_name):
 
 
 def cql_table_metadata(cql_session, ks_name, table):
+    if lazy_schema_metadata(cql_session):
+        _load_table_metadata(cql_session, ks_name, table)
     ks = cql_session.cluster.metadata.keyspaces.get(ks_name, None)
     return ks.tables.get(table, None) if ks else None
-
-
-def cql_table_pk_columns(cql_session, ks_name, table):
-    metadata = cql_table_metadata(cql_session, ks_name, table)
-    if metadata:
-        partition_key_cols = [x.name for x in metadata.partition_key]
-        clustering_key_cols = [x.name for x in metadata.clustering_key]
-        return partition_key_cols, clustering_key_cols
-    else:
-        return None, None
-
-
-def cql_table_column(cql_session, ks_name, table, column):
-    metadata = cql_table_metadata(cql_session, ks_name, table)
-    if metadata:
-        return metadata.columns.get(column, None)
-    else:
-        return None
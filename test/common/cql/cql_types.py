@@ -0,0 +1,99 @@
+import re
+from collections import namedtuple
+
+
+class CQLType(namedtuple('CQLType', ['name', 'subtypes', 'field_names'])):
+    """
+    Parsed CQL type, `frozen<>` is dropped as it does not change how values look like e.g.
+    - int is CQLType('int', (), None)
+    - map<text, frozen<list<int>>> is CQLType('map', (CQLType('text'), CQLType('list', (CQLType('int'),))), None)
+    - UDT is CQLType(<udt name>, <field types>, <field names>)
+    """
+
+    def __new__(cls, name, subtypes=(), field_names=None):
+        return super().__new__(cls, name, tuple(subtypes), tuple(field_names) if field_names is not None else None)
+
+    def is_udt(self):
+        return self.field_names is not None
+
+    def __str__(self):
+        if self.subtypes and not self.is_udt():
+            return '{n}<{s}>'.format(n=self.name, s=', '.join([str(x) for x in self.subtypes]))
+        return self.name
+
+
+_TOKEN_RE = re.compile(r'\s*("(?:[^"]|"")*"|\'[^\']*\'|[^\s<>,]+|[<>,])')
+
+
+def _tokenize(type_string):
+    tokens = []
+    pos = 0
+    type_string = type_string.strip()
+    while pos < len(type_string):
+        match = _TOKEN_RE.match(type_string, pos)
+        if not match:
+            raise ValueError("can't parse CQL type: {}".format(type_string))
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+
+def _unquote(name):
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1].replace('""', '"')
+    if name.startswith("'") and name.endswith("'"):
+        return name[1:-1]
+    return name
+
+
+def parse_cql_type(type_string, user_types=None):
+    """
+    Parse CQL type as reported in column metadata cql_type
+    :param type_string: e.g. "map<text, frozen<set<int>>>"
+    :param user_types: UDTs of the keyspace (name -> object with field_names and field_types)
+                       e.g. keyspace metadata user_types, used to resolve UDT fields
+    :return: CQLType
+    """
+    tokens = _tokenize(type_string)
+    parsed, pos = _parse(tokens, 0, user_types or {})
+    if pos != len(tokens):
+        raise ValueError("can't parse CQL type: {}".format(type_string))
+    return parsed
+
+
+def _parse(tokens, pos, user_types):
+    name = _unquote(tokens[pos])
+    pos += 1
+    subtypes = []
+    if pos < len(tokens) and tokens[pos] == '<':
+        pos += 1
+        while True:
+            subtype, pos = _parse(tokens, pos, user_types)
+            subtypes.append(subtype)
+            if tokens[pos] == ',':
+                pos += 1
+            elif tokens[pos] == '>':
+                pos += 1
+                break
+            else:
+                raise ValueError("unexpected {} in CQL type".format(tokens[pos]))
+    if name.lower() == 'frozen':
+        return subtypes[0], pos
+    if name in user_types:
+        udt = user_types[name]
+        field_types = [parse_cql_type(x, user_types) for x in udt.field_types]
+        return CQLType(name, field_types, udt.field_names), pos
+    return CQLType(name.lower(), subtypes), pos
+
+
+def cql_type_to_json(cql_type):
+    """
+    :return: json serializable form of the CQLType, reversed by cql_type_from_json
+    """
+    return [cql_type.name, [cql_type_to_json(x) for x in cql_type.subtypes],
+            list(cql_type.field_names) if cql_type.is_udt() else None]
+
+
+def cql_type_from_json(value):
+    name, subtypes, field_names = value
+    return CQLType(name, [cql_type_from_json(x) for x in subtypes], field_names)
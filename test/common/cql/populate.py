@@ -0,0 +1,215 @@
+"""
+Populates the cluster under test with a random schema and random data, no external tools needed.
+
+Schema (tables with all CQL types, collections, UDTs and static columns) comes from RandomSchemaGenerator,
+rows from RandomRowGenerator. Rows are written with a prepared INSERT, rows of the same partition
+in unlogged batches, kept in flight with execute_concurrent. Tables are split into chunks of rows
+generated from their own seed, so data depends only on the seed no matter how many processes write it, e.g.
+
+    python -m test.common.cql.populate --seed 42 --tables 8 --rows 1000000 --processes 4
+"""
+import argparse
+import logging
+import multiprocessing
+import random
+import time
+
+from cassandra.concurrent import execute_concurrent
+from cassandra.query import BatchStatement, BatchType
+
+from test.common.config.test_config import TestConfig
+from test.common.cql.cql_tools import CQLConnection
+from test.common.cql.random_schema import FULL_TYPE_MIX, RandomRowGenerator, RandomSchemaGenerator
+
+LOG = logging.getLogger(__name__)
+
+# rows generated from a single seed, unit of work of a process
+CHUNK_ROWS = 10000
+
+
+def _quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def create_keyspace_query(ks_metadata, replication_factor):
+    query = "CREATE KEYSPACE IF NOT EXISTS {ks} WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': {rf}}}"
+    return query.format(ks=_quote(ks_metadata.name), rf=replication_factor)
+
+
+def create_type_query(udt):
+    fields = ', '.join('{n} {t}'.format(n=_quote(n), t=t) for n, t in zip(udt.field_names, udt.field_types))
+    return 'CREATE TYPE IF NOT EXISTS {ks}.{n} ({f})'.format(ks=_quote(udt.keyspace), n=_quote(udt.name), f=fields)
+
+
+def create_table_query(table_metadata):
+    columns = ['{n} {t}{s}'.format(n=_quote(name), t=col.cql_type, s=' static' if col.is_static else '')
+               for name, col in table_metadata.columns.items()]
+    partition_key = '({})'.format(', '.join(_quote(c.name) for c in table_metadata.partition_key))
+    primary_key = ', '.join([partition_key] + [_quote(c.name) for c in table_metadata.clustering_key])
+    return 'CREATE TABLE IF NOT EXISTS {ks}.{t} ({c}, PRIMARY KEY ({pk}))'.format(
+        ks=_quote(table_metadata.keyspace_name), t=_quote(table_metadata.name), c=', '.join(columns), pk=primary_key)
+
+
+def insert_query(table_metadata):
+    names = list(table_metadata.columns)
+    return 'INSERT INTO {ks}.{t} ({c}) VALUES ({v})'.format(
+        ks=_quote(table_metadata.keyspace_name), t=_quote(table_metadata.name),
+        c=', '.join(_quote(n) for n in names), v=', '.join('?' * len(names)))
+
+
+def create_schema(cql_session, ks_metadata, replication_factor=1, drop=False):
+    if drop:
+        cql_session.execute('DROP KEYSPACE IF EXISTS {}'.format(_quote(ks_metadata.name)))
+    elif ks_metadata.name in cql_session.cluster.metadata.keyspaces:
+        LOG.warning("keyspace {} exists, its existing types and tables are kept, use --drop to recreate them".format(
+            ks_metadata.name))
+    cql_session.execute(create_keyspace_query(ks_metadata, replication_factor))
+    for udt in ks_metadata.user_types.values():
+        cql_session.execute(create_type_query(udt))
+    for table in ks_metadata.tables.values():
+        cql_session.execute(create_table_query(table))
+
+
+class TableWriter:
+    """
+    Writes deterministic random rows of a table, chunk by chunk
+    """
+
+    def __init__(self, cql_session, ks_metadata, table_metadata, seed, rows_per_partition, batch_size, concurrency):
+        """
+        :param rows_per_partition: max number of rows in a partition (random 1..n) for tables with clustering key
+        :param batch_size: max number of rows of a partition in a single unlogged batch
+        """
+        self.cql_session = cql_session
+        self.table_metadata = table_metadata
+        self.seed = seed
+        self.rows_per_partition = rows_per_partition if table_metadata.clustering_key else 1
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.generator = RandomRowGenerator(table_metadata, ks_metadata.user_types)
+        self.columns = list(table_metadata.columns)
+        self.insert = cql_session.prepare(insert_query(table_metadata))
+
+    def chunk_rows(self, chunk, n_rows):
+        """
+        :return: generator of partitions (lists of rows) of the chunk, n_rows in total
+        """
+        rng = random.Random('{s}/{ks}/{t}/{c}'.format(s=self.seed, ks=self.table_metadata.keyspace_name,
+                                                       t=self.table_metadata.name, c=chunk))
+        while n_rows > 0:
+            n = min(n_rows, rng.randint(1, self.rows_per_partition))
+            n_rows -= n
+            yield self.generator.partition(rng, n)
+
+    def _statements(self, partitions):
+        for rows in partitions:
+            for i in range(0, len(rows), self.batch_size):
+                batch_rows = rows[i:i + self.batch_size]
+                if len(batch_rows) == 1:
+                    yield self.insert, [batch_rows[0][c] for c in self.columns]
+                    continue
+                batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+                for row in batch_rows:
+                    batch.add(self.insert, [row[c] for c in self.columns])
+                yield batch, ()
+
+    def write_chunk(self, chunk, n_rows):
+        """
+        :return: number of statements (single inserts and batches) executed
+        """
+        statements = self._statements(self.chunk_rows(chunk, n_rows))
+        results = execute_concurrent(self.cql_session, statements, concurrency=self.concurrency,
+                                     raise_on_first_error=True, results_generator=True)
+        return sum(1 for _ in results)
+
+
+def table_chunks(ks_metadata, rows_per_table):
+    """
+    :return: list of (table, chunk, rows) covering rows_per_table rows of every table
+    """
+    chunks = []
+    for table in ks_metadata.tables:
+        for chunk, start in enumerate(range(0, rows_per_table, CHUNK_ROWS)):
+            chunks.append((table, chunk, min(CHUNK_ROWS, rows_per_table - start)))
+    return chunks
+
+
+def _schema_generator(args):
+    return RandomSchemaGenerator(args.seed, keyspace=args.keyspace, tables=args.tables, columns=args.columns,
+                                 udts=args.udts, type_mix=FULL_TYPE_MIX)
+
+
+def _write_chunks(args, chunks):
+    ks_metadata = _schema_generator(args).keyspace_metadata()
+    cql_session = CQLConnection().connect()
+    try:
+        writers = {}
+        rows = 0
+        for table, chunk, n_rows in chunks:
+            writer = writers.get(table)
+            if writer is None:
+                writer = writers[table] = TableWriter(cql_session, ks_metadata, ks_metadata.tables[table], args.seed,
+                                                      args.rows_per_partition, args.batch_size, args.concurrency)
+            writer.write_chunk(chunk, n_rows)
+            rows += n_rows
+        return rows
+    finally:
+        cql_session.cluster.shutdown()
+
+
+def populate(args):
+    """
+    :return: number of rows written
+    """
+    ks_metadata = _schema_generator(args).keyspace_metadata()
+    cql_session = CQLConnection().connect()
+    try:
+        create_schema(cql_session, ks_metadata, args.replication_factor, drop=args.drop)
+    finally:
+        cql_session.cluster.shutdown()
+
+    chunks = table_chunks(ks_metadata, args.rows)
+    start = time.perf_counter()
+    if args.processes > 1:
+        with multiprocessing.Pool(args.processes) as pool:
+            rows = sum(pool.starmap(_write_chunks, [(args, chunks[i::args.processes])
+                                                    for i in range(args.processes)]))
+    else:
+        rows = _write_chunks(args, chunks)
+    elapsed = time.perf_counter() - start
+    LOG.info("written {r} rows to {n} tables of {ks} in {s:.1f}s ({rate:.0f} rows/s)".format(
+        r=rows, n=len(ks_metadata.tables), ks=ks_metadata.name, s=elapsed, rate=rows / elapsed if elapsed else 0))
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Populate cluster under test with random schema and data')
+    parser.add_argument('--seed', type=int, default=None, help='seed of schema and data, random if not given')
+    parser.add_argument('--keyspace', default='fuzz', help='keyspace to create')
+    parser.add_argument('--replication-factor', type=int, default=1)
+    parser.add_argument('--drop', action='store_true', help='drop the keyspace first if it exists')
+    parser.add_argument('--tables', type=int, default=8, help='number of tables')
+    parser.add_argument('--columns', type=int, default=12, help='number of regular columns in every table')
+    parser.add_argument('--udts', type=int, default=3, help='number of user defined types')
+    parser.add_argument('--rows', type=int, default=100000, help='number of rows written to every table')
+    parser.add_argument('--rows-per-partition', type=int, default=20,
+                        help='max number of rows in a partition of tables with clustering columns')
+    parser.add_argument('--batch-size', type=int, default=20, help='max number of rows in an unlogged batch')
+    parser.add_argument('--concurrency', type=int, default=TestConfig.concurrency() * 4,
+                        help='number of statements in flight per process')
+    parser.add_argument('--processes', type=int, default=1, help='number of writing processes')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.seed is None:
+        args.seed = random.getrandbits(32)
+    LOG.info("populating {ks} with seed {s}".format(ks=args.keyspace, s=args.seed))
+    populate(args)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,217 @@
+import datetime
+import random
+import string
+import uuid
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+
+from cassandra.metadata import ColumnMetadata, KeyspaceMetadata, TableMetadata, UserType
+from cassandra.util import Date, Duration, SortedSet, Time, uuid_from_time
+
+from test.common.cql.cql_types import parse_cql_type
+
+# types of primary key columns: all CQL types allowed in keys that have a text form in REST V1 urls
+# (rows are addressed by key values in the path), blobs, frozen collections, tuples and UDTs are not used
+KEY_TYPES = ['ascii', 'bigint', 'boolean', 'date', 'decimal', 'double', 'float', 'inet', 'int', 'smallint', 'text',
+             'time', 'timestamp', 'timeuuid', 'tinyint', 'uuid', 'varchar', 'varint']
+
+# type -> weight, UDT_TYPE is replaced by one of the generated UDTs
+UDT_TYPE = '<udt>'
+DEFAULT_TYPE_MIX = OrderedDict([
+    ('int', 3), ('bigint', 2), ('text', 3), ('boolean', 1), ('double', 2), ('float', 1), ('uuid', 2),
+    ('timeuuid', 1), ('timestamp', 2), ('date', 1), ('time', 1), ('inet', 1),
+    ('set<int>', 1), ('list<text>', 1), ('map<text, int>', 1), ('map<int, frozen<list<date>>>', 1),
+    ('frozen<tuple<int, text>>', 1), (UDT_TYPE, 1),
+])
+
+# all CQL types but counters (counter tables can't have other regular columns), used to populate test clusters
+FULL_TYPE_MIX = OrderedDict([
+    ('ascii', 1), ('bigint', 2), ('blob', 1), ('boolean', 1), ('date', 1), ('decimal', 1), ('double', 2),
+    ('duration', 1), ('float', 1), ('inet', 1), ('int', 3), ('smallint', 1), ('text', 3), ('time', 1),
+    ('timestamp', 2), ('timeuuid', 1), ('tinyint', 1), ('uuid', 2), ('varchar', 1), ('varint', 1),
+    ('set<int>', 1), ('set<text>', 1), ('list<text>', 1), ('list<frozen<tuple<int, text>>>', 1),
+    ('map<text, int>', 1), ('map<int, frozen<list<date>>>', 1), ('frozen<map<timestamp, text>>', 1),
+    ('frozen<set<uuid>>', 1), ('frozen<tuple<int, text, double>>', 1), (UDT_TYPE, 2),
+])
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+# 64 url-safe characters, random bytes are mapped to them 4:1 so that text is built from a single getrandbits call
+_TEXT_CHARS = string.ascii_letters + string.digits + '-_'
+_TEXT_TABLE = (_TEXT_CHARS * 4).encode()
+
+
+class RandomSchemaGenerator:
+    """
+    Generates random keyspace metadata (tables and UDTs) using driver metadata classes,
+    so it can be used as a model of a cluster (see test.common.fake) or exported as CQL DDL
+    """
+
+    def __init__(self, seed, keyspace='fuzz', tables=4, columns=8, udts=2, type_mix=None):
+        """
+        :param columns: number of regular columns in every table
+        :param type_mix: dict type -> weight for regular columns, DEFAULT_TYPE_MIX by default
+        """
+        self.rng = random.Random(seed)
+        self.keyspace = keyspace
+        self.tables = tables
+        self.columns = columns
+        self.udts = udts
+        self.type_mix = type_mix or DEFAULT_TYPE_MIX
+
+    def keyspace_metadata(self):
+        ks = KeyspaceMetadata(self.keyspace, True, 'SimpleStrategy', {'replication_factor': '1'})
+        for i in range(self.udts):
+            udt = self._udt('udt{}'.format(i))
+            ks.user_types[udt.name] = udt
+        for i in range(self.tables):
+            table = self._table(ks, 'table{}'.format(i))
+            ks.tables[table.name] = table
+        return ks
+
+    def _udt(self, name):
+        n_fields = self.rng.randint(1, 4)
+        field_types = [self.rng.choice(KEY_TYPES) for _ in range(n_fields)]
+        return UserType(self.keyspace, name, ['f{}'.format(i) for i in range(n_fields)], field_types)
+
+    def _column_type(self, ks):
+        types = list(self.type_mix.keys())
+        cql_type = self.rng.choices(types, weights=list(self.type_mix.values()))[0]
+        if cql_type == UDT_TYPE:
+            if not ks.user_types:
+                return 'int'
+            return 'frozen<{}>'.format(self.rng.choice(sorted(ks.user_types)))
+        return cql_type
+
+    def _table(self, ks, name):
+        table = TableMetadata(self.keyspace, name)
+        n_partition = self.rng.randint(1, 2)
+        n_clustering = self.rng.randint(0, 2)
+        for i in range(n_partition):
+            col = ColumnMetadata(table, 'pk{}'.format(i), self.rng.choice(KEY_TYPES))
+            table.partition_key.append(col)
+            table.columns[col.name] = col
+        for i in range(n_clustering):
+            col = ColumnMetadata(table, 'ck{}'.format(i), self.rng.choice(KEY_TYPES))
+            table.clustering_key.append(col)
+            table.columns[col.name] = col
+        for i in range(self.columns):
+            # static columns are only allowed in tables with clustering columns
+            is_static = n_clustering > 0 and self.rng.random() < 0.1
+            col = ColumnMetadata(table, 'col{}'.format(i), self._column_type(ks), is_static=is_static)
+            table.columns[col.name] = col
+        return table
+
+
+def compile_value_generator(cql_type):
+    """
+    Compile parsed CQL type into function(rng) -> random value as returned by the python driver
+    :param cql_type: CQLType e.g. from parse_cql_type
+    """
+    name = cql_type.name
+    if cql_type.is_udt():
+        fields = [compile_value_generator(t) for t in cql_type.subtypes]
+        udt_class = namedtuple(name, cql_type.field_names)
+        return lambda rng: udt_class(*[f(rng) for f in fields])
+    if name in ('set', 'list'):
+        elem = compile_value_generator(cql_type.subtypes[0])
+        if name == 'set':
+            return lambda rng: SortedSet([elem(rng) for _ in range(_size(rng))])
+        return lambda rng: [elem(rng) for _ in range(_size(rng))]
+    if name == 'map':
+        key = compile_value_generator(cql_type.subtypes[0])
+        val = compile_value_generator(cql_type.subtypes[1])
+        return lambda rng: OrderedDict(sorted({key(rng): val(rng) for _ in range(_size(rng))}.items()))
+    if name == 'tuple':
+        elems = [compile_value_generator(t) for t in cql_type.subtypes]
+        return lambda rng: tuple(e(rng) for e in elems)
+    try:
+        return _SCALAR_GENERATORS[name]
+    except KeyError:
+        raise ValueError("can't generate values of type {}".format(cql_type))
+
+
+# generators below draw bits with getrandbits where the range allows it, randint is several times slower
+
+
+def _size(rng):
+    # number of elements of a collection, 1..4
+    return 1 + rng.getrandbits(2)
+
+
+def _signed(bits):
+    offset = 2 ** (bits - 1)
+    return lambda rng: rng.getrandbits(bits) - offset
+
+
+def _text(rng):
+    n = 1 + rng.getrandbits(4)
+    return rng.getrandbits(8 * n).to_bytes(n, 'little').translate(_TEXT_TABLE).decode()
+
+
+def _blob(rng):
+    n = 1 + rng.getrandbits(4)
+    return rng.getrandbits(8 * n).to_bytes(n, 'little')
+
+
+def _timestamp(rng):
+    # millisecond precision, same as stored by cassandra
+    return _EPOCH + datetime.timedelta(milliseconds=rng.getrandbits(41))
+
+
+_SCALAR_GENERATORS = {
+    'int': _signed(32),
+    'bigint': _signed(64),
+    'counter': lambda rng: rng.getrandbits(31),
+    'varint': _signed(81),
+    'smallint': _signed(16),
+    'tinyint': _signed(8),
+    'text': _text,
+    'varchar': _text,
+    'ascii': _text,
+    'boolean': lambda rng: rng.random() < 0.5,
+    'float': lambda rng: round(rng.uniform(-1000, 1000), 2),
+    'double': lambda rng: rng.uniform(-1e6, 1e6),
+    'decimal': lambda rng: Decimal(rng.randint(-10 ** 8, 10 ** 8)).scaleb(-rng.randint(0, 6)),
+    'uuid': lambda rng: uuid.UUID(int=rng.getrandbits(128), version=4),
+    'timeuuid': lambda rng: uuid_from_time(_timestamp(rng), node=rng.getrandbits(48), clock_seq=rng.getrandbits(14)),
+    'timestamp': _timestamp,
+    'date': lambda rng: Date(rng.randint(0, 50000)),
+    'time': lambda rng: Time(rng.randrange(86400 * 10 ** 9)),
+    'inet': lambda rng: '10.{}.{}.{}'.format(rng.randint(0, 255), rng.randint(0, 255), rng.randint(1, 254)),
+    'blob': _blob,
+    # months, days and nanoseconds need the same sign
+    'duration': lambda rng: Duration(rng.randint(0, 24), rng.randint(0, 30), rng.randrange(86400 * 10 ** 9)),
+}
+
+
+class RandomRowGenerator:
+    """
+    Generates random rows (dicts column -> value) for a table, value generators are compiled once
+    """
+
+    def __init__(self, table_metadata, user_types):
+        self.columns = [(name, compile_value_generator(parse_cql_type(col.cql_type, user_types)))
+                        for name, col in table_metadata.columns.items()]
+        partition_key = [c.name for c in table_metadata.partition_key]
+        statics = [name for name, col in table_metadata.columns.items() if col.is_static]
+        self.partition_columns = [(n, g) for n, g in self.columns if n in partition_key or n in statics]
+        self.row_columns = [(n, g) for n, g in self.columns if n not in partition_key and n not in statics]
+
+    def row(self, rng):
+        return {name: generate(rng) for name, generate in self.columns}
+
+    def rows(self, rng, n):
+        for _ in range(n):
+            yield self.row(rng)
+
+    def partition(self, rng, n):
+        """
+        :return: n rows sharing partition key and static columns values
+        """
+        shared = {name: generate(rng) for name, generate in self.partition_columns}
+        rows = []
+        for _ in range(n):
+            row = dict(shared)
+            row.update((name, generate(rng)) for name, generate in self.row_columns)
+            rows.append(row)
+        return rows
@@ -0,0 +1,99 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+from cassandra.concurrent import execute_concurrent_with_args
+
+from test.common.cql.cql_tools import CQLConfig
+
+
+# query templates, used to aggregate stats per query
+SELECT_BY_KEY_ENDPOINT = 'SELECT * FROM {ks}.{t} WHERE <key>'
+TOKEN_RANGE_ENDPOINT = 'SELECT token(<pk>), <columns> FROM {ks}.{t} WHERE <token range>'
+FULL_SCAN_ENDPOINT = 'SELECT * FROM {ks}.{t}'
+
+
+def select_by_key_query(ks, table, key_columns):
+    query = 'SELECT * FROM "{ks}"."{t}" WHERE '.format(ks=ks, t=table)
+    return query + ' AND '.join(['"{}"=?'.format(c) for c in key_columns])
+
+
+def full_scan_query(ks, table):
+    return 'SELECT * FROM "{ks}"."{t}"'.format(ks=ks, t=table)
+
+
+def token_range_query(ks, table, partk_columns, columns, token_alias):
+    token = 'token({})'.format(', '.join(['"{}"'.format(c) for c in partk_columns]))
+    return 'SELECT {token} AS "{alias}", {cols} FROM "{ks}"."{t}" WHERE {token} > ? AND {token} <= ? LIMIT ?'.format(
+        token=token, alias=token_alias, cols=', '.join(['"{}"'.format(c) for c in columns]), ks=ks, t=table)
+
+
+class PreparedStatementCache:
+    """
+    LRU cache of prepared statements for a single session keyed by (keyspace, table, key columns prefix)
+    so that queries in the hot loop are neither formatted on the client nor re-parsed by the server
+    """
+
+    def __init__(self, cql_session, max_size):
+        self.cql_session = cql_session
+        self.max_size = max_size
+        self._statements = OrderedDict()
+        self._lock = threading.Lock()
+
+    def select_by_key(self, ks, table, key_columns):
+        return self._statement((ks, table, tuple(key_columns)),
+                               lambda: select_by_key_query(ks, table, key_columns))
+
+    def token_range(self, ks, table, partk_columns, columns, token_alias):
+        return self._statement((ks, table, 'token', token_alias),
+                               lambda: token_range_query(ks, table, partk_columns, columns, token_alias))
+
+    def full_scan(self, ks, table):
+        return self._statement((ks, table, 'scan'), lambda: full_scan_query(ks, table))
+
+    def _statement(self, cache_key, build_query):
+        with self._lock:
+            statement = self._statements.get(cache_key)
+            if statement is not None:
+                self._statements.move_to_end(cache_key)
+                return statement
+        # prepare outside of the lock, at worst same statement is prepared twice
+        statement = self.cql_session.prepare(build_query())
+        with self._lock:
+            self._statements[cache_key] = statement
+            self._statements.move_to_end(cache_key)
+            while len(self._statements) > self.max_size:
+                self._statements.popitem(last=False)
+        return statement
+
+    def __len__(self):
+        return len(self._statements)
+
+
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def prepared_statements(cql_session):
+    """
+    Returns prepared statements cache for the session, created on first use
+    """
+    with _caches_lock:
+        cache = _caches.get(cql_session)
+        if cache is None:
+            cache = PreparedStatementCache(cql_session, CQLConfig().prepared_cache_size)
+            _caches[cql_session] = cache
+        return cache
+
+
+def cql_rows_by_keys(cql_session, ks, table, key_columns, keys, concurrency):
+    """
+    Runs SELECT by key for a batch of key tuples using a single prepared statement
+    :param key_columns: key columns (partition key and clustering key prefix) shared by all keys
+    :param keys: list of key values tuples, in order of key_columns
+    :return: list of (success, rows or exception) in the same order as keys
+    """
+    statement = prepared_statements(cql_session).select_by_key(ks, table, key_columns)
+    results = execute_concurrent_with_args(cql_session, statement, keys,
+                                           concurrency=concurrency, raise_on_first_error=False)
+    return [(success, list(res) if success else res) for success, res in results]
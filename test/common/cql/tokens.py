@@ -0,0 +1,80 @@
+"""
+Client side computation of Murmur3Partitioner tokens, so that rows returned by REST (which carry no token)
+can be placed on the token ring
+"""
+import datetime
+import struct
+import uuid
+
+from cassandra import cqltypes
+from cassandra.metadata import Murmur3Token
+from cassandra.util import Date, Time
+
+PROTOCOL_VERSION = 4
+
+
+def _parse_rest_timestamp(value):
+    # REST format e.g. 2002-09-20T01:16:41.400Z, see timestamp_rest_format
+    return datetime.datetime.fromisoformat(value.rstrip('Z'))
+
+
+# parsers of REST key values (json) into values as returned by python driver, for types used in keys
+_REST_KEY_PARSERS = {
+    'int': int,
+    'bigint': int,
+    'smallint': int,
+    'tinyint': int,
+    'varint': int,
+    'counter': int,
+    'text': str,
+    'varchar': str,
+    'ascii': str,
+    'boolean': bool,
+    'uuid': uuid.UUID,
+    'timeuuid': uuid.UUID,
+    'timestamp': _parse_rest_timestamp,
+    'date': Date,
+    'time': Time,
+    'inet': str,
+    # REST floats are shortest decimal forms of the stored value, they serialize into the same bytes
+    'float': float,
+    'double': float,
+    # no decimal: json number loses the scale which is a part of the serialized value
+}
+
+
+def compile_rest_key_parser(cql_type):
+    """
+    :param cql_type: parsed CQL type of a key column
+    :return: function converting REST json value into driver value or None if type is not supported
+    """
+    parse = _REST_KEY_PARSERS.get(cql_type.name)
+    if parse is None or cql_type.subtypes:
+        return None
+    return lambda v: None if v is None else parse(v)
+
+
+def compile_partition_token(partition_key_types):
+    """
+    :param partition_key_types: parsed CQL types of partition key columns
+    :return: function(values as returned by driver) -> Murmur3 token value, None if types are not supported
+    """
+    try:
+        serializers = [cqltypes._cqltypes[t.name] for t in partition_key_types]
+    except KeyError:
+        return None
+    if any(t.subtypes for t in partition_key_types):
+        return None
+    if len(serializers) == 1:
+        serialize = serializers[0].serialize
+        return lambda values: Murmur3Token.from_key(serialize(values[0], PROTOCOL_VERSION)).value
+
+    def composite_token(values):
+        # composite routing key: for every component 2 bytes of length, bytes and 0 byte
+        parts = []
+        for serializer, value in zip(serializers, values):
+            data = serializer.serialize(value, PROTOCOL_VERSION)
+            parts.append(struct.pack('>H', len(data)) + data + b'\x00')
+        return Murmur3Token.from_key(b''.join(parts)).value
+
+    return composite_token
@@ -0,0 +1,290 @@
+"""
+In-process stand-in for a Cassandra cluster and python driver session, good enough to run the harness offline.
+Only queries built by the harness itself are supported (see test.common.cql.statements and objects).
+"""
+import bisect
+import hashlib
+import re
+import threading
+import uuid
+
+from cassandra import InvalidRequest
+from cassandra.cluster import ResultSet
+from cassandra.metadata import Metadata
+from cassandra.query import SimpleStatement
+
+from test.common.cql.cql_types import parse_cql_type
+from test.common.cql.random_schema import RandomRowGenerator
+from test.common.cql.tokens import compile_partition_token
+
+MURMUR3_PARTITIONER = 'org.apache.cassandra.dht.Murmur3Partitioner'
+
+_NAME = r'"((?:[^"]|"")+)"'
+SELECT_BY_KEY_RE = re.compile(r'^SELECT \* FROM {n}\.{n} WHERE (.+)$'.format(n=_NAME))
+SELECT_HEAD_RE = re.compile(r'^SELECT \* FROM {n}\.{n} LIMIT (\d+)$'.format(n=_NAME))
+SELECT_ALL_RE = re.compile(r'^SELECT \* FROM {n}\.{n}$'.format(n=_NAME))
+TOKEN_RANGE_RE = re.compile(r'^SELECT token\([^)]*\) AS {n}, (.+) FROM {n}\.{n} '
+                            r'WHERE token\([^)]*\) > \? AND token\([^)]*\) <= \? LIMIT \?$'.format(n=_NAME))
+KEY_CONDITION_RE = re.compile(r'^{n}=\?$'.format(n=_NAME))
+SCHEMA_VERSION_QUERY = 'SELECT schema_version FROM system.local'
+
+
+def _name(quoted):
+    return quoted.replace('""', '"')
+
+
+def token(partition_key):
+    """
+    Stable 64 bit token of the partition key values, stands in for murmur3 for types it can't serialize
+    """
+    digest = hashlib.blake2b(repr(partition_key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class FakeTable:
+    """
+    Rows of a single table kept in token order, partition key -> clustering key -> row
+    """
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.partition_key = [c.name for c in metadata.partition_key]
+        self.clustering_key = [c.name for c in metadata.clustering_key]
+        self.partitions = {}
+        self.token = compile_partition_token([parse_cql_type(c.cql_type) for c in metadata.partition_key]) or token
+        self._ring = []
+        self._lock = threading.Lock()
+
+    def insert(self, row):
+        pk = tuple(row[c] for c in self.partition_key)
+        ck = tuple(row[c] for c in self.clustering_key)
+        with self._lock:
+            partition = self.partitions.get(pk)
+            if partition is None:
+                partition = self.partitions[pk] = {}
+                bisect.insort(self._ring, (self.token(pk), pk))
+            partition[ck] = dict(row)
+
+    def delete(self, pk, ck_prefix=()):
+        with self._lock:
+            partition = self.partitions.get(pk)
+            if partition is None:
+                return
+            for ck in [ck for ck in partition if ck[:len(ck_prefix)] == tuple(ck_prefix)]:
+                del partition[ck]
+            if not partition:
+                del self.partitions[pk]
+                self._ring.remove((self.token(pk), pk))
+
+    def select(self, pk, ck_prefix=()):
+        partition = self.partitions.get(pk, {})
+        return [dict(row) for ck, row in sorted(partition.items()) if ck[:len(ck_prefix)] == tuple(ck_prefix)]
+
+    def scan(self, after_token=None, to_token=None):
+        """
+        Yields (token, row) in token order for tokens in (after_token, to_token]
+        """
+        with self._lock:
+            ring = list(self._ring)
+        start = 0 if after_token is None else bisect.bisect_right(ring, (after_token, ()))
+        # keys of the same token are compared by partition key, so skip them explicitly
+        while start < len(ring) and after_token is not None and ring[start][0] <= after_token:
+            start += 1
+        for tok, pk in ring[start:]:
+            if to_token is not None and tok > to_token:
+                return
+            for row in self.select(pk):
+                yield tok, row
+
+
+class FakeDatabase:
+    """
+    Schema (driver metadata objects) and data of the fake cluster shared by fake CQL sessions and REST server
+    """
+
+    def __init__(self):
+        self.metadata = Metadata()
+        self.metadata.partitioner = MURMUR3_PARTITIONER
+        self.tables = {}
+        self.schema_version = uuid.uuid4()
+
+    def add_keyspace(self, keyspace_metadata):
+        self.metadata.keyspaces[keyspace_metadata.name] = keyspace_metadata
+        self.schema_version = uuid.uuid4()
+        for name, table_metadata in keyspace_metadata.tables.items():
+            self.tables[(keyspace_metadata.name, name)] = FakeTable(table_metadata)
+
+    def table(self, ks, table):
+        try:
+            return self.tables[(ks, table)]
+        except KeyError:
+            raise InvalidRequest("table {ks}.{t} does not exist".format(ks=ks, t=table))
+
+    def populate(self, rng, rows_per_table):
+        for (ks, _), table in sorted(self.tables.items()):
+            generator = RandomRowGenerator(table.metadata, self.metadata.keyspaces[ks].user_types)
+            for row in generator.rows(rng, rows_per_table):
+                table.insert(row)
+
+
+class FakeCluster:
+
+    def __init__(self, database):
+        self.metadata = database.metadata
+        self.schema_metadata_enabled = True
+
+    def shutdown(self):
+        pass
+
+
+class FakePreparedStatement:
+
+    def __init__(self, query_string):
+        self.query_string = query_string
+        self.fetch_size = None
+
+    def bind(self, values):
+        return FakeBoundStatement(self, values)
+
+
+class FakeBoundStatement:
+
+    def __init__(self, prepared_statement, values):
+        self.prepared_statement = prepared_statement
+        self.values = values
+        self.fetch_size = prepared_statement.fetch_size
+
+
+class FakeResponseFuture:
+    """
+    Already completed ResponseFuture, rows are paged lazily using fetch_size like the real driver does
+    """
+
+    _col_names = None
+    _col_types = None
+    _continuous_paging_session = None
+
+    def __init__(self, rows, fetch_size):
+        self._rows = iter(rows)
+        self._fetch_size = fetch_size or 5000
+        self._page = []
+        self.has_more_pages = True
+        self.start_fetching_next_page()
+
+    def start_fetching_next_page(self):
+        self._page = []
+        for row in self._rows:
+            self._page.append(row)
+            if len(self._page) >= self._fetch_size:
+                return
+        self.has_more_pages = False
+
+    def result(self):
+        return ResultSet(self, self._page)
+
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None,
+                      errback_args=(), errback_kwargs=None):
+        callback(self._page, *callback_args, **(callback_kwargs or {}))
+
+    def clear_callbacks(self):
+        pass
+
+
+class FakeFailedFuture(FakeResponseFuture):
+
+    def __init__(self, exception):
+        super().__init__([], None)
+        self.exception = exception
+
+    def result(self):
+        raise self.exception
+
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None,
+                      errback_args=(), errback_kwargs=None):
+        errback(self.exception, *errback_args, **(errback_kwargs or {}))
+
+
+class FakeCQLSession:
+    """
+    Session over FakeDatabase returning rows as dicts (like dict_factory)
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.cluster = FakeCluster(database)
+        self.row_factory = None
+
+    def prepare(self, query):
+        return FakePreparedStatement(query)
+
+    def execute(self, query, parameters=None, **kwargs):
+        return self.execute_async(query, parameters).result()
+
+    def execute_async(self, query, parameters=None, **kwargs):
+        try:
+            query_string, parameters, fetch_size = self._unpack(query, parameters)
+            return FakeResponseFuture(self._run(query_string, parameters or ()), fetch_size)
+        except Exception as e:
+            return FakeFailedFuture(e)
+
+    def shutdown(self):
+        pass
+
+    @staticmethod
+    def _unpack(query, parameters):
+        if isinstance(query, FakeBoundStatement):
+            return query.prepared_statement.query_string, query.values, query.fetch_size
+        if isinstance(query, FakePreparedStatement):
+            return query.query_string, parameters, query.fetch_size
+        if isinstance(query, SimpleStatement):
+            return query.query_string, parameters, query.fetch_size
+        return query, parameters, None
+
+    def _run(self, query, parameters):
+        if query == SCHEMA_VERSION_QUERY:
+            return [{'schema_version': self.database.schema_version}]
+        match = TOKEN_RANGE_RE.match(query)
+        if match:
+            alias, columns, ks, table = match.groups()
+            return self._token_range(_name(ks), _name(table), _name(alias),
+                                     [_name(c.strip()[1:-1]) for c in columns.split(',')], *parameters)
+        match = SELECT_BY_KEY_RE.match(query)
+        if match:
+            ks, table, where = match.groups()
+            return self._select_by_key(_name(ks), _name(table), where.split(' AND '), parameters)
+        match = SELECT_HEAD_RE.match(query)
+        if match:
+            ks, table, limit = match.groups()
+            rows = (row for _, row in self.database.table(_name(ks), _name(table)).scan())
+            return (row for _, row in zip(range(int(limit)), rows))
+        match = SELECT_ALL_RE.match(query)
+        if match:
+            ks, table = match.groups()
+            return (row for _, row in self.database.table(_name(ks), _name(table)).scan())
+        raise InvalidRequest("fake session does not support query: {}".format(query))
+
+    def _select_by_key(self, ks, table, conditions, parameters):
+        fake_table = self.database.table(ks, table)
+        columns = []
+        for condition in conditions:
+            match = KEY_CONDITION_RE.match(condition.strip())
+            if not match:
+                raise InvalidRequest("fake session does not support condition: {}".format(condition))
+            columns.append(_name(match.group(1)))
+        values = dict(zip(columns, parameters))
+        n_partition = len(fake_table.partition_key)
+        if columns[:n_partition] != fake_table.partition_key or \
+                columns[n_partition:] != fake_table.clustering_key[:len(columns) - n_partition]:
+            raise InvalidRequest("only partition key and clustering key prefix are supported: {}".format(columns))
+        pk = tuple(values[c] for c in fake_table.partition_key)
+        ck_prefix = tuple(values[c] for c in columns[n_partition:])
+        return fake_table.select(pk, ck_prefix)
+
+    def _token_range(self, ks, table, alias, columns, after_token, to_token, limit):
+        fake_table = self.database.table(ks, table)
+        for n, (tok, row) in enumerate(fake_table.scan(after_token, to_token)):
+            if n >= limit:
+                return
+            selected = {alias: tok}
+            selected.update((c, row[c]) for c in columns)
+            yield selected
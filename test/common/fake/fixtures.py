@@ -0,0 +1,13 @@
+import pytest
+
+from test.common.config.bench_config import BenchConfig
+from test.common.fake.stargate import FakeStargate
+
+
+@pytest.fixture(scope="session")
+def offline_stargate():
+    config = BenchConfig()
+    stargate = FakeStargate(seed=config.seed, tables=config.tables, columns=config.columns,
+                            rows_per_table=config.rows_per_table, type_mix=config.type_mix)
+    with stargate:
+        yield stargate
@@ -0,0 +1,575 @@
+"""
+In-process stand-in for Stargate REST V1 (and auth) API and REST V2 rows by `where` serving data of a FakeDatabase
+"""
+import base64
+import datetime
+import itertools
+import json
+import logging
+import operator
+import re
+import threading
+import uuid
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from cassandra.util import Date, Duration, SortedSet, Time
+
+from test.common.config.rest_api_config import RESTApiConfig
+from test.common.cql.cql_types import parse_cql_type
+from test.common.test.checks import timestamp_rest_format
+
+LOG = logging.getLogger(__name__)
+
+
+def compile_rest_encoder(cql_type):
+    """
+    Compile parsed CQL type into function converting driver value into json value as returned by REST V1
+    """
+    name = cql_type.name
+    if cql_type.is_udt():
+        fields = [(f, compile_rest_encoder(t)) for f, t in zip(cql_type.field_names, cql_type.subtypes)]
+        return _nullable(lambda v: {f: encode(x) for (f, encode), x in zip(fields, v)})
+    if name in ('set', 'list', 'tuple'):
+        elems = [compile_rest_encoder(t) for t in cql_type.subtypes]
+        if name == 'tuple':
+            return _nullable(lambda v: [encode(x) for encode, x in zip(elems, v)])
+        elem = elems[0]
+        return _nullable(lambda v: [elem(x) for x in v])
+    if name == 'map':
+        key = compile_rest_encoder(cql_type.subtypes[0])
+        val = compile_rest_encoder(cql_type.subtypes[1])
+        return _nullable(lambda v: {str(key(k)): val(x) for k, x in v.items()})
+    if name == 'timestamp':
+        return _nullable(timestamp_rest_format)
+    if name == 'blob':
+        return _nullable(lambda v: base64.b64encode(v).decode())
+    if name == 'decimal':
+        return _nullable(float)
+    if name in ('uuid', 'timeuuid', 'date', 'time', 'inet', 'duration'):
+        return _nullable(str)
+    return lambda v: v
+
+
+def _nullable(encode):
+    return lambda v: None if v is None else encode(v)
+
+
+_LITERAL_TOKEN_RE = re.compile(r"""\s*('(?:[^']|'')*'|"(?:[^"]|"")*"|[\[\]{}(),:]|[^\s\[\]{}(),:'"]+)""")
+_DURATION_RE = re.compile(r'^(\d+)mo(\d+)d(\d+)ns$')
+
+
+def _duration(text):
+    match = _DURATION_RE.match(text)
+    if not match:
+        raise ValueError("invalid duration {}".format(text))
+    return Duration(*[int(x) for x in match.groups()])
+
+
+def _timestamp(text):
+    return datetime.datetime.fromisoformat(text[:-1] if text.endswith('Z') else text)
+
+
+def _blob(text):
+    if not text.startswith('0x'):
+        raise ValueError("invalid blob {}".format(text))
+    return bytes.fromhex(text[2:])
+
+
+_SCALAR_DECODERS = {
+    'int': int, 'bigint': int, 'smallint': int, 'tinyint': int, 'varint': int, 'counter': int,
+    'float': float, 'double': float, 'decimal': Decimal,
+    'boolean': lambda text: {'true': True, 'false': False}[text.lower()],
+    'uuid': uuid.UUID, 'timeuuid': uuid.UUID,
+    'timestamp': _timestamp, 'date': Date, 'time': Time, 'duration': _duration, 'blob': _blob,
+    'text': str, 'varchar': str, 'ascii': str, 'inet': str,
+}
+
+
+_WHERE_OPERATORS = {
+    '$eq': operator.eq, '$in': lambda value, values: value in values,
+    '$gt': operator.gt, '$gte': operator.ge, '$lt': operator.lt, '$lte': operator.le,
+}
+
+
+def _literal_tokens(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = _LITERAL_TOKEN_RE.match(text, pos)
+        if not match:
+            raise ValueError("can't parse CQL literal: {}".format(text))
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+
+def _unquote_literal(token):
+    if token[:1] in ("'", '"'):
+        return token[1:-1].replace(token[0] * 2, token[0])
+    return token
+
+
+def _expect(tokens, pos, token):
+    if pos >= len(tokens) or tokens[pos] != token:
+        raise ValueError("expected {e} in CQL literal at {p}".format(e=token, p=pos))
+    return pos + 1
+
+
+def _parse_items(tokens, pos, close, parse_item):
+    """
+    Parses comma separated items up to the closing bracket
+    :return: (list of items, position after the closing bracket)
+    """
+    items = []
+    if pos < len(tokens) and tokens[pos] == close:
+        return items, pos + 1
+    while True:
+        item, pos = parse_item(tokens, pos)
+        items.append(item)
+        if pos < len(tokens) and tokens[pos] == ',':
+            pos += 1
+            continue
+        return items, _expect(tokens, pos, close)
+
+
+def _compile_literal_parser(cql_type):
+    """
+    Compile parsed CQL type into function (tokens, pos) -> (driver value, position after the value)
+    """
+    name = cql_type.name
+    if cql_type.is_udt():
+        fields = dict(zip(cql_type.field_names, [_compile_literal_parser(t) for t in cql_type.subtypes]))
+        udt_class = namedtuple(name, cql_type.field_names)
+
+        def parse_field(tokens, pos):
+            field = _unquote_literal(tokens[pos])
+            if field not in fields:
+                raise ValueError("unknown field {f} of {t}".format(f=field, t=name))
+            value, pos = fields[field](tokens, _expect(tokens, pos + 1, ':'))
+            return (field, value), pos
+
+        def parse_udt(tokens, pos):
+            items, pos = _parse_items(tokens, _expect(tokens, pos, '{'), '}', parse_field)
+            values = dict(items)
+            return udt_class(*[values.get(f) for f in cql_type.field_names]), pos
+        parse = parse_udt
+    elif name in ('list', 'set', 'tuple'):
+        elems = [_compile_literal_parser(t) for t in cql_type.subtypes]
+        open_bracket, close_bracket, build = {'list': ('[', ']', list), 'set': ('{', '}', SortedSet),
+                                              'tuple': ('(', ')', tuple)}[name]
+
+        def parse_sequence(tokens, pos):
+            index = [0]
+
+            def parse_elem(tokens, pos):
+                # tuple elements have their own types, list and set elements share one
+                elem = elems[min(index[0], len(elems) - 1)]
+                index[0] += 1
+                return elem(tokens, pos)
+            items, pos = _parse_items(tokens, _expect(tokens, pos, open_bracket), close_bracket, parse_elem)
+            return build(items), pos
+        parse = parse_sequence
+    elif name == 'map':
+        key, val = [_compile_literal_parser(t) for t in cql_type.subtypes]
+
+        def parse_entry(tokens, pos):
+            k, pos = key(tokens, pos)
+            v, pos = val(tokens, _expect(tokens, pos, ':'))
+            return (k, v), pos
+
+        def parse_map(tokens, pos):
+            items, pos = _parse_items(tokens, _expect(tokens, pos, '{'), '}', parse_entry)
+            return OrderedDict(sorted(items)), pos
+        parse = parse_map
+    else:
+        decode = _SCALAR_DECODERS[name]
+
+        def parse(tokens, pos):
+            return decode(_unquote_literal(tokens[pos])), pos + 1
+
+    def parse_nullable(tokens, pos):
+        if pos >= len(tokens):
+            raise ValueError("unexpected end of CQL literal")
+        if tokens[pos] == 'null':
+            return None, pos + 1
+        return parse(tokens, pos)
+    return parse_nullable
+
+
+def compile_rest_value_decoder(cql_type):
+    """
+    Compile parsed CQL type into function converting value of REST V1 write request into driver value,
+    reverse of test.common.rest.rest_values.compile_rest_value_encoder
+    """
+    if cql_type.is_udt() or cql_type.name in ('list', 'set', 'map', 'tuple'):
+        parse = _compile_literal_parser(cql_type)
+
+        def decode(text):
+            tokens = _literal_tokens(text)
+            value, pos = parse(tokens, 0)
+            if pos != len(tokens):
+                raise ValueError("unexpected {t} in CQL literal {v}".format(t=tokens[pos], v=text))
+            return value
+        return _nullable(decode)
+    return _nullable(_SCALAR_DECODERS[cql_type.name])
+
+
+class FakeTableEndpoints:
+    """
+    REST view of a fake table: json encoders per column and index of partitions by REST key strings
+    """
+
+    def __init__(self, fake_table, user_types):
+        self.fake_table = fake_table
+        self._pk_index = {}
+        metadata = fake_table.metadata
+        self.types = {name: parse_cql_type(col.cql_type, user_types) for name, col in metadata.columns.items()}
+        self.encoders = [(name, compile_rest_encoder(t)) for name, t in self.types.items()]
+        self.decoders = {name: compile_rest_value_decoder(t) for name, t in self.types.items()}
+        self.definition = {
+            'name': metadata.name,
+            'keyspace': metadata.keyspace_name,
+            'columnDefinitions': [{'name': name, 'typeDefinition': col.cql_type, 'static': bool(col.is_static)}
+                                  for name, col in metadata.columns.items()],
+            'primaryKey': {'partitionKey': [c.name for c in metadata.partition_key],
+                           'clusteringKey': [c.name for c in metadata.clustering_key]},
+            'tableOptions': {'defaultTimeToLive': 0,
+                             'clusteringExpression': [{'column': c.name, 'order': 'Asc'}
+                                                      for c in metadata.clustering_key]},
+        }
+
+    def _key_string(self, column, value):
+        if self.types[column].name == 'timestamp':
+            return timestamp_rest_format(value)
+        return str(value)
+
+    def _pk_strings(self, pk):
+        return tuple(self._key_string(c, v) for c, v in zip(self.fake_table.partition_key, pk))
+
+    def _find_partition(self, pk_strings):
+        key = tuple(pk_strings)
+        pk = self._pk_index.get(key)
+        if pk is None or pk not in self.fake_table.partitions:
+            # partitions were added or removed since the index was built
+            self._pk_index = {self._pk_strings(pk): pk for pk in list(self.fake_table.partitions)}
+            pk = self._pk_index.get(key)
+        return pk
+
+    def _select_keys(self, key_strings):
+        n_partition = len(self.fake_table.partition_key)
+        if len(key_strings) < n_partition:
+            return None, None
+        pk = self._find_partition(key_strings[:n_partition])
+        if pk is None:
+            return None, None
+        ck_strings = key_strings[n_partition:]
+        cks = [ck for ck in self.fake_table.partitions.get(pk, {})
+               if [self._key_string(c, v) for c, v in zip(self.fake_table.clustering_key, ck)][:len(ck_strings)]
+               == ck_strings]
+        return pk, cks
+
+    def rows(self, key_strings):
+        pk, cks = self._select_keys(key_strings)
+        if pk is None:
+            return []
+        rows = [row for ck, row in sorted(self.fake_table.partitions.get(pk, {}).items()) if ck in cks]
+        return [{name: encode(row.get(name)) for name, encode in self.encoders} for row in rows]
+
+    def page(self, page_size, page_state=None):
+        """
+        Rows in token order like a paged SELECT * does,
+        page state encodes token of the last partition and number of its rows already returned
+        :return: (rows, page state of the next page or None)
+        """
+        after_token, last_token, returned = None, None, 0
+        if page_state:
+            last_token, returned = json.loads(base64.b64decode(page_state))
+            after_token = last_token - 1
+        skip = returned
+        rows = []
+        for tok, row in self.fake_table.scan(after_token):
+            if skip:
+                skip -= 1
+                continue
+            if len(rows) == page_size:
+                state = json.dumps([last_token, returned]).encode()
+                return rows, base64.b64encode(state).decode()
+            returned = returned + 1 if tok == last_token else 1
+            last_token = tok
+            rows.append({name: encode(row.get(name)) for name, encode in self.encoders})
+        return rows, None
+
+    def _where_value(self, column, value):
+        if self.types[column].name == 'blob':
+            return base64.b64decode(value)
+        return self.decoders[column](value if isinstance(value, str) else str(value))
+
+    def rows_where(self, where):
+        """
+        Rows matching `where` of REST V2 like a SELECT with WHERE does:
+        $eq or $in on every partition key column, $eq, $in and ranges on clustering columns
+        :param where: dict column -> {operator: value}
+        """
+        table = self.fake_table
+        unknown = [c for c in where if c not in self.types]
+        if unknown:
+            raise ValueError("unknown columns {}".format(unknown))
+        pk_choices = []
+        for column in table.partition_key:
+            condition = where.get(column) or {}
+            if '$eq' in condition:
+                values = [condition['$eq']]
+            elif '$in' in condition:
+                values = condition['$in']
+            else:
+                raise ValueError("partition key column {} requires $eq or $in".format(column))
+            strings = [self._key_string(column, self._where_value(column, v)) for v in values]
+            pk_choices.append(list(OrderedDict.fromkeys(strings)))
+        filters = []
+        for column, condition in where.items():
+            if column in table.partition_key:
+                continue
+            if column not in table.clustering_key:
+                raise ValueError("column {} is not a primary key column".format(column))
+            for op, value in condition.items():
+                if op not in _WHERE_OPERATORS:
+                    raise ValueError("unsupported operator {}".format(op))
+                value = [self._where_value(column, v) for v in value] if op == '$in' else \
+                    self._where_value(column, value)
+                filters.append((table.clustering_key.index(column), _WHERE_OPERATORS[op], value))
+        rows = []
+        for pk_strings in itertools.product(*pk_choices):
+            pk = self._find_partition(pk_strings)
+            if pk is None:
+                continue
+            for ck, row in sorted(table.partitions.get(pk, {}).items()):
+                if all(matches(ck[i], value) for i, matches, value in filters):
+                    rows.append({name: encode(row.get(name)) for name, encode in self.encoders})
+        return rows
+
+    def write(self, values, key_strings=None):
+        """
+        Upsert like CQL INSERT or UPDATE does, columns not given keep their values
+        :param values: dict column -> value of the write request
+        :param key_strings: values of all primary key columns from the url of UPDATE, taken from `values` if None
+        """
+        table = self.fake_table
+        key = table.partition_key + table.clustering_key
+        row = {name: self.decoders[name](value) for name, value in values.items()}
+        if key_strings is not None:
+            if len(key_strings) != len(key):
+                raise ValueError("all primary key columns are required, got {}".format(key_strings))
+            if set(row) & set(key):
+                raise ValueError("primary key columns can't be updated")
+            row.update((c, self.decoders[c](s)) for c, s in zip(key, key_strings))
+        missing = [c for c in key if row.get(c) is None]
+        if missing:
+            raise ValueError("missing primary key columns {}".format(missing))
+        pk = tuple(row[c] for c in table.partition_key)
+        ck = tuple(row[c] for c in table.clustering_key)
+        existing = table.partitions.get(pk, {}).get(ck)
+        merged = dict(existing) if existing else {name: None for name in self.types}
+        merged.update(row)
+        table.insert(merged)
+
+    def delete(self, key_strings):
+        pk, cks = self._select_keys(key_strings)
+        if pk is None:
+            return
+        for ck in cks:
+            self.fake_table.delete(pk, ck)
+
+
+class FakeRESTServer:
+    """
+    Serves REST V1 endpoints used by RESTApiV1 and RESTAuth on a random local port:
+    auth, keyspaces, tables, table definition, paged table rows, add row, rows by key (GET, PUT and DELETE),
+    and REST V2 paged rows by `where` used by RESTApiV2, only tokens issued by the server are accepted
+    """
+
+    def __init__(self, database, host='127.0.0.1', port=0):
+        self.database = database
+        self.tokens = set()
+        self.auth_requests = 0
+        self._tables = {}
+        self._tables_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def config(self):
+        """
+        :return: RESTApiConfig pointing at this server
+        """
+        config = RESTApiConfig()
+        config.host = self.httpd.server_address[0]
+        config.hosts = [config.host]
+        config.auth_api_port = self.port
+        config.rest_api_port = self.port
+        config.api_prefix = ''
+        return config
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-stargate-rest', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def table_endpoints(self, ks, table):
+        with self._tables_lock:
+            endpoints = self._tables.get((ks, table))
+            if endpoints is None:
+                fake_table = self.database.tables.get((ks, table))
+                if fake_table is None:
+                    return None
+                user_types = self.database.metadata.keyspaces[ks].user_types
+                endpoints = self._tables[(ks, table)] = FakeTableEndpoints(fake_table, user_types)
+            return endpoints
+
+    def expire_tokens(self):
+        """
+        Make all issued tokens invalid, requests using them are rejected with 401
+        """
+        self.tokens = set()
+
+    def handle(self, method, path, token=None, body=None):
+        """
+        :param body: decoded json body of the request
+        :return: (status, json body or None)
+        """
+        parts = [unquote(x) for x in urlsplit(path).path.strip('/').split('/')]
+        if parts[0] not in ('v1', 'v2'):
+            return 404, {'description': 'not found'}
+        version, parts = parts[0], parts[1:]
+        keyspaces = self.database.metadata.keyspaces
+        if version == 'v1' and method == 'POST' and parts == ['auth']:
+            token = str(uuid.uuid4())
+            self.tokens.add(token)
+            self.auth_requests += 1
+            return 201, {'authToken': token}
+        if token not in self.tokens:
+            return 401, {'description': 'Missing or invalid token'}
+        if version == 'v2':
+            return self._handle_v2(method, path, parts)
+        if method == 'GET' and parts == ['keyspaces']:
+            return 200, sorted(keyspaces)
+        if len(parts) < 3 or parts[0] != 'keyspaces' or parts[1] not in keyspaces or parts[2] != 'tables':
+            return 404, {'description': 'not found'}
+        ks = parts[1]
+        if method == 'GET' and len(parts) == 3:
+            return 200, sorted(keyspaces[ks].tables)
+        endpoints = self.table_endpoints(ks, parts[3])
+        if endpoints is None:
+            return 400, {'description': 'table {} not found'.format(parts[3])}
+        if method == 'GET' and len(parts) == 4:
+            return 200, endpoints.definition
+        if method == 'GET' and len(parts) == 5 and parts[4] == 'rows':
+            query = parse_qs(urlsplit(path).query)
+            page_size = int(query.get('pageSize', ['100'])[0])
+            rows, page_state = endpoints.page(page_size, query.get('pageState', [None])[0])
+            body = {'rows': rows, 'count': len(rows)}
+            if page_state:
+                body['pageState'] = page_state
+            return 200, body
+        if method == 'POST' and len(parts) == 5 and parts[4] == 'rows':
+            try:
+                endpoints.write({c['name']: c.get('value') for c in (body or {}).get('columns') or []})
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, {'description': 'bad request: {}'.format(e)}
+            return 201, {'success': True}
+        if len(parts) == 6 and parts[4] == 'rows':
+            key_strings = parts[5].split(';')
+            if method == 'PUT':
+                try:
+                    endpoints.write({c['column']: c.get('value') for c in (body or {}).get('changeset') or []},
+                                    key_strings)
+                except (ValueError, KeyError, TypeError) as e:
+                    return 400, {'description': 'bad request: {}'.format(e)}
+                return 200, {'success': True}
+            if method == 'GET':
+                rows = endpoints.rows(key_strings)
+                return 200, {'rows': rows, 'count': len(rows)}
+            if method == 'DELETE':
+                endpoints.delete(key_strings)
+                return 204, None
+        return 404, {'description': 'not found'}
+
+    def _handle_v2(self, method, path, parts):
+        """
+        REST V2 rows by `where`: GET keyspaces/{ks}/{table}?where=...&page-size=...&page-state=...
+        """
+        keyspaces = self.database.metadata.keyspaces
+        if method != 'GET' or len(parts) != 3 or parts[0] != 'keyspaces' or parts[1] not in keyspaces:
+            return 404, {'description': 'not found'}
+        endpoints = self.table_endpoints(parts[1], parts[2])
+        if endpoints is None:
+            return 400, {'description': 'table {} not found'.format(parts[2])}
+        query = parse_qs(urlsplit(path).query)
+        try:
+            rows = endpoints.rows_where(json.loads(query['where'][0]))
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'description': 'bad request: {}'.format(e)}
+        page_size = int(query.get('page-size', ['100'])[0])
+        page_state = query.get('page-state', [None])[0]
+        offset = json.loads(base64.b64decode(page_state)) if page_state else 0
+        body = {'count': len(rows[offset:offset + page_size]), 'data': rows[offset:offset + page_size]}
+        if offset + page_size < len(rows):
+            body['pageState'] = base64.b64encode(json.dumps(offset + page_size).encode()).decode()
+        return 200, body
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body are written separately, don't wait for delayed ACK between them
+            disable_nagle_algorithm = True
+
+            def _respond(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length)) if length else None
+                try:
+                    status, body = server.handle(method, self.path, self.headers.get('x-cassandra-token'), request)
+                except Exception as e:
+                    LOG.exception("fake REST server failed")
+                    status, body = 500, {'description': str(e)}
+                payload = json.dumps(body, default=_json_default).encode() if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def do_PUT(self):
+                self._respond('PUT')
+
+            def do_DELETE(self):
+                self._respond('DELETE')
+
+            def log_message(self, format, *args):
+                LOG.debug(format, *args)
+
+        return Handler
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
@@ -0,0 +1,58 @@
+import random
+
+from test.common.cql.random_schema import RandomSchemaGenerator
+from test.common.fake.cql import FakeCQLSession, FakeDatabase
+from test.common.fake.rest_server import FakeRESTServer
+from test.common.rest.rest_v1_api import RESTApiV1
+from test.common.rest.rest_v2_api import RESTApiV2
+from test.common.rest.token_provider import TokenProvider
+
+
+class FakeStargate:
+    """
+    Offline stand-in for Stargate with a populated backend: random schema and data in FakeDatabase
+    available through fake CQL sessions and a local REST V1 server, e.g.
+
+        with FakeStargate(seed=1, tables=4, rows_per_table=1000) as stargate:
+            RowComparator(stargate.cql_session(), stargate.rest_v1())...
+    """
+
+    def __init__(self, seed=0, keyspace='fuzz', tables=4, columns=8, rows_per_table=1000, type_mix=None):
+        self.database = FakeDatabase()
+        schema = RandomSchemaGenerator(seed, keyspace=keyspace, tables=tables, columns=columns, type_mix=type_mix)
+        self.database.add_keyspace(schema.keyspace_metadata())
+        self.database.populate(random.Random(seed), rows_per_table)
+        self.server = FakeRESTServer(self.database)
+
+    def start(self):
+        self.server.start()
+        return self
+
+    def stop(self):
+        self.server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def rows(self):
+        """
+        :return: number of rows in all tables
+        """
+        return sum(len(p) for table in self.database.tables.values() for p in table.partitions.values())
+
+    def cql_session(self):
+        """
+        :return: new session, with its own prepared statements and schema caches
+        """
+        return FakeCQLSession(self.database)
+
+    def rest_v1(self, pool_size=None):
+        config = self.server.config()
+        return RESTApiV1(config, TokenProvider(config, cache_path=''), pool_size=pool_size)
+
+    def rest_v2(self, pool_size=None):
+        config = self.server.config()
+        return RESTApiV2(config, TokenProvider(config, cache_path=''), pool_size=pool_size)
@@ -0,0 +1,99 @@
+from collections import defaultdict
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram in the spirit of HdrHistogram: latencies (in microseconds) are counted
+    in buckets with relative width below 1/2^(SUB_BUCKET_BITS-1) so percentiles are within ~1.5%
+    and memory depends only on the range of recorded values, not on their number.
+    Histograms are mergeable and can be saved with to_json() and restored with from_json().
+    """
+
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @classmethod
+    def _bucket(cls, value):
+        shift = max(value.bit_length() - cls.SUB_BUCKET_BITS, 0)
+        return (shift << cls.SUB_BUCKET_BITS) | (value >> shift)
+
+    @classmethod
+    def _bucket_highest_value(cls, bucket):
+        shift = bucket >> cls.SUB_BUCKET_BITS
+        mantissa = bucket & ((1 << cls.SUB_BUCKET_BITS) - 1)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, micros):
+        micros = max(int(micros), 0)
+        self.counts[self._bucket(micros)] += 1
+        self.count += 1
+        self.total += micros
+        self.min = micros if self.min is None else min(self.min, micros)
+        self.max = max(self.max, micros)
+
+    def record_seconds(self, seconds):
+        self.record(seconds * 1000000)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def value_at_percentile(self, percentile):
+        """
+        :return: highest value (microseconds) below which `percentile` % of recorded values are
+        """
+        if self.count == 0:
+            return 0
+        threshold = max(1, int(round(self.count * percentile / 100.0)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= threshold:
+                return min(self._bucket_highest_value(bucket), self.max)
+        return self.max
+
+    def summary(self):
+        """
+        :return: count and latencies in milliseconds
+        """
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count / 1000.0, 3) if self.count else 0,
+            'p50': self.value_at_percentile(50) / 1000.0,
+            'p90': self.value_at_percentile(90) / 1000.0,
+            'p99': self.value_at_percentile(99) / 1000.0,
+            'p999': self.value_at_percentile(99.9) / 1000.0,
+            'max': self.max / 1000.0,
+        }
+
+    def to_json(self):
+        return {
+            'counts': {str(bucket): count for bucket, count in self.counts.items()},
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_json(cls, value):
+        histogram = cls()
+        for bucket, count in value['counts'].items():
+            histogram.counts[int(bucket)] = count
+        histogram.count = value['count']
+        histogram.total = value['total']
+        histogram.min = value['min']
+        histogram.max = value['max']
+        return histogram
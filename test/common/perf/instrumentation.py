@@ -0,0 +1,130 @@
+"""
+Lightweight instrumentation of the harness: instrumented code reports how long a phase took
+(REST request, JSON decoding, CQL query, comparison) for an endpoint template and listeners
+aggregate it. When no listener is registered the cost is a single `enabled()` check.
+"""
+import threading
+from collections import defaultdict
+
+from test.common.perf.histogram import LatencyHistogram
+
+REST = 'rest'
+DECODE = 'decode'
+CQL = 'cql'
+COMPARE = 'compare'
+# requests per Stargate node, endpoint is the node
+NODE = 'node'
+
+_listeners = ()
+_listeners_lock = threading.Lock()
+
+
+def enabled():
+    return bool(_listeners)
+
+
+def add_listener(listener):
+    """
+    :param listener: callable(phase, endpoint, seconds, count, size, status)
+    """
+    global _listeners
+    with _listeners_lock:
+        _listeners = _listeners + (listener,)
+
+
+def remove_listener(listener):
+    global _listeners
+    with _listeners_lock:
+        _listeners = tuple(x for x in _listeners if x is not listener)
+
+
+def emit(phase, endpoint, seconds, count=1, size=0, status=None):
+    """
+    Report a phase that took `seconds`
+    :param count: number of items (e.g. keys in a bulk query) processed
+    :param size: number of bytes received
+    """
+    for listener in _listeners:
+        listener(phase, endpoint, seconds, count, size, status)
+
+
+class PhaseStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.count = 0
+        self.seconds = 0.0
+        self.size = 0
+        self.errors = 0
+        self.histogram = LatencyHistogram()
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.count += other.count
+        self.seconds += other.seconds
+        self.size += other.size
+        self.errors += other.errors
+        self.histogram.merge(other.histogram)
+
+    def to_json(self):
+        return {'calls': self.calls, 'count': self.count, 'seconds': self.seconds, 'size': self.size,
+                'errors': self.errors, 'histogram': self.histogram.to_json()}
+
+    @classmethod
+    def from_json(cls, value):
+        stats = cls()
+        stats.calls = value['calls']
+        stats.count = value['count']
+        stats.seconds = value['seconds']
+        stats.size = value['size']
+        stats.errors = value['errors']
+        stats.histogram = LatencyHistogram.from_json(value['histogram'])
+        return stats
+
+
+class StatsCollector:
+    """
+    Listener aggregating events per (phase, endpoint)
+    """
+
+    def __init__(self):
+        self.stats = defaultdict(PhaseStats)
+        self._lock = threading.Lock()
+
+    def __call__(self, phase, endpoint, seconds, count, size, status):
+        with self._lock:
+            stats = self.stats[(phase, endpoint)]
+            stats.calls += 1
+            stats.count += count
+            stats.seconds += seconds
+            stats.size += size
+            if status is not None and not 200 <= status < 300:
+                stats.errors += 1
+            stats.histogram.record_seconds(seconds)
+
+    def merge(self, other):
+        with self._lock:
+            for key, stats in other.stats.items():
+                self.stats[key].merge(stats)
+
+    def to_json(self):
+        return [{'phase': phase, 'endpoint': endpoint, **stats.to_json(),
+                 'latency': stats.histogram.summary()}
+                for (phase, endpoint), stats in sorted(self.stats.items())]
+
+    @classmethod
+    def from_json(cls, value):
+        collector = cls()
+        for entry in value:
+            collector.stats[(entry['phase'], entry['endpoint'])] = PhaseStats.from_json(entry)
+        return collector
+
+    def summary_lines(self):
+        lines = ['{:<8} {:<48} {:>8} {:>9} {:>10} {:>9} {:>9} {:>10} {:>6}'.format(
+            'phase', 'endpoint', 'calls', 'items', 'total[s]', 'mean[ms]', 'p99[ms]', 'recv[MB]', 'errors')]
+        for (phase, endpoint), stats in sorted(self.stats.items(), key=lambda x: -x[1].seconds):
+            lines.append('{:<8} {:<48} {:>8} {:>9} {:>10.3f} {:>9.3f} {:>9.3f} {:>10.3f} {:>6}'.format(
+                phase, endpoint, stats.calls, stats.count, stats.seconds,
+                stats.seconds * 1000 / stats.calls, stats.histogram.value_at_percentile(99) / 1000.0,
+                stats.size / 1000000.0, stats.errors))
+        return lines
@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from test.common.perf import instrumentation
+from test.common.perf.instrumentation import StatsCollector
+
+WORKER_OUTPUT_KEY = 'stargate_instrumentation'
+
+
+def addoption(parser):
+    group = parser.getgroup('stargate-fuzz')
+    group.addoption('--instrument', action='store_true', default=bool(os.environ.get('TEST_INSTRUMENT')),
+                    help='record time spent in REST, JSON decoding, CQL and comparison per endpoint')
+    group.addoption('--instrument-report', default=os.environ.get('TEST_INSTRUMENT_REPORT'),
+                    help='json file to write instrumentation stats to (implies --instrument)')
+
+
+def is_requested(config):
+    return config.getoption('instrument') or config.getoption('instrument_report')
+
+
+class InstrumentationPlugin:
+    """
+    Collects instrumentation events for the whole run, prints them in the terminal summary and saves as json.
+    With pytest-xdist every worker sends its stats to the controller which merges them.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.collector = StatsCollector()
+        instrumentation.add_listener(self.collector)
+
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(self.config, 'workeroutput', None)
+        if workeroutput is not None:
+            workeroutput[WORKER_OUTPUT_KEY] = json.dumps(self.collector.to_json())
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        output = getattr(node, 'workeroutput', {}).get(WORKER_OUTPUT_KEY)
+        if output:
+            self.collector.merge(StatsCollector.from_json(json.loads(output)))
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if getattr(self.config, 'workeroutput', None) is not None:
+            return
+        terminalreporter.write_sep('=', 'stargate-fuzz instrumentation')
+        for line in self.collector.summary_lines():
+            terminalreporter.write_line(line)
+        path = self.config.getoption('instrument_report')
+        if path:
+            with open(path, 'w') as f:
+                json.dump(self.collector.to_json(), f, indent=2)
+            terminalreporter.write_line('instrumentation stats saved to {}'.format(path))
+
+    def pytest_unconfigure(self, config):
+        instrumentation.remove_listener(self.collector)
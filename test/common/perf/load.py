@@ -0,0 +1,321 @@
+"""
+Sustained load against Stargate REST V1 with random keys sampled from the tables under test.
+
+GET and DELETE by key are sent at a target rate by a pool of workers for a given duration,
+a fraction of GET responses is checked against rows of the key read with CQL before the load (with DELETEs applied).
+Latencies are recorded per endpoint and status in HDR-style histograms and reported as json e.g.
+
+    python -m test.common.perf.load --rate 500 --concurrency 32 --duration 60 --report load.json
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+from test.common.config.rest_api_config import RESTApiConfig
+from test.common.config.test_config import TestConfig
+from test.common.cql.cql_tools import CQLConnection
+from test.common.cql.statements import cql_rows_by_keys, select_by_key_query, SELECT_BY_KEY_ENDPOINT
+from test.common.perf.histogram import LatencyHistogram
+from test.common.rest.rest_v1_api import RESTApiV1, TABLE_ROWS_BY_PK
+from test.common.rest.token_provider import shared_token_provider
+from test.common.test.checks import cql_row_columns_to_rest_values
+from test.common.test.objects import select_tables_for_test, some_table_data_with_keys
+from test.common.test.row_compare import RowComparator
+from test.common.test.schema_index import table_schema
+
+LOG = logging.getLogger(__name__)
+
+MAX_MISMATCH_EXAMPLES = 10
+
+
+class LoadStats:
+    """
+    Latency histograms per (endpoint, status) and correctness counters, safe to update from many threads.
+    Latencies of checks (CQL reference queries) are kept apart from the load, so they don't count
+    in requests, throughput and error rate.
+    """
+
+    def __init__(self):
+        self.histograms = defaultdict(LatencyHistogram)
+        self.check_histograms = defaultdict(LatencyHistogram)
+        self.checked = 0
+        self.ambiguous = 0
+        self.mismatches = 0
+        self.mismatch_examples = []
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, status, seconds):
+        with self._lock:
+            self.histograms[(endpoint, str(status))].record_seconds(seconds)
+
+    def record_check_latency(self, endpoint, status, seconds):
+        with self._lock:
+            self.check_histograms[(endpoint, str(status))].record_seconds(seconds)
+
+    def record_ambiguous(self):
+        """
+        Response not checked, a concurrent DELETE may or may not have been applied when it was read
+        """
+        with self._lock:
+            self.ambiguous += 1
+
+    def record_check(self, mismatches):
+        with self._lock:
+            self.checked += 1
+            if mismatches:
+                self.mismatches += 1
+                if len(self.mismatch_examples) < MAX_MISMATCH_EXAMPLES:
+                    self.mismatch_examples.extend(mismatches)
+
+    def report(self, elapsed):
+        latency = defaultdict(dict)
+        requests = errors = 0
+        for (endpoint, status), histogram in sorted(self.histograms.items()):
+            latency[endpoint][status] = histogram.summary()
+            requests += histogram.count
+            if status != 'ok' and not status.startswith('2'):
+                errors += histogram.count
+        check_latency = defaultdict(dict)
+        for (endpoint, status), histogram in sorted(self.check_histograms.items()):
+            check_latency[endpoint][status] = histogram.summary()
+        return {
+            'elapsed': round(elapsed, 3),
+            'requests': requests,
+            'throughput': round(requests / elapsed, 1) if elapsed else 0,
+            'errors': errors,
+            'error_rate': round(errors / requests, 6) if requests else 0,
+            'checked': self.checked,
+            'ambiguous': self.ambiguous,
+            'mismatches': self.mismatches,
+            'mismatch_examples': self.mismatch_examples,
+            'latency': latency,
+            'check_latency': check_latency,
+            'histograms': {'{} {}'.format(endpoint, status): histogram.to_json()
+                           for (endpoint, status), histogram in self.histograms.items()},
+        }
+
+
+class Pacer:
+    """
+    Hands out start times of operations spread evenly at `rate` per second (unlimited if rate is 0).
+    Latency is measured from the intended start, so a slow server is not hidden
+    by workers sending less requests (coordinated omission).
+    """
+
+    def __init__(self, rate, start):
+        self.rate = rate
+        self.start = start
+        self._issued = 0
+        self._lock = threading.Lock()
+
+    def next_start(self):
+        if not self.rate:
+            return time.monotonic()
+        with self._lock:
+            intended = self.start + self._issued / self.rate
+            self._issued += 1
+        delay = intended - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return intended
+
+
+class LoadRunner:
+    """
+    When responses are checked, expected rows of all keys are read with CQL before the load starts
+    and DELETEs sent during the load are applied to them, so a GET is never compared with a CQL read
+    racing with deletes. A GET overlapping in time with a DELETE of its rows can see rows before or after
+    the delete, it is counted as ambiguous instead of being checked.
+    """
+
+    def __init__(self, cql_session, rest_v1, keys, rate, concurrency, duration,
+                 check_fraction=0.0, delete_fraction=0.0, seed=None):
+        """
+        :param keys: list of (ks, table, row, key_columns) to send requests for
+        :param rate: target operations per second for all workers, 0 for unlimited
+        :param check_fraction: fraction of GET responses compared with CQL reference query
+        :param delete_fraction: fraction of operations that are DELETE instead of GET
+        """
+        self.cql_session = cql_session
+        self.rest_v1 = rest_v1
+        self.keys = keys
+        self.rate = rate
+        self.concurrency = concurrency
+        self.duration = duration
+        self.check_fraction = check_fraction
+        self.delete_fraction = delete_fraction
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.stats = LoadStats()
+        self.comparator = RowComparator(cql_session, rest_v1)
+        # per key index: (success, rows or exception) read with CQL before the load
+        self.expected = [None] * len(keys)
+        # per (ks, table): list of [key values, started, finished or None while in flight] of sent DELETEs
+        self.deletes = defaultdict(list)
+        self._deletes_lock = threading.Lock()
+
+    def run(self):
+        if self.check_fraction:
+            self.snapshot()
+        start = time.monotonic()
+        pacer = Pacer(self.rate, start)
+        workers = [threading.Thread(target=self._worker, args=(pacer, start + self.duration, self.seed + i),
+                                    name='load-{}'.format(i), daemon=True)
+                   for i in range(self.concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return self.stats.report(time.monotonic() - start)
+
+    def snapshot(self):
+        """
+        Reads expected rows of all keys with CQL in bulk, one batch per table and key shape
+        """
+        batches = defaultdict(list)
+        for i, (ks, table, row, key_columns) in enumerate(self.keys):
+            batches[(ks, table, tuple(key_columns))].append(i)
+        for (ks, table, key_columns), indexes in batches.items():
+            start = time.monotonic()
+            results = cql_rows_by_keys(self.cql_session, ks, table, key_columns,
+                                       [tuple(self.keys[i][2][c] for c in key_columns) for i in indexes],
+                                       self.concurrency)
+            seconds = (time.monotonic() - start) / len(indexes)
+            for i, result in zip(indexes, results):
+                self.expected[i] = result
+                self.stats.record_check_latency(SELECT_BY_KEY_ENDPOINT, 'ok' if result[0] else 'error', seconds)
+
+    def _worker(self, pacer, end, seed):
+        rng = random.Random(seed)
+        while True:
+            intended = pacer.next_start()
+            if intended >= end:
+                return
+            i = rng.randrange(len(self.keys))
+            if rng.random() < self.delete_fraction:
+                self._delete(intended, i)
+            else:
+                self._get(intended, i, rng.random() < self.check_fraction)
+
+    def _rest_call(self, method, endpoint, intended, call):
+        try:
+            res = call()
+            status = res.status_code
+        except Exception as e:
+            LOG.debug("{m} failed: {e}".format(m=method, e=e))
+            res, status = None, 'error'
+        self.stats.record('{} {}'.format(method, endpoint), status, time.monotonic() - intended)
+        return res
+
+    def _get(self, intended, i, check):
+        ks, table, row, key_columns = self.keys[i]
+        schema = table_schema(self.cql_session, ks, table)
+        rest_values = cql_row_columns_to_rest_values(schema, row, key_columns)
+        sent = time.monotonic()
+        rest_res = self._rest_call('GET', TABLE_ROWS_BY_PK, intended,
+                                   lambda: self.rest_v1.get_table_rows_by_pk(ks, table, rest_values))
+        received = time.monotonic()
+        if not check or rest_res is None or not rest_res.ok:
+            return
+        success, cql_rows = self.expected[i]
+        if not success:
+            return
+        cql_rows = self._expected_rows(ks, table, row, key_columns, cql_rows, sent, received)
+        if cql_rows is None:
+            self.stats.record_ambiguous()
+            return
+        cql_query = '{q} {v}'.format(q=select_by_key_query(ks, table, key_columns), v=[row[c] for c in key_columns])
+        self.stats.record_check(self.comparator.compare_rows(ks, table, cql_query, rest_res.url,
+                                                             cql_rows, rest_res.value['rows']))
+
+    def _expected_rows(self, ks, table, row, key_columns, rows, sent, received):
+        """
+        :param rows: rows of the key before the load
+        :return: rows of the key after DELETEs finished before the GET was sent,
+            None if a DELETE of some of its rows ran at the same time as the GET
+        """
+        with self._deletes_lock:
+            deletes = list(self.deletes[(ks, table)])
+        applied = []
+        for delete_key, started, finished in deletes:
+            if started >= received:
+                continue
+            if any(row[c] != v for c, v in delete_key.items() if c in key_columns):
+                # keys share partition key and clustering prefix, different values never overlap
+                continue
+            if finished is None or finished > sent:
+                return None
+            applied.append(delete_key)
+        return [r for r in rows if not any(all(r[c] == v for c, v in key.items()) for key in applied)]
+
+    def _delete(self, intended, i):
+        ks, table, row, key_columns = self.keys[i]
+        schema = table_schema(self.cql_session, ks, table)
+        rest_values = cql_row_columns_to_rest_values(schema, row, key_columns)
+        delete = [{c: row[c] for c in key_columns}, time.monotonic(), None]
+        with self._deletes_lock:
+            self.deletes[(ks, table)].append(delete)
+        res = self._rest_call('DELETE', TABLE_ROWS_BY_PK, intended,
+                              lambda: self.rest_v1.delete_table_rows_by_pk(ks, table, rest_values))
+        if res is not None and res.ok:
+            # a failed DELETE may still have been applied, it stays in flight for the rest of the run
+            delete[2] = time.monotonic()
+
+
+def sample_keys(cql_session, keys_per_table, seed):
+    keys = []
+    for ks, table in select_tables_for_test(cql_session, skip_system=True):
+        for row, key_columns in some_table_data_with_keys(cql_session, ks, table, keys_per_table, seed=seed):
+            keys.append((ks, table, row, key_columns))
+    return keys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Sustained load against Stargate REST V1 with random keys')
+    parser.add_argument('--rate', type=float, default=100, help='target operations per second, 0 for unlimited')
+    parser.add_argument('--concurrency', type=int, default=TestConfig.concurrency(), help='number of workers')
+    parser.add_argument('--duration', type=float, default=60, help='duration in seconds')
+    parser.add_argument('--check-fraction', type=float, default=0.01,
+                        help='fraction of GET responses compared with CQL query')
+    parser.add_argument('--delete-fraction', type=float, default=0.0,
+                        help='fraction of operations that are DELETE by key')
+    parser.add_argument('--keys-per-table', type=int, default=TestConfig.sample_size(),
+                        help='number of keys sampled from every table')
+    parser.add_argument('--seed', type=int, default=None, help='seed for keys sampling and operations')
+    parser.add_argument('--report', default=None, help='json report file, printed to stdout if not given')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    cql_session = CQLConnection.shared_session()
+    try:
+        config = RESTApiConfig()
+        rest_v1 = RESTApiV1(config, shared_token_provider(config), pool_size=args.concurrency)
+        keys = sample_keys(cql_session, args.keys_per_table, seed)
+        if not keys:
+            raise SystemExit("no keys found in tables under test")
+        LOG.info("running load with {n} keys".format(n=len(keys)))
+        runner = LoadRunner(cql_session, rest_v1, keys, rate=args.rate, concurrency=args.concurrency,
+                            duration=args.duration, check_fraction=args.check_fraction,
+                            delete_fraction=args.delete_fraction, seed=seed)
+        report = runner.run()
+        report['config'] = dict(vars(args), seed=seed)
+    finally:
+        CQLConnection.shutdown_shared()
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 1 if report['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
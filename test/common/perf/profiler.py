@@ -0,0 +1,259 @@
+"""
+Profiling of the harness scoped to its own code: stacks start at the first harness frame and consecutive frames
+of other packages (driver, requests, json) are collapsed into a single `[package]` frame.
+Two profilers record the same thing, time per stack:
+- StackSampler samples stacks of all threads every `interval` seconds (low overhead, statistical)
+- StackTracer follows every python call and return in threads started while it runs and the current one
+  (exact, several times slower)
+ProfileResult writes stacks in collapsed format (flamegraph.pl, speedscope) and attributes time to harness phases.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PERF_DIR = os.path.dirname(os.path.abspath(__file__))
+HARNESS_DIR = os.path.dirname(os.path.dirname(PERF_DIR))
+ROOT_DIR = os.path.dirname(HARNESS_DIR)
+
+SAMPLE = 'sample'
+REST = 'rest'
+DECODE = 'decode'
+CQL = 'cql'
+COMPARE = 'compare'
+WAIT = 'wait'
+OTHER = 'other'
+
+# phase of time spent in harness modules, by file name of the innermost harness frame
+_HARNESS_PHASES = {
+    'objects.py': SAMPLE,
+    'scheduler.py': SAMPLE,
+    'random_schema.py': SAMPLE,
+    'api_client.py': REST,
+    'balancing.py': REST,
+    'rest_auth.py': REST,
+    'rest_util.py': REST,
+    'rest_v1_api.py': REST,
+    'rest_v2_api.py': REST,
+    'rest_values.py': REST,
+    'token_provider.py': REST,
+    'row_stream.py': DECODE,
+    'checks.py': COMPARE,
+    'corpus.py': COMPARE,
+    'cql_types.py': COMPARE,
+    'range_digest.py': COMPARE,
+    'replay.py': COMPARE,
+    'row_compare.py': COMPARE,
+    'schema_crawl.py': COMPARE,
+    'schema_index.py': COMPARE,
+    'table_scan.py': COMPARE,
+    'tokens.py': COMPARE,
+    'write_fuzz.py': COMPARE,
+    'cql_tools.py': CQL,
+    'statements.py': CQL,
+}
+# harness modules not run while rows are tested (setup, reporting, tools, the offline stand-in of Stargate),
+# their time is `other`; every module of test/common is in one of the two maps (see test/unit/profiler_test.py)
+_HARNESS_OTHER = {
+    'bench_config.py', 'rest_api_config.py', 'test_config.py',
+    'populate.py',
+    'cql.py', 'fixtures.py', 'rest_server.py', 'stargate.py',
+    'histogram.py', 'instrumentation.py', 'instrumentation_plugin.py', 'load.py', 'profiler.py',
+    'profiling_plugin.py',
+    'shard_report.py', 'xdist_scheduling.py',
+}
+# phase of time spent in other packages called by the harness, checked in this order
+_PACKAGE_PHASES = [
+    ({'cassandra'}, CQL),
+    ({'json', 'orjson'}, DECODE),
+    ({'requests', 'urllib3', 'http', 'socket', 'ssl'}, REST),
+    ({'threading', 'queue', 'concurrent', 'selectors'}, WAIT),
+]
+
+_labels = {}
+
+
+def _package(filename):
+    parts = filename.replace('\\', '/').split('/')
+    for marker in ('site-packages', 'dist-packages'):
+        if marker in parts[:-1]:
+            return parts[parts.index(marker) + 1].split('.')[0]
+    # standard library module or package
+    for i in range(len(parts) - 1, 0, -1):
+        if parts[i - 1].startswith('python'):
+            return parts[i].split('.')[0]
+    return os.path.splitext(parts[-1])[0]
+
+
+def frame_label(code):
+    """
+    :return: `path:function` for harness code, `[package]` for other code
+    """
+    label = _labels.get(code)
+    if label is None:
+        filename = os.path.abspath(code.co_filename)
+        if os.path.dirname(filename) == PERF_DIR and os.path.basename(filename).startswith('profil'):
+            # the profiler and its plugin are not a part of profiled stacks
+            label = '[profiler]'
+        elif filename.startswith(HARNESS_DIR + os.sep):
+            label = '{f}:{n}'.format(f=os.path.relpath(filename, ROOT_DIR).replace(os.sep, '/'), n=code.co_name)
+        else:
+            label = '[{}]'.format(_package(filename))
+        _labels[code] = label
+    return label
+
+
+def is_harness(label):
+    return not label.startswith('[')
+
+
+def collapse(labels):
+    """
+    :param labels: frame labels from the outermost frame
+    :return: tuple of labels from the first harness frame with consecutive equal labels merged,
+             None if there is no harness frame
+    """
+    for start, label in enumerate(labels):
+        if is_harness(label):
+            break
+    else:
+        return None
+    stack = []
+    for label in labels[start:]:
+        if not stack or stack[-1] != label or is_harness(label):
+            stack.append(label)
+    return tuple(stack)
+
+
+def phase_of(stack):
+    """
+    :param stack: collapsed stack
+    :return: harness phase the time of the innermost frame belongs to
+    """
+    inner = max(i for i, label in enumerate(stack) if is_harness(label))
+    packages = {label[1:-1] for label in stack[inner + 1:]}
+    for names, phase in _PACKAGE_PHASES:
+        if packages & names:
+            return phase
+    filename = stack[inner].rsplit(':', 1)[0].rsplit('/', 1)[-1]
+    return _HARNESS_PHASES.get(filename, OTHER)
+
+
+class ProfileResult:
+
+    def __init__(self, stacks):
+        """
+        :param stacks: Counter of collapsed stack -> seconds
+        """
+        self.stacks = stacks
+
+    def phases(self):
+        """
+        :return: Counter of phase -> seconds
+        """
+        phases = Counter()
+        for stack, seconds in self.stacks.items():
+            phases[phase_of(stack)] += seconds
+        return phases
+
+    def write_collapsed(self, path):
+        """
+        Writes `frame;frame;... microseconds` lines, input of flamegraph.pl or speedscope
+        """
+        with open(path, 'w') as f:
+            for stack, seconds in sorted(self.stacks.items()):
+                micros = int(seconds * 1000000)
+                if micros:
+                    f.write('{s} {n}\n'.format(s=';'.join(stack), n=micros))
+
+
+class StackSampler:
+    """
+    Samples stacks of all threads but its own from a background thread
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stargate-profiler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            # weight samples by the real time between them, the interval is not exact
+            seconds, last = now - last, now
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack = collapse(labels[::-1])
+                if stack:
+                    self._samples[stack] += seconds
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return ProfileResult(self._samples)
+
+
+class StackTracer:
+    """
+    Deterministic profiler: self time of every stack from call and return events (sys.setprofile)
+    """
+
+    def __init__(self):
+        self._threads_times = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def start(self):
+        threading.setprofile(self._profile)
+        sys.setprofile(self._profile)
+
+    def _profile(self, frame, event, arg):
+        now = time.perf_counter()
+        if self._stopped:
+            # threads started while tracing are still traced after stop()
+            sys.setprofile(None)
+            return
+        state = self._local
+        stack = getattr(state, 'stack', None)
+        if stack is None:
+            stack = state.stack = []
+            state.times = Counter()
+            state.last = now
+            with self._lock:
+                self._threads_times.append(state.times)
+        if stack:
+            state.times[tuple(stack)] += now - state.last
+        if event == 'call':
+            stack.append(frame_label(frame.f_code))
+        elif event == 'return' and stack:
+            stack.pop()
+        # time spent here is not attributed to any stack
+        state.last = time.perf_counter()
+
+    def stop(self):
+        sys.setprofile(None)
+        threading.setprofile(None)
+        self._stopped = True
+        stacks = Counter()
+        with self._lock:
+            for times in self._threads_times:
+                for labels, seconds in list(times.items()):
+                    stack = collapse(labels)
+                    if stack:
+                        stacks[stack] += seconds
+        return ProfileResult(stacks)
@@ -0,0 +1,93 @@
+import json
+import os
+import re
+from collections import Counter
+
+import pytest
+
+from test.common.perf.profiler import StackSampler, StackTracer
+
+WORKER_OUTPUT_KEY = 'stargate_profile'
+MODES = ('sampling', 'deterministic')
+
+
+def addoption(parser):
+    group = parser.getgroup('stargate-fuzz')
+    group.addoption('--profile-harness', choices=MODES, default=os.environ.get('TEST_PROFILE') or None,
+                    help='profile every test: sampling (low overhead) or deterministic (every call, slower)')
+    group.addoption('--profile-dir', default=os.environ.get('TEST_PROFILE_DIR', 'profile'),
+                    help='directory collapsed stacks of every test and phases.json are written to')
+    group.addoption('--profile-interval', type=float, default=float(os.environ.get('TEST_PROFILE_INTERVAL', '5')),
+                    help='milliseconds between stack samples in sampling mode')
+
+
+def is_requested(config):
+    return bool(config.getoption('profile_harness'))
+
+
+def _file_name(nodeid):
+    return re.sub(r'[^\w.\-\[\]]+', '_', nodeid).strip('_') + '.collapsed'
+
+
+class ProfilingPlugin:
+    """
+    Profiles every test call, writes its stacks in collapsed format (one file per test, for flamegraph.pl
+    or speedscope) and time per harness phase (sample, rest, decode, cql, compare, wait, other)
+    to phases.json, prints phase breakdown of the run in the terminal summary.
+    With pytest-xdist workers write their own files and send phases to the controller.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.mode = config.getoption('profile_harness')
+        self.directory = config.getoption('profile_dir')
+        self.interval = config.getoption('profile_interval') / 1000.0
+        # test nodeid -> phase -> seconds
+        self.phases = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _profiler(self):
+        return StackSampler(self.interval) if self.mode == 'sampling' else StackTracer()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        profiler = self._profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            result = profiler.stop()
+            result.write_collapsed(os.path.join(self.directory, _file_name(item.nodeid)))
+            self.phases[item.nodeid] = dict(result.phases())
+
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(self.config, 'workeroutput', None)
+        if workeroutput is not None:
+            workeroutput[WORKER_OUTPUT_KEY] = json.dumps(self.phases)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        output = getattr(node, 'workeroutput', {}).get(WORKER_OUTPUT_KEY)
+        if output:
+            self.phases.update(json.loads(output))
+
+    def summary_lines(self):
+        totals = Counter()
+        for phases in self.phases.values():
+            totals.update(phases)
+        total = sum(totals.values()) or 1.0
+        lines = ['{:<10} {:>10} {:>7}'.format('phase', 'thread[s]', '%')]
+        for phase, seconds in totals.most_common():
+            lines.append('{:<10} {:>10.3f} {:>7.1f}'.format(phase, seconds, seconds * 100 / total))
+        return lines
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if getattr(self.config, 'workeroutput', None) is not None:
+            return
+        terminalreporter.write_sep('=', 'stargate-fuzz profile ({})'.format(self.mode))
+        for line in self.summary_lines():
+            terminalreporter.write_line(line)
+        path = os.path.join(self.directory, 'phases.json')
+        with open(path, 'w') as f:
+            json.dump(self.phases, f, indent=2, sort_keys=True)
+        terminalreporter.write_line('collapsed stacks of every test and phases.json saved to {}'.format(self.directory))
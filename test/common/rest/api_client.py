@@ -0,0 +1,127 @@
+import logging
+import time
+
+import requests
+
+from test.common.config.test_config import TestConfig
+from test.common.perf import instrumentation
+from test.common.rest.balancing import NodePool
+from test.common.rest.rest_util import RESTResult, build_resp_error
+from test.common.rest.token_provider import TokenProvider
+
+LOG = logging.getLogger(__name__)
+
+
+class APIClient:
+    """
+    Base of clients of Stargate data APIs compared with CQL (RESTApiV1, RESTApiV2): requests are balanced
+    between Stargate nodes and retried on another node if connection fails, auth token is refreshed
+    when rejected, requests are instrumented per endpoint template.
+
+    Row tests look rows up by key with rows_by_keys, clients which can fetch many keys in one request
+    set `batch_size` and override it, by default every key is a request of its own (rows_by_key).
+    """
+
+    # name used in test ids and reports
+    name = None
+    # path of the API version below the REST url of a node e.g. 'v1'
+    version = None
+    # keys looked up by a single request of rows_by_keys
+    batch_size = 1
+
+    def __init__(self, config, token, pool_size=None):
+        """
+        :param token: auth token or TokenProvider asked for a new token when the current one is rejected
+        """
+        self.config = config
+        self.token_provider = token if isinstance(token, TokenProvider) else None
+        self.token = None if self.token_provider else token
+        # one pooled session per Stargate node, requests are balanced between nodes
+        self.nodes = NodePool(config, pool_size or TestConfig.concurrency())
+        if self.token:
+            print("using token:", self.token)
+            for node in self.nodes:
+                node.session.headers.update({'x-cassandra-token': self.token})
+
+    def url(self, resource, node=None):
+        base = node.url_base if node else self.config.rest_url_base()
+        return '{b}/{v}{r}'.format(b=base, v=self.version, r=resource)
+
+    def rows_by_key(self, ks_name, table, key_columns, key_values):
+        """
+        :param key_columns: partition key and clustering key prefix
+        :param key_values: values of key_columns in REST format (TableSchemaIndex.rest_key_values)
+        :return: RESTResult, value is iterable of rows of the key
+        """
+        raise NotImplementedError
+
+    def rows_by_keys(self, ks_name, table, key_columns, keys, schema=None):
+        """
+        :param keys: list of key values sharing key_columns, in REST format
+        :param schema: TableSchemaIndex of the table, clients fetching many keys in one request need it
+                       to match returned rows with keys
+        :return: list of RESTResult in order of keys, value of each is iterable of rows of its key
+        """
+        return [self.rows_by_key(ks_name, table, key_columns, key_values) for key_values in keys]
+
+    def _send(self, method, resource, params=None, stream=False, node=None, body=None):
+        """
+        Sends the request to `node` or to a node chosen by the balancer,
+        if connection to the chosen node fails the request is sent to another one
+        """
+        failed = []
+        while True:
+            target = node or self.nodes.choose(exclude=failed)
+            start = target.started()
+            try:
+                resp = self._request(target, method, resource, params, stream, body)
+            except requests.ConnectionError:
+                seconds = target.finished(start, failed=True)
+                if instrumentation.enabled():
+                    instrumentation.emit(instrumentation.NODE, target.host, seconds, status=0)
+                failed.append(target)
+                if node is not None or len(failed) >= len(self.nodes):
+                    raise
+                LOG.warning("connection to {} failed, retrying on another node".format(target.host))
+                continue
+            seconds = target.finished(start, failed=resp.status_code >= 500)
+            if instrumentation.enabled():
+                instrumentation.emit(instrumentation.NODE, target.host, seconds, status=resp.status_code)
+            return resp
+
+    def _request(self, node, method, resource, params, stream, body=None):
+        url = self.url(resource, node)
+        if self.token_provider is None:
+            return node.session.request(method, url, params=params, stream=stream, json=body)
+        token = self.token_provider.token()
+        resp = node.session.request(method, url, params=params, stream=stream, json=body,
+                                    headers={'x-cassandra-token': token})
+        if resp.status_code == 401:
+            resp.close()
+            token = self.token_provider.refresh(token)
+            resp = node.session.request(method, url, params=params, stream=stream, json=body,
+                                        headers={'x-cassandra-token': token})
+        return resp
+
+    def _get(self, resource, endpoint, params=None, node=None, count=1):
+        """
+        :param endpoint: template of the resource used to aggregate instrumentation stats
+        :param node: RESTNode to send the request to, chosen by the balancer if not given
+        :param count: number of items (e.g. keys) the request is for
+        """
+        start = time.perf_counter()
+        resp = self._send('GET', resource, params, node=node)
+        received = time.perf_counter()
+        value = resp.json()
+        if instrumentation.enabled():
+            _emit_request('GET', endpoint, resp, received - start, time.perf_counter() - received, count)
+        error = build_resp_error(resp)
+        return RESTResult(ok=resp.ok, value=value, status_code=resp.status_code, error=error, url=resp.url)
+
+
+def _emit_request(method, endpoint, resp, seconds, decode_seconds=None, count=1):
+    endpoint = '{m} {e}'.format(m=method, e=endpoint)
+    instrumentation.emit(instrumentation.REST, endpoint, seconds, count=count, size=len(resp.content),
+                         status=resp.status_code)
+    if decode_seconds is not None:
+        instrumentation.emit(instrumentation.DECODE, endpoint, decode_seconds, count=count, size=len(resp.content))
@@ -0,0 +1,145 @@
+"""
+Client side load balancing of REST requests over Stargate nodes (coordinators): every node has its own
+pooled requests session, a balancer chooses the node for a request and nodes failing repeatedly
+are ejected for a while.
+"""
+import itertools
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+LOG = logging.getLogger(__name__)
+
+# weight of the last request in the moving average of node latency
+LATENCY_ALPHA = 0.2
+
+
+class RESTNode:
+    """
+    Single Stargate node: its session, requests in flight, latency and health
+    """
+
+    def __init__(self, host, url_base, pool_size, eject_errors, eject_seconds):
+        self.host = host
+        self.url_base = url_base
+        self.session = requests.Session()
+        # session is shared by concurrent requests so connection pool should fit all of them
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.eject_errors = eject_errors
+        self.eject_seconds = eject_seconds
+        self.outstanding = 0
+        self.latency = None
+        self.consecutive_errors = 0
+        self.ejected_until = 0.0
+        self._lock = threading.Lock()
+
+    def healthy(self, now):
+        return self.ejected_until <= now
+
+    def started(self):
+        with self._lock:
+            self.outstanding += 1
+        return time.perf_counter()
+
+    def finished(self, start, failed):
+        """
+        :param failed: request failed on the node side (connection error or 5xx)
+        :return: seconds since start
+        """
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.outstanding -= 1
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += LATENCY_ALPHA * (seconds - self.latency)
+            if not failed:
+                self.consecutive_errors = 0
+                return seconds
+            self.consecutive_errors += 1
+            if self.eject_errors and self.consecutive_errors >= self.eject_errors:
+                self.ejected_until = time.monotonic() + self.eject_seconds
+                self.consecutive_errors = 0
+                LOG.warning("{h} failed {n} times in a row, not used for {s}s".format(
+                    h=self.host, n=self.eject_errors, s=self.eject_seconds))
+        return seconds
+
+
+class RoundRobinBalancer:
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, nodes):
+        return nodes[next(self._counter) % len(nodes)]
+
+
+class LeastOutstandingBalancer:
+    """
+    Node with least requests in flight, ties are resolved round robin
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, nodes):
+        offset = next(self._counter)
+        return min(nodes[offset % len(nodes):] + nodes[:offset % len(nodes)], key=lambda n: n.outstanding)
+
+
+class LatencyAwareBalancer:
+    """
+    Node with the lowest expected wait: moving average of its latency times requests in flight,
+    nodes without measured latency are tried first
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, nodes):
+        offset = next(self._counter)
+        return min(nodes[offset % len(nodes):] + nodes[:offset % len(nodes)],
+                   key=lambda n: (n.latency or 0.0) * (n.outstanding + 1))
+
+
+BALANCERS = {
+    'round_robin': RoundRobinBalancer,
+    'least_outstanding': LeastOutstandingBalancer,
+    'latency': LatencyAwareBalancer,
+}
+
+
+class NodePool:
+    """
+    REST nodes of config.hosts balanced with config.balancing
+    """
+
+    def __init__(self, config, pool_size):
+        try:
+            self.balancer = BALANCERS[config.balancing]()
+        except KeyError:
+            raise ValueError("unknown REST_BALANCING {b}, expected one of {a}".format(
+                b=config.balancing, a=sorted(BALANCERS)))
+        self.nodes = [RESTNode(host, config.rest_url_base(host), pool_size, config.eject_errors, config.eject_seconds)
+                      for host in config.hosts]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def choose(self, exclude=()):
+        """
+        :param exclude: nodes not to choose (e.g. already failed for the request) unless there is no other one
+        :return: node chosen by the balancer among healthy ones, among all if none is healthy
+        """
+        now = time.monotonic()
+        nodes = [n for n in self.nodes if n not in exclude and n.healthy(now)]
+        if not nodes:
+            nodes = [n for n in self.nodes if n not in exclude] or self.nodes
+        return self.balancer.choose(nodes)
@@ -1,49 +1,138 @@
-import logging
-import requests
+import time
 
+from test.common.perf import instrumentation
+from test.common.rest.api_client import APIClient, _emit_request
 from test.common.rest.rest_util import RESTResult, build_resp_error
+from test.common.rest.row_stream import CHUNK_SIZE, RowStream
 
-LOG = logging.getLogger(__name__)
+# resources templates, also used to aggregate stats per endpoint
+KEYSPACES = '/keyspaces'
+KEYSPACE_TABLES = '/keyspaces/{ks}/tables'
+TABLE = '/keyspaces/{ks}/tables/{t}'
+TABLE_ROWS = '/keyspaces/{ks}/tables/{t}/rows'
+TABLE_ROWS_BY_PK = '/keyspaces/{ks}/tables/{t}/rows/{pk}'
 
 
-class RESTApiV1:
+class RESTApiV1(APIClient):
+    """
+    REST V1 API, rows are looked up one key per request and decoded as the response is read
+    """
 
-    def __init__(self, config, token):
-        self.config = config
-        self.token = token
-        self.session = requests.Session()
-        if token:
-            print("using token:", token)
-            self.session.headers.update({'x-cassandra-token': token})
+    name = 'rest_v1'
+    version = 'v1'
 
-    def url(self, resource):
-        return self.config.v1_url_base() + resource
+    def rows_by_key(self, ks_name, table, key_columns, key_values):
+        return self.stream_table_rows_by_pk(ks_name, table, key_values)
 
-    def _get(self, resource):
-        resp = self.session.get(self.url(resource))
-        error = build_resp_error(resp)
-        return RESTResult(ok=resp.ok, value=resp.json(), status_code=resp.status_code, error=error, url=resp.url)
+    def _get_rows_stream(self, resource, endpoint):
+        """
+        GET with rows decoded as the body is read, value of the result is a RowStream (None if request failed).
+        The connection goes back to the pool once the stream is read to the end or closed.
+        """
+        start = time.perf_counter()
+        resp = self._send('GET', resource, stream=True)
+        received = time.perf_counter()
+        if not resp.ok:
+            error = build_resp_error(resp)
+            if instrumentation.enabled():
+                _emit_request('GET', endpoint, resp, received - start)
+            return RESTResult(ok=False, value=None, status_code=resp.status_code, error=error, url=resp.url)
+
+        def finished(stream):
+            resp.close()
+            if instrumentation.enabled():
+                _emit_stream('GET', endpoint, resp, stream, received - start)
 
-    def _delete(self, resource):
-        resp = self.session.delete(self.url(resource))
+        stream = RowStream(resp.iter_content(CHUNK_SIZE), on_close=finished)
+        return RESTResult(ok=True, value=stream, status_code=resp.status_code, error=None, url=resp.url)
+
+    def _delete(self, resource, endpoint):
+        start = time.perf_counter()
+        resp = self._send('DELETE', resource)
+        if instrumentation.enabled():
+            _emit_request('DELETE', endpoint, resp, time.perf_counter() - start)
         error = build_resp_error(resp)
         return RESTResult(ok=resp.ok, value=None, status_code=resp.status_code, error=error, url=resp.url)
 
+    def _write(self, method, resource, endpoint, body):
+        start = time.perf_counter()
+        resp = self._send(method, resource, body=body)
+        if instrumentation.enabled():
+            _emit_request(method, endpoint, resp, time.perf_counter() - start)
+        error = build_resp_error(resp)
+        value = resp.json() if resp.ok and resp.content else None
+        return RESTResult(ok=resp.ok, value=value, status_code=resp.status_code, error=error, url=resp.url)
+
     def list_keyspaces(self):
-        return self._get('/keyspaces')
+        return self._get(KEYSPACES, KEYSPACES)
 
     def list_keyspace_tables(self, ks_name):
-        return self._get('/keyspaces/{}/tables'.format(ks_name))
+        return self._get(KEYSPACE_TABLES.format(ks=ks_name), KEYSPACE_TABLES)
 
     def get_table(self, ks_name, table):
-        return self._get('/keyspaces/{ks}/tables/{t}'.format(ks=ks_name, t=table))
+        return self._get(TABLE.format(ks=ks_name, t=table), TABLE)
+
+    def get_table_rows(self, ks_name, table, page_size, page_state=None):
+        """
+        Single page of all table rows, response contains pageState if there are more pages
+        """
+        params = {'pageSize': page_size}
+        if page_state:
+            params['pageState'] = page_state
+        return self._get(TABLE_ROWS.format(ks=ks_name, t=table), TABLE_ROWS, params)
 
-    def get_table_rows_by_pk(self, ks_name, table, pk_values):
+    def get_table_rows_by_pk(self, ks_name, table, pk_values, node=None):
         pk = ';'.join([str(x) for x in pk_values])
-        resource = '/keyspaces/{ks}/tables/{t}/rows/{pk}'.format(ks=ks_name, t=table, pk=pk)
-        return self._get(resource)
+        resource = TABLE_ROWS_BY_PK.format(ks=ks_name, t=table, pk=pk)
+        return self._get(resource, TABLE_ROWS_BY_PK, node=node)
+
+    def get_table_rows_by_pk_on_all_nodes(self, ks_name, table, pk_values):
+        """
+        Same GET sent to every node, to check that all coordinators return the same rows
+        :return: list of (host, RESTResult)
+        """
+        return [(node.host, self.get_table_rows_by_pk(ks_name, table, pk_values, node=node)) for node in self.nodes]
+
+    def stream_table_rows_by_pk(self, ks_name, table, pk_values):
+        """
+        Same as get_table_rows_by_pk but value of the result is a RowStream
+        """
+        pk = ';'.join([str(x) for x in pk_values])
+        resource = TABLE_ROWS_BY_PK.format(ks=ks_name, t=table, pk=pk)
+        return self._get_rows_stream(resource, TABLE_ROWS_BY_PK)
+
+    def count_table_rows_by_pk(self, ks_name, table, pk_values):
+        """
+        Number of rows for the key, rows are counted without keeping them
+        """
+        res = self.stream_table_rows_by_pk(ks_name, table, pk_values)
+        return res._replace(value=res.value.count()) if res.ok else res
+
+    def add_table_row(self, ks_name, table, values):
+        """
+        :param values: list of (column, value) of the row, values in REST write format (see rest_values)
+        """
+        body = {'columns': [{'name': name, 'value': value} for name, value in values]}
+        return self._write('POST', TABLE_ROWS.format(ks=ks_name, t=table), TABLE_ROWS, body)
+
+    def update_table_rows_by_pk(self, ks_name, table, pk_values, values):
+        """
+        :param pk_values: values of all primary key columns
+        :param values: list of (column, value) to set, values in REST write format (see rest_values)
+        """
+        pk = ';'.join([str(x) for x in pk_values])
+        resource = TABLE_ROWS_BY_PK.format(ks=ks_name, t=table, pk=pk)
+        body = {'changeset': [{'column': name, 'value': value} for name, value in values]}
+        return self._write('PUT', resource, TABLE_ROWS_BY_PK, body)
 
     def delete_table_rows_by_pk(self, ks_name, table, pk_values):
         pk = ';'.join([str(x) for x in pk_values])
-        resource = '/keyspaces/{ks}/tables/{t}/rows/{pk}'.format(ks=ks_name, t=table, pk=pk)
-        return self._delete(resource)
+        resource = TABLE_ROWS_BY_PK.format(ks=ks_name, t=table, pk=pk)
+        return self._delete(resource, TABLE_ROWS_BY_PK)
+
+
+def _emit_stream(method, endpoint, resp, stream, headers_seconds):
+    endpoint = '{m} {e}'.format(m=method, e=endpoint)
+    instrumentation.emit(instrumentation.REST, endpoint, headers_seconds + stream.read_seconds, size=stream.size,
+                         status=resp.status_code)
+    instrumentation.emit(instrumentation.DECODE, endpoint, stream.decode_seconds, size=stream.size)
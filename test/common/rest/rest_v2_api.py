@@ -0,0 +1,142 @@
+import base64
+import json
+from collections import OrderedDict
+
+from test.common.rest.api_client import APIClient
+from test.common.rest.rest_util import RESTResult
+
+# resources templates, also used to aggregate stats per endpoint
+TABLE_ROWS = '/keyspaces/{ks}/{t}'
+TABLE_ROWS_ENDPOINT = '/v2' + TABLE_ROWS
+
+
+def _where_value(value):
+    """
+    :return: key value in json of `where`, blobs as base64 like REST returns them
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(bytes(value)).decode()
+    return value
+
+
+def _value_text(value):
+    """
+    :return: text of a key value to match it with value of the column in returned rows
+    """
+    return str(_where_value(value))
+
+
+def where_clause(key_columns, column_values):
+    """
+    :param column_values: per key column list of its values
+    :return: `where` of REST V2 with $eq on columns with a single value and $in on the others
+    """
+    where = OrderedDict()
+    for column, values in zip(key_columns, column_values):
+        values = [_where_value(v) for v in values]
+        where[column] = {'$eq': values[0]} if len(values) == 1 else {'$in': values}
+    return json.dumps(where, default=str)
+
+
+class RESTApiV2(APIClient):
+    """
+    REST V2 API, rows of many keys are fetched with a single `where` query with $in on every key column,
+    returned rows are split between keys by canonical forms of key column values (see TableSchemaIndex.cql_key)
+    """
+
+    name = 'rest_v2'
+    version = 'v2'
+
+    def __init__(self, config, token, pool_size=None):
+        super().__init__(config, token, pool_size)
+        self.batch_size = config.v2_batch_keys
+        self.page_size = config.v2_page_size
+
+    def get_rows(self, ks_name, table, where, page_size=None, page_state=None, count=1):
+        """
+        Single page of rows matching `where` (json), response contains pageState if there are more pages
+        :param count: number of keys `where` is for
+        """
+        params = {'where': where, 'page-size': page_size or self.page_size}
+        if page_state:
+            params['page-state'] = page_state
+        return self._get(TABLE_ROWS.format(ks=ks_name, t=table), TABLE_ROWS_ENDPOINT, params, count=count)
+
+    def get_all_rows(self, ks_name, table, where, count=1):
+        """
+        All pages of rows matching `where`, value of the result is list of rows of all pages
+        """
+        rows = []
+        page_state = None
+        while True:
+            res = self.get_rows(ks_name, table, where, page_state=page_state, count=count)
+            if not res.ok:
+                return res
+            rows.extend(res.value['data'])
+            page_state = res.value.get('pageState')
+            if not page_state:
+                return res._replace(value=rows)
+
+    def rows_by_key(self, ks_name, table, key_columns, key_values):
+        return self.get_all_rows(ks_name, table, where_clause(key_columns, [[v] for v in key_values]))
+
+    def rows_by_keys(self, ks_name, table, key_columns, keys, schema=None):
+        """
+        Keys are looked up in batches if schema is given, one by one otherwise
+        """
+        if schema is None:
+            return super().rows_by_keys(ks_name, table, key_columns, keys)
+        results = []
+        for batch in self._batches(keys):
+            results.extend(self._rows_by_batch(ks_name, table, list(key_columns), batch, schema))
+        return results
+
+    def _batches(self, keys):
+        """
+        Consecutive keys whose cartesian product of distinct values per column is at most batch_size,
+        so that a query does not select many more keys than asked for
+        """
+        batch, values = [], []
+        for key_values in keys:
+            texts = [_value_text(v) for v in key_values]
+            grown = [column | {text} for column, text in zip(values, texts)] if batch else [{t} for t in texts]
+            if batch and _product(len(column) for column in grown) > self.batch_size:
+                yield batch
+                batch, grown = [], [{t} for t in texts]
+            batch.append(key_values)
+            values = grown
+        if batch:
+            yield batch
+
+    def _rows_by_batch(self, ks_name, table, key_columns, keys, schema):
+        """
+        Rows of keys selected with $in on every key column, returned rows are split between keys,
+        rows of other combinations of the values are dropped
+        :return: list of RESTResult in order of keys
+        """
+        if len(keys) == 1:
+            return [self.rows_by_key(ks_name, table, key_columns, keys[0])]
+        column_values = [OrderedDict() for _ in key_columns]
+        for key_values in keys:
+            for values, v in zip(column_values, key_values):
+                values.setdefault(_value_text(v), v)
+        where = where_clause(key_columns, [list(values.values()) for values in column_values])
+        res = self.get_all_rows(ks_name, table, where, count=len(keys))
+        if not res.ok:
+            return [res] * len(keys)
+        # key values are in REST format, their canonical form is the one of CQL values (timestamps are idempotent)
+        canonical_keys = [schema.cql_key(dict(zip(key_columns, key_values)), key_columns) for key_values in keys]
+        rows_by_key = OrderedDict((key, []) for key in canonical_keys)
+        for row in res.value:
+            rows = rows_by_key.get(schema.rest_key(row, key_columns))
+            if rows is not None:
+                rows.append(row)
+        return [RESTResult(ok=True, value=rows_by_key[key], status_code=res.status_code, error=None, url=res.url)
+                for key in canonical_keys]
+
+
+def _product(sizes):
+    result = 1
+    for size in sizes:
+        result *= size
+    return result
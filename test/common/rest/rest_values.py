@@ -0,0 +1,73 @@
+"""
+Values of columns in REST V1 write requests (add row, update row by key): every value is sent as a string,
+scalars in their plain text form and collections, tuples and UDTs as CQL literals e.g. `{'a': 1, 'b': 2}`
+"""
+from test.common.test.checks import timestamp_rest_format
+
+_QUOTED = ('text', 'varchar', 'ascii', 'timestamp', 'date', 'time', 'inet')
+
+
+def _quote(text):
+    return "'{}'".format(text.replace("'", "''"))
+
+
+def _blob(value):
+    return '0x' + bytes(value).hex()
+
+
+def _boolean(value):
+    return 'true' if value else 'false'
+
+
+def _scalar_text(name):
+    if name == 'timestamp':
+        return timestamp_rest_format
+    if name == 'blob':
+        return _blob
+    if name == 'boolean':
+        return _boolean
+    return str
+
+
+def _compile_literal(cql_type):
+    """
+    :return: function driver value -> CQL literal
+    """
+    name = cql_type.name
+    if cql_type.is_udt():
+        fields = [(f, _compile_literal(t)) for f, t in zip(cql_type.field_names, cql_type.subtypes)]
+        return _nullable_literal(lambda v: '{{{}}}'.format(', '.join(
+            '"{f}": {x}'.format(f=f.replace('"', '""'), x=literal(x)) for (f, literal), x in zip(fields, v))))
+    if name in ('list', 'set'):
+        elem = _compile_literal(cql_type.subtypes[0])
+        brackets = '[{}]' if name == 'list' else '{{{}}}'
+        return _nullable_literal(lambda v: brackets.format(', '.join(elem(x) for x in v)))
+    if name == 'map':
+        key = _compile_literal(cql_type.subtypes[0])
+        val = _compile_literal(cql_type.subtypes[1])
+        return _nullable_literal(lambda v: '{{{}}}'.format(', '.join(
+            '{k}: {x}'.format(k=key(k), x=val(x)) for k, x in v.items())))
+    if name == 'tuple':
+        elems = [_compile_literal(t) for t in cql_type.subtypes]
+        return _nullable_literal(lambda v: '({})'.format(', '.join(e(x) for e, x in zip(elems, v))))
+    text = _scalar_text(name)
+    if name in _QUOTED:
+        return _nullable_literal(lambda v: _quote(text(v)))
+    return _nullable_literal(text)
+
+
+def _nullable_literal(literal):
+    return lambda v: 'null' if v is None else literal(v)
+
+
+def compile_rest_value_encoder(cql_type):
+    """
+    Compile parsed CQL type into function converting driver value into value of REST V1 write request,
+    None stays None (null)
+    :param cql_type: CQLType e.g. from parse_cql_type
+    """
+    if cql_type.is_udt() or cql_type.name in ('list', 'set', 'map', 'tuple'):
+        literal = _compile_literal(cql_type)
+        return lambda v: None if v is None else literal(v)
+    text = _scalar_text(cql_type.name)
+    return lambda v: None if v is None else text(v)
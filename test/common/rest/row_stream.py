@@ -0,0 +1,149 @@
+"""
+Incremental decoding of REST row responses ({"rows": [...], "count": ...}): rows are parsed one by one
+as the body arrives, so memory is bounded by a single row and a chunk of the body, not by the response.
+Rows are decoded with the C scanner of json module (raw_decode), which also finds where a row ends.
+"""
+import codecs
+import json
+import re
+import time
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# characters a number may continue with, e.g. '1.' or '1.5e' at the end of a chunk are parsed as 1 and 1.5
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+_DECODER = json.JSONDecoder()
+
+
+class RowStream:
+    """
+    Iterator over rows of a REST response body given as iterable of byte chunks.
+    Other top level fields (count, pageState) are in `fields`, those after the rows array once iteration is over.
+    """
+
+    def __init__(self, chunks, on_close=None):
+        """
+        :param on_close: callable(stream) called once the body is read or the stream is closed
+        """
+        self._chunks = iter(chunks)
+        self._on_close = on_close
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._state = 'start'
+        self._first_row = True
+        self.fields = {}
+        self.size = 0
+        self.read_seconds = 0.0
+        self.decode_seconds = 0.0
+
+    def _more(self):
+        start = time.perf_counter()
+        chunk = next(self._chunks, None)
+        self.read_seconds += time.perf_counter() - start
+        if not chunk:
+            return False
+        self.size += len(chunk)
+        self._buf = self._buf[self._pos:] + self._text.decode(chunk)
+        self._pos = 0
+        return True
+
+    def _unexpected_end(self):
+        return ValueError("unexpected end of REST response after {} bytes".format(self.size))
+
+    def _peek(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._more():
+                raise self._unexpected_end()
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError("expected '{e}' in REST response, got '{f}'".format(e=char, f=found))
+        self._pos += 1
+
+    def _read_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # value continues in the next chunk (or the body is broken)
+                if not self._more():
+                    raise
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and _NUMBER_TAIL.fullmatch(self._buf, end) and self._more()):
+                continue
+            self._pos = end
+            return value
+
+    def _next_field(self):
+        """
+        :return: name of the next top level field or None at the end of the object
+        """
+        char = self._peek()
+        if char == '}':
+            self._pos += 1
+            return None
+        if char == ',':
+            self._pos += 1
+        name = self._read_value()
+        self._expect(':')
+        return name
+
+    def _read_fields(self):
+        """
+        Reads top level fields up to the rows array (state 'rows') or the end of the object (state 'done')
+        """
+        while True:
+            name = self._next_field()
+            if name is None:
+                self.close()
+                return
+            if name == 'rows' and self._peek() == '[':
+                self._pos += 1
+                self._state = 'rows'
+                return
+            self.fields[name] = self._read_value()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._state == 'start':
+            self._expect('{')
+            self._state = 'fields'
+            self._read_fields()
+        if self._state != 'rows':
+            raise StopIteration
+        if self._peek() == ']':
+            self._pos += 1
+            self._state = 'fields'
+            self._read_fields()
+            raise StopIteration
+        if not self._first_row:
+            self._expect(',')
+        self._first_row = False
+        start, read_seconds = time.perf_counter(), self.read_seconds
+        row = self._read_value()
+        self.decode_seconds += time.perf_counter() - start - (self.read_seconds - read_seconds)
+        return row
+
+    def count(self):
+        """
+        Reads the rest of the body, rows are not kept
+        :return: number of rows not read yet
+        """
+        return sum(1 for _ in self)
+
+    def close(self):
+        self._state = 'done'
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close(self)
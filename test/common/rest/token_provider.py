@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on windows, tokens are then not coordinated between processes
+    fcntl = None
+
+from test.common.rest.rest_auth import RESTAuth
+
+LOG = logging.getLogger(__name__)
+
+
+class TokenProvider:
+    """
+    Auth token shared by everything using the provider and, through a cache file, by other processes
+    (e.g. pytest-xdist workers or consecutive runs):
+    - token is reused until its TTL passes
+    - refresh() is called when a token is rejected, concurrent refreshes result in a single auth call
+    """
+
+    def __init__(self, config, ttl=None, cache_path=None):
+        """
+        :param ttl: seconds after which token is not used anymore, config.token_ttl by default
+        :param cache_path: file to share token through, config.token_cache by default, '' to disable
+        """
+        self.config = config
+        self.ttl = ttl if ttl is not None else config.token_ttl
+        self.cache_path = cache_path if cache_path is not None else config.token_cache
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def token(self):
+        with self._lock:
+            if self._token is None or self._expired():
+                self._authenticate()
+            return self._token
+
+    def refresh(self, rejected_token):
+        """
+        Get new token after `rejected_token` was not accepted,
+        if other thread or process already got a new one it is reused
+        """
+        with self._lock:
+            if self._token is not None and self._token != rejected_token and not self._expired():
+                return self._token
+            self._authenticate(rejected_token)
+            return self._token
+
+    def use(self, token):
+        """
+        Use token obtained elsewhere (e.g. by pytest-xdist controller) if there is no valid one
+        """
+        with self._lock:
+            if self._token is None or self._expired():
+                self._token = token
+                self._expires_at = time.time() + self.ttl
+
+    def _expired(self):
+        return time.time() >= self._expires_at
+
+    def _authenticate(self, rejected_token=None):
+        with self._cache_lock():
+            cached = self._read_cache()
+            if cached and cached[0] != rejected_token:
+                self._token, self._expires_at = cached
+                return
+            auth = RESTAuth(self.config)
+            res = auth.authenticate()
+            if not res.ok:
+                raise RuntimeError("authentication failed: {}".format(res.error))
+            self._token = auth.token
+            self._expires_at = time.time() + self.ttl
+            self._write_cache()
+
+    @contextmanager
+    def _cache_lock(self):
+        if not self.cache_path or fcntl is None:
+            yield
+            return
+        with open(self.cache_path + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _cache_owner(self):
+        return {'auth_url': self.config.auth_api_url_base(), 'username': self.config.username}
+
+    def _read_cache(self):
+        """
+        :return: (token, expires_at) from cache file if it is still valid else None
+        """
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('owner') != self._cache_owner() or time.time() >= cached.get('expires_at', 0):
+            return None
+        return cached['token'], cached['expires_at']
+
+    def _write_cache(self):
+        if not self.cache_path:
+            return
+        tmp_path = '{p}.{pid}.tmp'.format(p=self.cache_path, pid=os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'owner': self._cache_owner(), 'token': self._token, 'expires_at': self._expires_at}, f)
+        os.replace(tmp_path, self.cache_path)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def shared_token_provider(config):
+    """
+    :return: TokenProvider shared by the whole process for given auth api and user
+    """
+    key = (config.auth_api_url_base(), config.username)
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            provider = _providers[key] = TokenProvider(config)
+        return provider
@@ -1,12 +1,6 @@
-import datetime
-import collections
+import base64
 from decimal import Decimal
 
-from cassandra.cqltypes import UUID
-from cassandra.util import OrderedMapSerializedKey, SortedSet, Date
-
-from test.common.cql.cql_tools import cql_table_column
-
 
 def timestamp_rest_format(value):
     n = str(value).replace(' ', 'T')
@@ -18,85 +12,126 @@ def timestamp_rest_format(value):
     return n
 
 
-def compare_cql_with_rest(cql_value, rest_value, cql_column_metadata):
-    column_type = cql_column_metadata.cql_type
-    if 'decimal' == str(column_type):
-        # result = Decimal.from_float(rest_value).compare(cql_value)
-        return str(cql_value).strip("0") == str(rest_value).strip("0")
-    else:
-        rest_normal = normalize_value(rest_value)
-        cql_normal = normalize_value(cql_value)
-        if isinstance(rest_normal, list):
-            rest_normal = sorted(rest_normal)
-        if isinstance(cql_normal, list):
-            cql_normal = sorted(cql_normal)
-        return str(cql_normal) == str(rest_normal), '\n'.join([
+def _nullable(normalize):
+    def normalize_nullable(value):
+        return None if value is None else normalize(value)
+    return normalize_nullable
+
+
+def _identity(value):
+    return value
+
+
+def _round_float(value):
+    # floats we should cut after 6 significant digits, REST can report them as ints or strings (NaN)
+    return round(float(value), 6)
+
+
+def _decimal_text(value):
+    # REST reports decimals as json numbers, Decimal('1.50') from the driver and 1.5 from REST are the same
+    return str(Decimal(str(value)).normalize())
+
+
+def _blob_text(value):
+    # REST reports blobs as base64
+    return base64.b64encode(bytes(value)).decode()
+
+
+def _compile_normalizer(cql_type, cql_side):
+    """
+    Build normalize function for values of given type: values reported by CQL and by REST differ (e.g. REST
+    dict keys are texts, timestamps are ISO strings), normalized ones are comparable. Type is known upfront
+    so nothing is inspected per value
+    :param cql_side: True for values returned by python driver, False for values from REST (json)
+    """
+    name = cql_type.name
+    if cql_type.is_udt():
+        names = cql_type.field_names
+        fields = [_compile_normalizer(t, cql_side) for t in cql_type.subtypes]
+        if cql_side:
+            return _nullable(lambda v: [(f, n(x)) for f, n, x in zip(names, fields, v)])
+        return _nullable(lambda v: [(f, n(v.get(f))) for f, n in zip(names, fields)])
+    if name == 'map':
+        key = _compile_normalizer(cql_type.subtypes[0], cql_side)
+        val = _compile_normalizer(cql_type.subtypes[1], cql_side)
+        return _nullable(lambda v: sorted([(str(key(k)), val(x)) for k, x in v.items()]))
+    if name == 'set':
+        elem = _compile_normalizer(cql_type.subtypes[0], cql_side)
+        return _nullable(lambda v: sorted([elem(x) for x in v], key=str))
+    if name == 'list':
+        elem = _compile_normalizer(cql_type.subtypes[0], cql_side)
+        return _nullable(lambda v: [elem(x) for x in v])
+    if name == 'tuple':
+        elems = [_compile_normalizer(t, cql_side) for t in cql_type.subtypes]
+        return _nullable(lambda v: [n(x) for n, x in zip(elems, v)])
+    if name in ('uuid', 'timeuuid', 'date', 'time'):
+        return _nullable(str)
+    if name == 'timestamp':
+        return _nullable(timestamp_rest_format) if cql_side else _identity
+    if name in ('float', 'double'):
+        return _nullable(_round_float)
+    if name == 'decimal':
+        return _nullable(_decimal_text)
+    if name == 'blob':
+        return _nullable(_blob_text) if cql_side else _identity
+    return _identity
+
+
+def compile_column_comparator(cql_type):
+    """
+    Compile parsed CQL type of a column into function (cql_value, rest_value) -> (same, detail),
+    blobs and decimals are compared in the form REST reports them (base64, json number),
+    detail explains how values were normalized and is built only when values differ
+    :param cql_type: CQLType e.g. from parse_cql_type
+    """
+    cql_normalize = _compile_normalizer(cql_type, cql_side=True)
+    rest_normalize = _compile_normalizer(cql_type, cql_side=False)
+    sort_list = cql_type.name == 'list'
+
+    def compare(cql_value, rest_value):
+        cql_normal = cql_normalize(cql_value)
+        rest_normal = rest_normalize(rest_value)
+        if sort_list:
+            cql_normal = sorted(cql_normal, key=str) if cql_normal is not None else None
+            rest_normal = sorted(rest_normal, key=str) if rest_normal is not None else None
+        if str(cql_normal) == str(rest_normal):
+            return True, None
+        return False, '\n'.join([
             "CQL raw: {}".format(cql_value),
             "CQL normal: {}".format(cql_normal),
             "REST raw: {}".format(rest_value),
             "REST normal: {}".format(rest_normal)
         ])
 
+    return compare
+
 
-def normalize_value(value, cql_column_metadata=None):
+def compile_canonical_form(cql_type, cql_side):
     """
-    We need to normalize values because those reported from test and from REST apis can differ
-    Examples are dictionaries or the fact that in REST dict keys needs to be texts
-    :param value: value to normalize
-    :param cql_column_metadata: optional information that can help to normalize
-    :return: value that is comparable between different APIs (cql vs REST e.g.)
+    Compile parsed CQL type of a column into function value -> text, equal for a CQL value and a REST value
+    exactly when compile_column_comparator considers them the same, so rows can be compared by hashes
+    :param cql_side: True for values returned by python driver, False for values from REST (json)
     """
-    if cql_column_metadata:
-        the_type = cql_column_metadata.cql_type
-        if 'decimal' == str(the_type):
-            if isinstance(value, float):
-                return Decimal.from_float(value)
-
-    if isinstance(value, UUID):
-        return str(value)
-    elif isinstance(value, datetime.datetime):
-        return timestamp_rest_format(value)
-    elif isinstance(value, OrderedMapSerializedKey):
-        items = list(value.items())
-        return normalize_items_list(items)
-    elif isinstance(value, dict):
-        items = list(collections.OrderedDict(value).items())
-        return normalize_items_list(items)
-    elif isinstance(value, collections.OrderedDict):
-        items = list(value.items())
-        return normalize_items_list(items)
-    elif isinstance(value, SortedSet):
-        n = [normalize_value(x) for x in list(value)]
-        print("before", str(value))
-        print("after", str(n))
-    elif isinstance(value, Date):
-        return str(value)
-    # elif isinstance(value, Decimal):
-    #     return str(value)
-    elif isinstance(value, float):
-        # floats we should cut after 6 significant digits
-        return round(value, 6)
-    else:
-        return value
-
-
-def normalize_items_list(dict_items):
+    normalize = _compile_normalizer(cql_type, cql_side)
+    if cql_type.name == 'list':
+        return lambda v: str(sorted(normalize(v), key=str) if v is not None else None)
+    return lambda v: str(normalize(v))
+
+
+def ignore_column(column_metadata):
+    column_type = str(column_metadata.cql_type)
+    if 'blob' in column_type:  # reported issue
+        return True
+    # if 'map<double, text>' in column_type:
+    #     return True
+    if column_type == 'decimal':  # reported issue
+        return True
+    return False
+
+
+def cql_row_columns_to_rest_values(table_schema, cql_row, columns):
     """
-    We need to normalize both keys and values e.g. Date(1110002) to "YYYY-MM-DD"
-    and also str() key as only text are valid for json dictionaries
-    :param dict_items: list of pairs (key,val) that constructs a dictionary
-    :return: list of pairs with keys and values normalized
+    :param table_schema: TableSchemaIndex of the table
+    :return: values of given columns from the CQL row in format expected by REST api
     """
-    return sorted([(str(normalize_value(key)), normalize_value(val)) for key, val in dict_items])
-
-
-def cql_row_columns_to_rest_values(cql_session, ks, table, cql_row, columns):
-    values = []
-    for col_name in columns:
-        val = cql_row[col_name]
-        col_metadata = cql_table_column(cql_session, ks, table, col_name)
-        if col_metadata:
-            if 'timestamp' in col_metadata.cql_type:
-                val = timestamp_rest_format(val)
-        values.append(val)
-    return values
+    return table_schema.rest_key_values(cql_row, columns)
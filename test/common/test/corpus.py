@@ -0,0 +1,205 @@
+"""
+Corpus of recorded row comparisons, so that checks can be re-run without the cluster (see replay).
+
+Record mode (TEST_RECORD_CORPUS=<directory>) stores every comparison made by RowComparator:
+table schemas, CQL rows (values encoded with their CQL types), REST urls and REST rows as returned.
+Corpus file is a sequence of chunks: 4 bytes of length and zlib compressed json lines,
+read through mmap one chunk at a time.
+"""
+import base64
+import datetime
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import uuid
+import zlib
+from collections import namedtuple
+from decimal import Decimal
+
+from cassandra.util import Date, Duration, OrderedMap, SortedSet, Time
+
+from test.common.config.test_config import TestConfig
+
+LOG = logging.getLogger(__name__)
+
+CHUNK_RECORDS = 1000
+_LENGTH = struct.Struct('>I')
+
+TABLE_RECORD = 'table'
+COMPARE_RECORD = 'compare'
+
+
+def _nullable(convert):
+    return lambda v: None if v is None else convert(v)
+
+
+def _identity(value):
+    return value
+
+
+def compile_value_codec(cql_type):
+    """
+    Compile parsed CQL type into (encode, decode) pair of functions converting values as returned by python driver
+    to json values and back, decoded values compare like the original ones
+    """
+    name = cql_type.name
+    if cql_type.is_udt():
+        fields = [compile_value_codec(t) for t in cql_type.subtypes]
+        udt_class = namedtuple(name, cql_type.field_names)
+        return (_nullable(lambda v: [enc(x) for (enc, _), x in zip(fields, v)]),
+                _nullable(lambda v: udt_class(*[dec(x) for (_, dec), x in zip(fields, v)])))
+    if name in ('set', 'list'):
+        enc, dec = compile_value_codec(cql_type.subtypes[0])
+        collection = SortedSet if name == 'set' else list
+        return _nullable(lambda v: [enc(x) for x in v]), _nullable(lambda v: collection([dec(x) for x in v]))
+    if name == 'tuple':
+        elems = [compile_value_codec(t) for t in cql_type.subtypes]
+        return (_nullable(lambda v: [enc(x) for (enc, _), x in zip(elems, v)]),
+                _nullable(lambda v: tuple(dec(x) for (_, dec), x in zip(elems, v))))
+    if name == 'map':
+        key_enc, key_dec = compile_value_codec(cql_type.subtypes[0])
+        val_enc, val_dec = compile_value_codec(cql_type.subtypes[1])
+        # keys can be collections, OrderedMap accepts unhashable keys
+        return (_nullable(lambda v: [[key_enc(k), val_enc(x)] for k, x in v.items()]),
+                _nullable(lambda v: OrderedMap([(key_dec(k), val_dec(x)) for k, x in v])))
+    try:
+        encode, decode = _SCALAR_CODECS[name]
+    except KeyError:
+        return _identity, _identity
+    return _nullable(encode), _nullable(decode)
+
+
+_SCALAR_CODECS = {
+    'uuid': (str, uuid.UUID),
+    'timeuuid': (str, uuid.UUID),
+    'timestamp': (lambda v: v.isoformat(), datetime.datetime.fromisoformat),
+    'date': (lambda v: v.days_from_epoch, Date),
+    'time': (lambda v: v.nanosecond_time, Time),
+    'decimal': (str, Decimal),
+    'blob': (lambda v: base64.b64encode(v).decode(), base64.b64decode),
+    'duration': (lambda v: [v.months, v.days, v.nanoseconds], lambda v: Duration(*v)),
+}
+
+
+class RowsCodec:
+    """
+    Encodes and decodes CQL rows of a table using compiled value codecs of its columns
+    """
+
+    def __init__(self, schema):
+        self.codecs = {c.name: compile_value_codec(c.parsed_type) for c in schema.columns}
+
+    def encode(self, rows):
+        return [{name: self.codecs[name][0](value) for name, value in row.items()} for row in rows]
+
+    def decode(self, rows):
+        return [{name: self.codecs[name][1](value) for name, value in row.items()} for row in rows]
+
+
+class CorpusWriter:
+    """
+    Appends records (json serializable dicts) to a corpus file in compressed chunks
+    """
+
+    def __init__(self, path, chunk_records=CHUNK_RECORDS):
+        self.path = path
+        self.chunk_records = chunk_records
+        self._file = open(path, 'ab')
+        self._pending = []
+        self._codecs = {}
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':'))
+        with self._lock:
+            self._append(line)
+
+    def record_comparison(self, schema, cql_query, rest_url, cql_rows, rest_rows):
+        """
+        Stores arguments of RowComparator.compare_rows, table schema is stored before its first comparison
+        """
+        key = (schema.keyspace, schema.table)
+        with self._lock:
+            codec = self._codecs.get(key)
+            if codec is None:
+                codec = self._codecs[key] = RowsCodec(schema)
+                self._append(json.dumps({'type': TABLE_RECORD, 'schema': schema.to_json()}, separators=(',', ':')))
+        self.write({'type': COMPARE_RECORD, 'ks': schema.keyspace, 'table': schema.table, 'cql_query': cql_query,
+                    'rest_url': rest_url, 'cql_rows': codec.encode(cql_rows), 'rest_rows': rest_rows})
+
+    def _append(self, line):
+        self._pending.append(line)
+        if len(self._pending) >= self.chunk_records:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        data = zlib.compress('\n'.join(self._pending).encode())
+        self._file.write(_LENGTH.pack(len(data)) + data)
+        self._pending = []
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._file.close()
+
+
+def read_corpus(path):
+    """
+    :return: generator of records of a corpus file
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = 0
+            while pos < len(data):
+                (length,) = _LENGTH.unpack_from(data, pos)
+                pos += _LENGTH.size
+                for line in zlib.decompress(data[pos:pos + length]).decode().split('\n'):
+                    yield json.loads(line)
+                pos += length
+
+
+def corpus_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, x) for x in os.listdir(path) if x.endswith('.corpus')))
+        else:
+            files.append(path)
+    return files
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def recorder():
+    """
+    :return: process wide CorpusWriter if TEST_RECORD_CORPUS is set (one file per process), None otherwise
+    """
+    global _recorder
+    directory = TestConfig.record_corpus()
+    if not directory:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            os.makedirs(directory, exist_ok=True)
+            worker = os.environ.get('PYTEST_XDIST_WORKER', 'main')
+            path = os.path.join(directory, '{w}-{p}.corpus'.format(w=worker, p=os.getpid()))
+            LOG.info("recording comparisons to {}".format(path))
+            _recorder = CorpusWriter(path)
+        return _recorder
+
+
+def close_recorder():
+    global _recorder
+    with _recorder_lock:
+        if _recorder is not None:
+            _recorder.close()
+            _recorder = None
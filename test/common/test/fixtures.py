@@ -2,18 +2,43 @@ import pytest
 
 from test.common.config.rest_api_config import RESTApiConfig
 from test.common.cql.cql_tools import CQLConnection
-from test.common.rest.rest_auth import RESTAuth
 from test.common.rest.rest_v1_api import RESTApiV1
+from test.common.rest.rest_v2_api import RESTApiV2
+from test.common.rest.token_provider import shared_token_provider
+from test.common.test.scheduler import fuzz_scheduler as build_fuzz_scheduler, scheduler_users
 
+AUTH_TOKEN_KEY = 'stargate_auth_token'
 
-@pytest.fixture(scope="class")
-def rest_v1():
-    config = RESTApiConfig()
-    auth = RESTAuth(config)
-    auth.authenticate()
-    return RESTApiV1(config, auth.token)
 
+def token_provider(config):
+    """
+    :return: process wide TokenProvider, seeded with token from pytest-xdist controller if run by a worker
+    """
+    provider = shared_token_provider(RESTApiConfig())
+    workerinput = getattr(config, 'workerinput', None)
+    if workerinput and workerinput.get(AUTH_TOKEN_KEY):
+        provider.use(workerinput[AUTH_TOKEN_KEY])
+    return provider
 
-@pytest.fixture(scope="class")
+
+@pytest.fixture(scope="session")
+def rest_v1(pytestconfig):
+    return RESTApiV1(RESTApiConfig(), token_provider(pytestconfig))
+
+
+@pytest.fixture(scope="session")
+def rest_v2(pytestconfig):
+    return RESTApiV2(RESTApiConfig(), token_provider(pytestconfig))
+
+
+@pytest.fixture(scope="session")
 def cql_session():
-    return CQLConnection().connect()
+    return CQLConnection.shared_session()
+
+
+@pytest.fixture(scope="session")
+def fuzz_scheduler(request, cql_session):
+    """
+    FuzzScheduler if TEST_TIME_BUDGET is set, None otherwise, the budget is shared by all tests using it
+    """
+    return build_fuzz_scheduler(cql_session, users=scheduler_users(request.session.items))
@@ -1,16 +1,41 @@
 import random
+import time
+from collections import namedtuple
 
 from test.common.config.test_config import TestConfig
-from test.common.cql.cql_tools import cql_keyspaces, cql_tables, cql_table_pk_columns
+from test.common.cql.cql_tools import CQLConfig, cql_schema_names
+from test.common.cql.statements import prepared_statements, TOKEN_RANGE_ENDPOINT
+from test.common.perf import instrumentation
+from test.common.test.schema_index import table_schema
+
+TOKEN_ALIAS = 'fuzz_token'
+
+MURMUR3_RING = (-2 ** 63, 2 ** 63 - 1)
+RANDOM_RING = (-1, 2 ** 127)
+
+
+class TableShard(namedtuple('TableShard', ['keyspace', 'table', 'shard', 'shards'])):
+    """
+    Part of the table tested by a single test item, shards sample disjoint token ranges
+    """
+
+    def __str__(self):
+        if self.shards == 1:
+            return '{ks}.{t}'.format(ks=self.keyspace, t=self.table)
+        return '{ks}.{t}-{s}/{n}'.format(ks=self.keyspace, t=self.table, s=self.shard, n=self.shards)
 
 
 def select_tables_for_test(cql_session, skip_system):
     """
-    Return list of pairs (ks,table) without skipped and (if requested) system tables
+    Return list of pairs (ks,table) without skipped and (if requested) system tables,
+    only from CQL_KEYSPACES if set
     """
+    keyspaces = CQLConfig().keyspaces
     res = []
-    for ks in cql_keyspaces(cql_session):
-        for table in cql_tables(cql_session, ks):
+    for ks, tables in cql_schema_names(cql_session).items():
+        if keyspaces and ks not in keyspaces:
+            continue
+        for table in tables:
             if TestConfig.skip_table(ks, table):
                 continue
             if skip_system and TestConfig.is_system_table(ks, table):
@@ -19,15 +44,212 @@ def select_tables_for_test(cql_session, skip_system):
     return res
 
 
-def some_table_data_with_keys(cql_session, ks, table, n):
+def select_table_shards_for_test(cql_session, skip_system, shards):
     """
-    From given table returns list of [row, keys] for random rows and random valid subset of primary key
+    Return list of TableShard, `shards` for every table from select_tables_for_test
     """
-    res = []
-    cql_data = cql_session.execute('SELECT * FROM "{ks}"."{t}" LIMIT {n}'.format(ks=ks, t=table, n=n))
-    partk_columns, clustk_columns = cql_table_pk_columns(cql_session, ks, table)
-    for row in cql_data:
-        n_cols = random.randint(0, len(clustk_columns) + 1)
+    return [TableShard(ks, table, shard, shards)
+            for ks, table in select_tables_for_test(cql_session, skip_system)
+            for shard in range(shards)]
+
+
+def select_fuzz_tables(cql_session):
+    """
+    Return TableShards fuzzed by this client of a distributed run (TEST_SHARD=i/N): every table is split into
+    TEST_SAMPLE_SHARDS * N TableShards and the client takes every N-th of them, so clients sample disjoint
+    token ranges and each of them TEST_SAMPLE_SHARDS ranges of every table
+    """
+    shard, shards = TestConfig.client_shard()
+    table_shards = select_table_shards_for_test(cql_session, skip_system=True,
+                                                shards=TestConfig.sample_shards() * shards)
+    return table_shards[shard::shards]
+
+
+def select_scan_tables(cql_session):
+    """
+    Return (ks, table) scanned by this client of a distributed run, every N-th table of the list
+    """
+    shard, shards = TestConfig.client_shard()
+    return select_tables_for_test(cql_session, skip_system=True)[shard::shards]
+
+
+def table_shard_seed(table_shard):
+    """
+    :return: seed for sampling rows of the TableShard derived from TEST_SEED, None if it is not set
+    """
+    seed = TestConfig.seed()
+    if seed is None:
+        return None
+    return random.Random('{s}:{t}'.format(s=seed, t=table_shard)).getrandbits(64)
+
+
+def some_table_data_with_keys(cql_session, ks, table, n, seed=None, shard=0, shards=1, clustering_columns=None):
+    """
+    From given table lazily yields (row, keys) for random rows and random valid subset of primary key
+    :param n: target sample size, less rows are returned if table is smaller
+    :param seed: seed for selecting rows and keys, by default taken from `random` (seeded by pytest-randomly)
+    :param shard: which of `shards` disjoint parts of the token ring to sample from
+    :param clustering_columns: number of clustering columns in every key, random if not given
+    """
+    rng = random.Random(seed if seed is not None else random.getrandbits(64))
+    schema = table_schema(cql_session, ks, table)
+    partk_columns, clustk_columns = list(schema.partition_key), list(schema.clustering_key)
+    for row in sample_table_rows(cql_session, ks, table, n, rng, shard, shards):
+        n_cols = rng.randint(0, len(clustk_columns) + 1) if clustering_columns is None else clustering_columns
         key_columns = partk_columns + clustk_columns[0:n_cols]
-        res.append((row, key_columns))
-    return res
+        yield row, key_columns
+
+
+def fuzz_table_data_with_keys(cql_session, fuzz_table, seed=None):
+    """
+    Sample TEST_SAMPLE_SIZE rows with keys from the part of the table given by TableShard
+    """
+    if seed is None:
+        seed = table_shard_seed(fuzz_table)
+    return some_table_data_with_keys(cql_session, fuzz_table.keyspace, fuzz_table.table, TestConfig.sample_size(),
+                                     seed=seed, shard=fuzz_table.shard, shards=fuzz_table.shards)
+
+
+def token_ring(cql_session):
+    """
+    :return: (min, max) token for the cluster partitioner or None if not supported
+    """
+    partitioner = cql_session.cluster.metadata.partitioner or ''
+    if partitioner.endswith('Murmur3Partitioner'):
+        return MURMUR3_RING
+    if partitioner.endswith('RandomPartitioner'):
+        return RANDOM_RING
+    return None
+
+
+def token_ranges(ring, splits):
+    """
+    Split ring into `splits` (start, end] ranges of the same size
+    """
+    ring_min, ring_max = ring
+    width = (ring_max - ring_min) // splits
+    bounds = [ring_min + i * width for i in range(splits)] + [ring_max]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def shard_token_ranges(ring, shard, shards):
+    """
+    :return: (start, end] ranges of the ring sampled by shard `shard` of `shards` (every shards-th range)
+    """
+    splits = max(TestConfig.sample_splits(), shards)
+    return token_ranges(ring, splits)[shard::shards]
+
+
+class _RangeCursor:
+    """
+    Position of the sampler in a (start, end] token range of the ring: reading begins at a random token of the range
+    and wraps around to its start, so that samples of different seeds start at different partitions.
+    Rows already returned from the partition of the last token are skipped when reading continues.
+    """
+
+    def __init__(self, start, end, rng):
+        cut = rng.randint(start, end - 1)
+        # (start, end] segments still to be read, from the random token to the end and then from the start to it
+        self.segments = [(cut, end), (start, cut)] if cut > start else [(start, end)]
+        self.last_token = None
+        self.returned = 0
+
+    def bounds(self):
+        """
+        :return: (after, to, rows to skip) of the next read
+        """
+        start, end = self.segments[0]
+        if self.last_token is None:
+            return start, end, 0
+        # rows of the last token are read again, the ones already returned are skipped
+        return self.last_token - 1, end, self.returned
+
+    def seen(self, token):
+        if token == self.last_token:
+            self.returned += 1
+        else:
+            self.last_token, self.returned = token, 1
+
+    def segment_done(self):
+        self.segments.pop(0)
+        self.last_token, self.returned = None, 0
+
+
+class TableRowSampler:
+    """
+    Samples rows of a table (or of its shard) from random token sub-ranges.
+    Ring is split into ranges, every shard-th of them belongs to the shard and they are visited in random order
+    from a random token each, in every round each range contributes its share of the rows still missing,
+    ranges without more rows are dropped. Position in every range is kept between calls of rows(),
+    so every call continues where the previous one stopped, until the whole shard is read.
+    Ranges are read page by page so memory use does not depend on n.
+    """
+
+    def __init__(self, cql_session, ks, table, rng, shard=0, shards=1):
+        self.cql_session = cql_session
+        self.ks = ks
+        self.table = table
+        self.shard = shard
+        self.ring = token_ring(cql_session)
+        self.exhausted = self.ring is None and shard != 0
+        self.cursors = []
+        if self.ring is not None:
+            ranges = shard_token_ranges(self.ring, shard, shards)
+            self.cursors = [_RangeCursor(start, end, rng) for start, end in ranges]
+            rng.shuffle(self.cursors)
+
+    def rows(self, n):
+        """
+        Lazily yields up to n rows not returned by previous calls
+        """
+        if self.exhausted:
+            return
+        fetch_size = TestConfig.sample_fetch_size()
+        if self.ring is None:
+            # token ranges are not known for the partitioner, fallback to the head of the table
+            from cassandra.query import SimpleStatement
+            self.exhausted = True
+            query = 'SELECT * FROM "{ks}"."{t}" LIMIT {n}'.format(ks=self.ks, t=self.table, n=n)
+            yield from self.cql_session.execute(SimpleStatement(query, fetch_size=fetch_size))
+            return
+
+        schema = table_schema(self.cql_session, self.ks, self.table)
+        statement = prepared_statements(self.cql_session).token_range(self.ks, self.table, schema.partition_key,
+                                                                      schema.column_names, TOKEN_ALIAS)
+        remaining = n
+        while self.cursors and remaining > 0:
+            quota = -(-remaining // len(self.cursors))
+            for cursor in list(self.cursors):
+                if remaining <= 0:
+                    break
+                limit = min(quota, remaining)
+                after, to, skip = cursor.bounds()
+                bound = statement.bind((after, to, limit + skip))
+                bound.fetch_size = fetch_size
+                count = 0
+                start = time.perf_counter()
+                rows = self.cql_session.execute(bound)
+                if instrumentation.enabled():
+                    # only the first page, following ones are fetched while rows are consumed
+                    instrumentation.emit(instrumentation.CQL, TOKEN_RANGE_ENDPOINT, time.perf_counter() - start)
+                for row in rows:
+                    token = row.pop(TOKEN_ALIAS)
+                    if skip:
+                        skip -= 1
+                        continue
+                    cursor.seen(token)
+                    count += 1
+                    remaining -= 1
+                    yield row
+                if count < limit:
+                    cursor.segment_done()
+                    if not cursor.segments:
+                        self.cursors.remove(cursor)
+        self.exhausted = not self.cursors and self.ring is not None
+
+
+def sample_table_rows(cql_session, ks, table, n, rng, shard=0, shards=1):
+    """
+    Lazily yields up to n rows from random token sub-ranges of the table, see TableRowSampler
+    """
+    return TableRowSampler(cql_session, ks, table, rng, shard, shards).rows(n)
@@ -0,0 +1,281 @@
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from test.common.config.test_config import TestConfig
+from test.common.cql.statements import prepared_statements, TOKEN_RANGE_ENDPOINT
+from test.common.cql.tokens import compile_partition_token, compile_rest_key_parser
+from test.common.perf import instrumentation
+from test.common.rest.rest_util import RESTResult
+from test.common.rest.rest_v1_api import TABLE_ROWS
+from test.common.test.checks import compile_canonical_form
+from test.common.test.objects import token_ring, token_ranges, MURMUR3_RING, TOKEN_ALIAS
+from test.common.test.schema_index import table_schema
+from test.common.test.table_scan import TableScanComparator, rest_table_scan
+
+LOG = logging.getLogger(__name__)
+
+COMPARE_DIGEST = 'range digests'
+DIGEST_SIZE = 16
+# LIMIT of token range queries reading whole ranges, max value of CQL int
+NO_LIMIT = 2 ** 31 - 1
+# leaf ranges the REST stream may get ahead of the CQL stream, REST rows of these ranges are kept meanwhile
+REST_LEAD_LEAVES = 2
+
+
+def _hash(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+class RangeDigestTree:
+    """
+    Merkle tree over the token ring: leaves are digests of rows in 2^depth equal (start, end] token ranges,
+    inner nodes hash their children. Row hashes are folded into leaves with xor, so rows can be added in any order.
+    """
+
+    def __init__(self, ring, depth):
+        self.depth = depth
+        self.ring = ring
+        self.ranges = token_ranges(ring, 2 ** depth)
+        self._starts = [start for start, _ in self.ranges]
+        self.leaves = [0] * len(self.ranges)
+        self.counts = [0] * len(self.ranges)
+        # leaves below it are final when rows are added in token order
+        self.filled = 0
+        self._levels = None
+
+    def leaf(self, token):
+        return max(0, bisect.bisect_left(self._starts, token) - 1)
+
+    def add(self, token, row_hash):
+        """
+        :return: index of the leaf the row belongs to
+        """
+        i = self.leaf(token)
+        self.leaves[i] ^= row_hash
+        self.counts[i] += 1
+        if i > self.filled:
+            self.filled = i
+        return i
+
+    def complete(self):
+        self.filled = len(self.leaves)
+
+    def same_leaf(self, other, i):
+        return self.leaves[i] == other.leaves[i] and self.counts[i] == other.counts[i]
+
+    def levels(self):
+        """
+        :return: list of tree levels from the root ([root]) down to leaves, built once
+        """
+        if self._levels is None:
+            level = [_hash(digest.to_bytes(DIGEST_SIZE, 'big') + count.to_bytes(8, 'big'))
+                     for digest, count in zip(self.leaves, self.counts)]
+            levels = [level]
+            while len(level) > 1:
+                level = [_hash(level[i] + level[i + 1]) for i in range(0, len(level), 2)]
+                levels.append(level)
+            self._levels = levels[::-1]
+        return self._levels
+
+    def diff(self, other):
+        """
+        Descends from the root only into subtrees whose digests differ
+        :return: indexes of leaves that differ from the other tree (of the same depth)
+        """
+        mine, theirs = self.levels(), other.levels()
+        nodes = [0] if mine[0][0] != theirs[0][0] else []
+        for depth in range(1, len(mine)):
+            nodes = [child for node in nodes for child in (2 * node, 2 * node + 1)
+                     if mine[depth][child] != theirs[depth][child]]
+        return nodes
+
+
+class RowHasher:
+    """
+    Canonical row hashes equal for CQL and REST rows that the column comparators consider the same,
+    and tokens of REST rows computed from their partition key values
+    """
+
+    def __init__(self, schema):
+        columns = [c for c in schema.columns if not c.ignored]
+        self.cql_columns = [(c.name, compile_canonical_form(c.parsed_type, cql_side=True)) for c in columns]
+        self.rest_columns = [(c.name, compile_canonical_form(c.parsed_type, cql_side=False)) for c in columns]
+        pk_types = [schema.column(name).parsed_type for name in schema.partition_key]
+        self.partition_key = schema.partition_key
+        self.partition_token = compile_partition_token(pk_types)
+        self.rest_key_parsers = [compile_rest_key_parser(t) for t in pk_types]
+
+    def supports_rest_tokens(self):
+        return self.partition_token is not None and all(self.rest_key_parsers)
+
+    def cql_hash(self, row):
+        return self._hash(canonical(row.get(name)) for name, canonical in self.cql_columns)
+
+    def rest_hash(self, row):
+        return self._hash(canonical(row.get(name)) for name, canonical in self.rest_columns)
+
+    def rest_token(self, row):
+        values = [parse(row.get(name)) for name, parse in zip(self.partition_key, self.rest_key_parsers)]
+        return self.partition_token(values)
+
+    @staticmethod
+    def _hash(values):
+        return int.from_bytes(_hash('\x1f'.join(values).encode()), 'big')
+
+
+class DigestReconciler:
+    """
+    Reconciles table content by token range digests instead of comparing every row:
+    both CQL and REST streams are hashed into RangeDigestTrees (concurrently), trees are compared
+    top down and only leaf ranges with different digests are compared row by row.
+    REST V1 can neither compute digests nor read a token range, so REST rows are streamed once (their tokens
+    computed on the client). Both streams come in token order, REST rows of a leaf range are kept only until
+    the CQL digest of the range is known and dropped when it is the same, rows of diverging ranges are compared
+    without reading them from REST again. The REST stream waits when it is more than REST_LEAD_LEAVES ranges
+    ahead of the CQL stream, so kept rows are bounded by a few ranges and the diverging ones.
+    """
+
+    def __init__(self, cql_session, rest_v1, depth=None, page_size=None, max_mismatches=None):
+        self.cql_session = cql_session
+        self.rest_v1 = rest_v1
+        self.depth = depth or TestConfig.digest_depth()
+        self.page_size = page_size or TestConfig.scan_page_size()
+        self.scan_comparator = TableScanComparator(cql_session, rest_v1, page_size=self.page_size, max_rows=0,
+                                                   max_mismatches=max_mismatches)
+        self.lead_leaves = REST_LEAD_LEAVES
+        self.ranges_compared = 0
+        self.ranges_diverged = 0
+
+    def reconcile_table(self, ks, table):
+        """
+        :return: list of mismatch explanations for rows in diverging ranges, empty if digests agree
+        """
+        schema = table_schema(self.cql_session, ks, table)
+        hasher = RowHasher(schema)
+        ring = token_ring(self.cql_session)
+        # tokens of REST rows are computed on the client, only for Murmur3Partitioner
+        if ring != MURMUR3_RING or not hasher.supports_rest_tokens():
+            LOG.info("can't compute tokens of {ks}.{t} rows, comparing full scans".format(ks=ks, t=table))
+            return self.scan_comparator.compare_table(ks, table)
+
+        cql_tree = RangeDigestTree(ring, self.depth)
+        cql_progress = threading.Condition()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            rest_future = pool.submit(self._rest_tree, ks, table, hasher, cql_tree, cql_progress)
+            self._fill_cql_tree(ks, table, schema, hasher, cql_tree, cql_progress)
+            rest_tree, rest_rows, rest_error = rest_future.result()
+        if rest_error:
+            return [rest_error]
+
+        start = time.perf_counter()
+        leaves = cql_tree.diff(rest_tree)
+        if instrumentation.enabled():
+            instrumentation.emit(instrumentation.COMPARE, COMPARE_DIGEST, time.perf_counter() - start,
+                                 count=len(cql_tree.leaves))
+        self.ranges_compared += len(cql_tree.leaves)
+        self.ranges_diverged += len(leaves)
+        LOG.info("reconciled {ks}.{t}: {d} of {n} token ranges differ".format(
+            ks=ks, t=table, d=len(leaves), n=len(cql_tree.leaves)))
+        if not leaves:
+            return []
+        return self._compare_leaves(ks, table, schema, hasher, cql_tree, leaves, rest_rows)
+
+    def _cql_rows(self, ks, table, schema, start_token, end_token):
+        statement = prepared_statements(self.cql_session).token_range(ks, table, schema.partition_key,
+                                                                      schema.column_names, TOKEN_ALIAS)
+        bound = statement.bind((start_token, end_token, NO_LIMIT))
+        bound.fetch_size = self.page_size
+        start = time.perf_counter()
+        count = 0
+        for row in self.cql_session.execute(bound):
+            count += 1
+            yield row.pop(TOKEN_ALIAS), row
+        if instrumentation.enabled():
+            instrumentation.emit(instrumentation.CQL, TOKEN_RANGE_ENDPOINT, time.perf_counter() - start, count=count)
+
+    def _fill_cql_tree(self, ks, table, schema, hasher, tree, progress):
+        """
+        :param progress: condition notified when a leaf of the tree is final
+        """
+        try:
+            for token, row in self._cql_rows(ks, table, schema, *tree.ring):
+                filled = tree.filled
+                tree.add(token, hasher.cql_hash(row))
+                if tree.filled > filled:
+                    with progress:
+                        progress.notify_all()
+        finally:
+            # also when CQL fails, so the REST stream does not wait for it forever
+            tree.complete()
+            with progress:
+                progress.notify_all()
+
+    def _rest_tree(self, ks, table, hasher, cql_tree, cql_progress):
+        """
+        Digests of REST rows, rows of a leaf range are kept until the range is final in both trees
+        and dropped if the digests are the same. A row out of token order in an already dropped range
+        can't be compared with the kept rows, the range is marked for another REST read.
+        :param cql_tree: tree filled concurrently from CQL rows
+        :param cql_progress: condition notified when a leaf of cql_tree is final
+        :return: (RangeDigestTree, {leaf: rows or None to read again}, None) or (None, None, error)
+        """
+        tree = RangeDigestTree(cql_tree.ring, self.depth)
+        kept = {}
+        dropped = set()
+        for res in rest_table_scan(self.rest_v1, ks, table, self.page_size):
+            if not res.ok:
+                return None, None, res.error
+            for row in res.value['rows']:
+                filled = tree.filled
+                i = tree.add(hasher.rest_token(row), hasher.rest_hash(row))
+                if i in dropped:
+                    dropped.discard(i)
+                    kept[i] = None
+                elif kept.get(i, []) is not None:
+                    kept.setdefault(i, []).append(row)
+                if tree.filled > filled:
+                    with cql_progress:
+                        cql_progress.wait_for(lambda: tree.filled - cql_tree.filled <= self.lead_leaves)
+                    self._drop_same(kept, dropped, tree, cql_tree)
+        tree.complete()
+        return tree, kept, None
+
+    @staticmethod
+    def _drop_same(kept, dropped, rest_tree, cql_tree):
+        final = min(rest_tree.filled, cql_tree.filled)
+        for i in [i for i, rows in kept.items() if i < final and rows is not None]:
+            if rest_tree.same_leaf(cql_tree, i):
+                del kept[i]
+                dropped.add(i)
+
+    def _compare_leaves(self, ks, table, schema, hasher, tree, leaves, rest_rows):
+        """
+        Full comparison of rows in diverging leaf ranges, REST rows kept by the first pass are used
+        unless a range has to be read again
+        """
+        def cql_rows():
+            for i in leaves:
+                for _, row in self._cql_rows(ks, table, schema, *tree.ranges[i]):
+                    yield row
+
+        if all(rest_rows.get(i, []) is not None for i in leaves):
+            url = self.rest_v1.url(TABLE_ROWS.format(ks=ks, t=table))
+            pages = [RESTResult(ok=True, value={'rows': rest_rows.get(i, [])}, status_code=200, error=None, url=url)
+                     for i in leaves]
+            return self.scan_comparator.compare_streams(ks, table, cql_rows(), pages)
+
+        LOG.info("REST rows of {ks}.{t} out of token order, reading diverging ranges again".format(ks=ks, t=table))
+        selected = set(leaves)
+
+        def rest_pages():
+            for res in rest_table_scan(self.rest_v1, ks, table, self.page_size):
+                if res.ok:
+                    rows = [row for row in res.value['rows'] if tree.leaf(hasher.rest_token(row)) in selected]
+                    res = res._replace(value={'rows': rows})
+                yield res
+
+        return self.scan_comparator.compare_streams(ks, table, cql_rows(), rest_pages())
@@ -0,0 +1,79 @@
+"""
+Replays row comparisons recorded with TEST_RECORD_CORPUS (see corpus) without the cluster,
+e.g. after changing normalization rules in checks.py:
+
+    python -m test.common.test.replay <directory or corpus files> [--table ks.table]
+"""
+import argparse
+import logging
+import sys
+import time
+
+from test.common.test.corpus import corpus_files, read_corpus, RowsCodec, COMPARE_RECORD, TABLE_RECORD
+from test.common.test.row_compare import RowComparator
+from test.common.test.schema_index import TableSchemaIndex
+
+LOG = logging.getLogger(__name__)
+
+
+class ReplayComparator(RowComparator):
+    """
+    RowComparator using table schemas from the corpus instead of the cluster
+    """
+
+    def __init__(self):
+        super().__init__(cql_session=None, rest_api=None)
+        self.schemas = {}
+        self.codecs = {}
+
+    def add_table(self, schema):
+        self.schemas[(schema.keyspace, schema.table)] = schema
+        self.codecs[(schema.keyspace, schema.table)] = RowsCodec(schema)
+
+    def table_schema(self, ks, table):
+        return self.schemas[(ks, table)]
+
+    def replay(self, records):
+        """
+        :return: generator of (record, mismatches) for every comparison record
+        """
+        for record in records:
+            if record['type'] == TABLE_RECORD:
+                self.add_table(TableSchemaIndex.from_json(record['schema']))
+            elif record['type'] == COMPARE_RECORD:
+                ks, table = record['ks'], record['table']
+                cql_rows = self.codecs[(ks, table)].decode(record['cql_rows'])
+                yield record, self.compare_rows(ks, table, record['cql_query'], record['rest_url'],
+                                                cql_rows, record['rest_rows'])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Replay row comparisons recorded with TEST_RECORD_CORPUS')
+    parser.add_argument('paths', nargs='+', help='corpus files or directories with .corpus files')
+    parser.add_argument('--table', action='append', default=None,
+                        help='replay only given <keyspace>.<table>, can be repeated')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    tables = set(args.table) if args.table else None
+    comparisons = failed = 0
+    start = time.perf_counter()
+    for path in corpus_files(args.paths):
+        comparator = ReplayComparator()
+        for record, mismatches in comparator.replay(read_corpus(path)):
+            if tables and '{}.{}'.format(record['ks'], record['table']) not in tables:
+                continue
+            comparisons += 1
+            if mismatches:
+                failed += 1
+                print('\n\n'.join(mismatches), end='\n\n')
+    LOG.info("replayed {n} comparisons in {s:.1f}s, {f} with mismatches".format(
+        n=comparisons, s=time.perf_counter() - start, f=failed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import itertools
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from test.common.config.test_config import TestConfig
+from test.common.cql.statements import cql_rows_by_keys, select_by_key_query, SELECT_BY_KEY_ENDPOINT
+from test.common.perf import instrumentation
+from test.common.test.checks import cql_row_columns_to_rest_values
+from test.common.test.corpus import recorder
+from test.common.test.schema_index import table_schema
+
+LOG = logging.getLogger(__name__)
+
+COMPARE_ROWS = 'rows by key'
+
+
+def explanation(cql_query, rest_url, cql_out, rest_out, cql_column=None, detail=None):
+    lines = [
+        "Results from CQL Query: {}".format(cql_query),
+        "and REST call {}".format(rest_url),
+        "differ"
+    ]
+    if cql_column:
+        lines.append("on column {n}: {t}".format(n=cql_column.name, t=cql_column.cql_type))
+    if cql_out:
+        lines.append("CQL result: {}".format(cql_out))
+    if rest_out:
+        lines.append("REST result: {}".format(rest_out))
+    if detail:
+        lines.append(detail)
+    return '\n'.join(lines)
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RowComparator:
+    """
+    Compares REST query by key (RESTApiV1, RESTApiV2 or another APIClient) with CQL query using the same PK
+    and CK columns. Keys are processed in chunks: REST GETs run on a thread pool sharing the rest_api session,
+    in batches of the client's batch_size keys, while CQL reference queries for the chunk are sent in bulk
+    with prepared statements, rows of every key are then compared on the pool with CQL rows of the key.
+    """
+
+    CHUNK_FACTOR = 4
+
+    def __init__(self, cql_session, rest_api, concurrency=None):
+        self.cql_session = cql_session
+        self.rest_api = rest_api
+        self.concurrency = concurrency or TestConfig.concurrency()
+        self.recorder = recorder()
+
+    def table_schema(self, ks, table):
+        return table_schema(self.cql_session, ks, table)
+
+    def compare_rows_by_pk(self, ks, table, data):
+        """
+        :param data: iterable of (row, key_columns) e.g. from some_table_data_with_keys
+        :return: list of mismatch explanations, empty if REST and CQL agree on all keys
+        """
+        mismatches = []
+        chunk_size = self.concurrency * self.CHUNK_FACTOR * self.rest_api.batch_size
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for chunk in _chunks(data, chunk_size):
+                mismatches.extend(self._compare_chunk(pool, ks, table, chunk))
+        return mismatches
+
+    def _compare_chunk(self, pool, ks, table, chunk):
+        schema = self.table_schema(ks, table)
+        cql_futures = [Future() for _ in chunk]
+        keys_by_shape = defaultdict(list)
+        for i, (row, key_columns) in enumerate(chunk):
+            keys_by_shape[tuple(key_columns)].append((i, row))
+
+        compare_futures = []
+        for key_columns, keys in keys_by_shape.items():
+            for batch in _chunks(keys, self.rest_api.batch_size):
+                compare_futures.append(pool.submit(self._compare_batch, schema, list(key_columns),
+                                                   [row for _, row in batch], [cql_futures[i] for i, _ in batch]))
+
+        # REST requests are in flight while CQL side is queried in bulk, one batch per key shape
+        try:
+            for key_columns, keys in keys_by_shape.items():
+                start = time.perf_counter()
+                results = cql_rows_by_keys(self.cql_session, ks, table, key_columns,
+                                           [tuple(row[c] for c in key_columns) for _, row in keys], self.concurrency)
+                if instrumentation.enabled():
+                    instrumentation.emit(instrumentation.CQL, SELECT_BY_KEY_ENDPOINT, time.perf_counter() - start,
+                                         count=len(keys))
+                for (i, _), result in zip(keys, results):
+                    cql_futures[i].set_result(result)
+        except Exception as e:
+            # workers wait for CQL results, they must not be left hanging
+            for future in cql_futures:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+
+        mismatches = []
+        for future in compare_futures:
+            mismatches.extend(future.result())
+        return mismatches
+
+    def _compare_batch(self, schema, key_columns, rows, cql_futures):
+        """
+        Runs on the pool: gets REST rows for a batch of keys of the same shape
+        and compares rows of every key with its CQL rows
+        :param cql_futures: Futures of (success, rows) from the bulk CQL query, one per row
+        :return: list of mismatch explanations
+        """
+        ks, table = schema.keyspace, schema.table
+        keys = [cql_row_columns_to_rest_values(schema, row, key_columns) for row in rows]
+        rest_results = self.rest_api.rows_by_keys(ks, table, key_columns, keys, schema=schema)
+        mismatches = []
+        for i, (row, rest_res) in enumerate(zip(rows, rest_results)):
+            try:
+                cql_query = '{q} {v}'.format(q=select_by_key_query(ks, table, key_columns),
+                                             v=[row[c] for c in key_columns])
+                mismatches.extend(self._compare_key(schema, cql_query, rest_res, cql_futures[i]))
+            finally:
+                if rest_res.ok and hasattr(rest_res.value, 'close'):
+                    rest_res.value.close()
+        return mismatches
+
+    def _compare_key(self, schema, cql_query, rest_res, cql_future):
+        """
+        Compares REST rows of the key with CQL rows as they are decoded
+        :param rest_res: RESTResult, value is iterable of REST rows of the key
+        :param cql_future: Future of (success, rows) from the bulk CQL query
+        :return: list of mismatch explanations
+        """
+        ks, table = schema.keyspace, schema.table
+        LOG.debug(cql_query)
+        success, cql_rows = cql_future.result()
+        if not rest_res.ok:
+            return [rest_res.error]
+        if not success:
+            return ["CQL Query: {q} failed with {e}".format(q=cql_query, e=cql_rows)]
+        rest_rows = rest_res.value
+        if self.recorder:
+            rest_rows = list(rest_rows)
+            self.recorder.record_comparison(schema, cql_query, rest_res.url, cql_rows, rest_rows)
+        start = time.perf_counter()
+        mismatches = self.compare_rows(ks, table, cql_query, rest_res.url, cql_rows, rest_rows)
+        if instrumentation.enabled():
+            instrumentation.emit(instrumentation.COMPARE, COMPARE_ROWS, time.perf_counter() - start,
+                                 count=len(cql_rows))
+        return mismatches
+
+    def compare_rows(self, ks, table, cql_query, rest_url, cql_rows, rest_rows):
+        """
+        Compare rows returned by CQL and REST for the same key row by row and column by column
+        :param rest_rows: list or iterator of REST rows (e.g. RowStream), consumed one row at a time
+        :return: list of mismatch explanations
+        """
+        schema = self.table_schema(ks, table)
+        rest_rows = iter(rest_rows)
+        mismatches = []
+        rest_count = 0
+        for cql_row, rest_row in zip(cql_rows, rest_rows):
+            rest_count += 1
+            # all colums should be present
+            if cql_row.keys() != rest_row.keys():
+                mismatches.append(explanation(cql_query, rest_url, cql_row, rest_row))
+                continue
+            # let's compare by column values
+            for column, cql_val in cql_row.items():
+                column_schema = schema.column(column)
+                if column_schema.ignored:
+                    continue
+                rest_val = rest_row[column]
+                same, detail = column_schema.compare(cql_val, rest_val)
+                if not same:
+                    mismatches.append(explanation(cql_query, rest_url, cql_out=cql_val, rest_out=rest_val,
+                                                  cql_column=column_schema, detail=detail))
+        extra_rest_rows = list(rest_rows)
+        rest_count += len(extra_rest_rows)
+        if rest_count != len(cql_rows):
+            # rows were compared one by one and are not kept, report counts and rows without pair
+            detail = "CQL returned {c} rows, REST returned {r} rows".format(c=len(cql_rows), r=rest_count)
+            return [explanation(cql_query, rest_url, cql_out=cql_rows[rest_count:], rest_out=extra_rest_rows,
+                                detail=detail)]
+        return mismatches
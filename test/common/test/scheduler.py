@@ -0,0 +1,308 @@
+"""
+Time budgeted fuzzing (TEST_TIME_BUDGET): instead of TEST_SAMPLE_SIZE rows per table, every table gets a share
+of the wall clock budget and keys are compared in rounds until its share is spent. The budget is for the whole
+session, the share of a table is split evenly between tests fuzzing it (e.g. REST V1 and V2 lookups).
+Rounds of a table read its rows from a cursor kept by the scheduler, so every round (also of another test)
+continues where the previous one stopped and the table is read again only once all of it was compared.
+
+Work is split into cells (keyspace, table, number of clustering columns in the key, column type mix of the table).
+Every cell keeps keys compared, seconds spent and mismatches found, persisted between runs (TEST_SCHEDULE_STATS).
+Cells score by expected mismatches per second (throughput times failure rate, rates of a type mix are the prior
+of its tables) plus a bonus for cells with little coverage. Tables get time in proportion to their best cells,
+rounds within a table go to its best scoring cell.
+"""
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on windows, stats are then not locked between processes
+    fcntl = None
+
+from test.common.config.test_config import TestConfig
+from test.common.test.objects import TableRowSampler, select_fuzz_tables, table_shard_seed
+from test.common.test.row_compare import RowComparator
+
+LOG = logging.getLogger(__name__)
+
+# weight of coverage bonus against expected mismatches per second
+EXPLORATION = 0.5
+# prior failure rate: 1 mismatch per PRIOR_KEYS keys
+PRIOR_KEYS = 100
+# throughput assumed for cells never run if nothing has run yet, keys per second
+PRIOR_THROUGHPUT = 100.0
+# every table gets at least this fraction of an even split of the budget
+MIN_SHARE = 0.1
+
+
+class CellStats:
+
+    def __init__(self, keys=0, seconds=0.0, failures=0):
+        self.keys = keys
+        self.seconds = seconds
+        self.failures = failures
+
+    def add(self, other):
+        self.keys += other.keys
+        self.seconds += other.seconds
+        self.failures += other.failures
+
+    def throughput(self, default):
+        return self.keys / self.seconds if self.seconds > 0 else default
+
+    def failure_rate(self, prior_rate):
+        return (self.failures + prior_rate * PRIOR_KEYS) / (self.keys + PRIOR_KEYS)
+
+
+def type_mix(schema):
+    """
+    :return: label of column types used by the table e.g. 'collection+udt', 'scalar' if only simple types
+    """
+    kinds = set()
+    for column in schema.columns:
+        parsed = column.parsed_type
+        if parsed.is_udt():
+            kinds.add('udt')
+        elif parsed.name in ('list', 'set', 'map'):
+            kinds.add('collection')
+        elif parsed.name == 'tuple':
+            kinds.add('tuple')
+    return '+'.join(sorted(kinds)) or 'scalar'
+
+
+class ScheduleStats:
+    """
+    Cell stats loaded from `path` at start, new results are kept apart and merged into the file by save()
+    so that concurrent processes (pytest-xdist workers) do not lose each other's results
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.cells = defaultdict(CellStats)
+        self.mixes = {}
+        self.new = defaultdict(CellStats)
+        self._lock = threading.Lock()
+        for key, stats in self._read().items():
+            self.cells[key] = stats
+            self.mixes[key[:2]] = key[3]
+
+    def _read(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {(e['keyspace'], e['table'], e['prefix'], e['mix']): CellStats(e['keys'], e['seconds'], e['failures'])
+                for e in entries}
+
+    def record(self, cell, keys, seconds, failures):
+        with self._lock:
+            stats = CellStats(keys, seconds, failures)
+            self.cells[cell].add(stats)
+            self.new[cell].add(stats)
+            self.mixes[cell[:2]] = cell[3]
+
+    def mix_stats(self):
+        mixes = defaultdict(CellStats)
+        with self._lock:
+            for cell, stats in self.cells.items():
+                mixes[cell[3]].add(stats)
+        return mixes
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def save(self):
+        if not self.path or not self.new:
+            return
+        with self._lock, self._file_lock():
+            cells = self._read()
+            for cell, stats in self.new.items():
+                cells.setdefault(cell, CellStats()).add(stats)
+            entries = [{'keyspace': ks, 'table': t, 'prefix': p, 'mix': m,
+                        'keys': s.keys, 'seconds': s.seconds, 'failures': s.failures}
+                       for (ks, t, p, m), s in sorted(cells.items())]
+            tmp_path = '{p}.{pid}.tmp'.format(p=self.path, pid=os.getpid())
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+            self.new.clear()
+
+
+class FuzzScheduler:
+    """
+    Splits TEST_TIME_BUDGET between tables and rounds of a table between its cells
+    """
+
+    def __init__(self, stats, budget, table_shards, workers=1, users=1):
+        """
+        :param table_shards: all TableShards tested in the session, budget is split between them
+        :param workers: number of processes running tests in parallel, wall clock budget of each of them
+        :param users: number of tests fuzzing every TableShard, share of a TableShard is split between them
+        """
+        self.stats = stats
+        self.budget = budget
+        self.table_shards = table_shards
+        self.workers = workers
+        self.users = users
+        self.round_keys = TestConfig.concurrency() * RowComparator.CHUNK_FACTOR
+        self._shares = None
+        # TableShard -> TableRowSampler the next round continues from
+        self._samplers = {}
+
+    def _prior_rate(self, mix_stats, mix):
+        stats = mix_stats.get(mix)
+        return stats.failure_rate(1.0 / PRIOR_KEYS) if stats else 1.0 / PRIOR_KEYS
+
+    @staticmethod
+    def _prior_throughput(mix_stats):
+        total = CellStats()
+        for stats in mix_stats.values():
+            total.add(stats)
+        return total.throughput(PRIOR_THROUGHPUT)
+
+    def _score(self, stats, prior_rate, prior_throughput, total_keys):
+        rate = stats.failure_rate(prior_rate)
+        bonus = EXPLORATION * math.sqrt(math.log(total_keys + 2) / (stats.keys + 1))
+        return stats.throughput(prior_throughput) * (rate + bonus * prior_rate)
+
+    def _table_score(self, ks, table, mix_stats, total_keys):
+        mix = self.stats.mixes.get((ks, table))
+        prior_rate = self._prior_rate(mix_stats, mix)
+        prior_throughput = self._prior_throughput(mix_stats)
+        cells = [stats for cell, stats in self.stats.cells.items() if cell[:2] == (ks, table)] or [CellStats()]
+        return max(self._score(stats, prior_rate, prior_throughput, total_keys) for stats in cells)
+
+    def table_budget(self, table_shard):
+        """
+        :return: seconds of wall clock the TableShard can take
+        """
+        if self._shares is None:
+            mix_stats = self.stats.mix_stats()
+            total_keys = sum(s.keys for s in mix_stats.values())
+            scores = {t: self._table_score(t.keyspace, t.table, mix_stats, total_keys) for t in self.table_shards}
+            total = sum(scores.values()) or 1.0
+            even = 1.0 / max(len(scores), 1)
+            self._shares = {t: MIN_SHARE * even + (1 - MIN_SHARE) * score / total for t, score in scores.items()}
+        return self.budget * self.workers * self._shares.get(table_shard, 1.0 / max(len(self.table_shards), 1))
+
+    def test_budget(self, table_shard):
+        """
+        :return: seconds of wall clock a single test can spend on the TableShard
+        """
+        return self.table_budget(table_shard) / self.users
+
+    def _sampler(self, cql_session, table_shard, rng):
+        """
+        :return: TableRowSampler of the TableShard positioned after rows of previous rounds,
+                 a new one from a random position once the whole TableShard was read
+        """
+        sampler = self._samplers.get(table_shard)
+        if sampler is None or sampler.exhausted:
+            sampler = TableRowSampler(cql_session, table_shard.keyspace, table_shard.table,
+                                      random.Random(rng.getrandbits(64)), table_shard.shard, table_shard.shards)
+            self._samplers[table_shard] = sampler
+        return sampler
+
+    def choose_prefix(self, ks, table, mix, prefixes):
+        """
+        :param prefixes: possible numbers of clustering columns in the key
+        :return: number of clustering columns for the next round
+        """
+        mix_stats = self.stats.mix_stats()
+        prior_rate = self._prior_rate(mix_stats, mix)
+        prior_throughput = self._prior_throughput(mix_stats)
+        cells = [self.stats.cells.get((ks, table, p, mix), CellStats()) for p in prefixes]
+        total_keys = sum(c.keys for c in cells)
+        scores = [self._score(c, prior_rate, prior_throughput, total_keys) for c in cells]
+        return prefixes[scores.index(max(scores))]
+
+    def fuzz_table(self, cql_session, rest_api, table_shard, schema, seed=None):
+        """
+        Compares rows by key in rounds until the test's part of the budget of the TableShard is spent
+        :return: list of mismatch explanations
+        """
+        ks, table = table_shard.keyspace, table_shard.table
+        mix = type_mix(schema)
+        prefixes = list(range(len(schema.clustering_key) + 1))
+        deadline = time.monotonic() + self.test_budget(table_shard)
+        if seed is None:
+            seed = table_shard_seed(table_shard)
+        rng = random.Random(seed if seed is not None else random.getrandbits(64))
+        comparator = RowComparator(cql_session, rest_api)
+        mismatches = []
+        rounds = 0
+        while rounds == 0 or time.monotonic() < deadline:
+            prefix = self.choose_prefix(ks, table, mix, prefixes)
+            start = time.perf_counter()
+            key_columns = list(schema.partition_key) + list(schema.clustering_key)[:prefix]
+            rows = self._sampler(cql_session, table_shard, rng).rows(self.round_keys)
+            data = [(row, key_columns) for row in rows]
+            if not data:
+                break
+            found = comparator.compare_rows_by_pk(ks, table, data)
+            self.stats.record((ks, table, prefix, mix), len(data), time.perf_counter() - start, len(found))
+            mismatches.extend(found)
+            rounds += 1
+        LOG.info("fuzzed {t} in {r} rounds, {m} mismatches".format(t=table_shard, r=rounds, m=len(mismatches)))
+        return mismatches
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def schedule_stats():
+    """
+    :return: process wide ScheduleStats loaded from TEST_SCHEDULE_STATS
+    """
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = ScheduleStats(TestConfig.schedule_stats())
+        return _stats
+
+
+def save_schedule_stats():
+    with _stats_lock:
+        if _stats is not None:
+            _stats.save()
+
+
+def scheduler_users(items):
+    """
+    :param items: collected test items
+    :return: number of test functions using the fuzz_scheduler fixture, at least 1
+    """
+    return max(1, len({item.nodeid.split('[')[0] for item in items
+                       if 'fuzz_scheduler' in getattr(item, 'fixturenames', ())}))
+
+
+def fuzz_scheduler(cql_session, users=1):
+    """
+    :param users: number of tests sharing the budget of every table, see scheduler_users
+    :return: FuzzScheduler for fuzz tests of the session or None if TEST_TIME_BUDGET is not set
+    """
+    if not TestConfig.time_budget():
+        return None
+    table_shards = select_fuzz_tables(cql_session)
+    workers = int(os.environ.get('PYTEST_XDIST_WORKER_COUNT', '1'))
+    return FuzzScheduler(schedule_stats(), TestConfig.time_budget(), table_shards, workers, users)
@@ -0,0 +1,115 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from test.common.config.test_config import TestConfig
+from test.common.cql.cql_tools import cql_keyspaces, cql_table_metadata
+from test.common.cql.cql_types import parse_cql_type
+
+LOG = logging.getLogger(__name__)
+
+
+def same_type(cql_type, rest_type):
+    """
+    Parsed types are the same, UDT names may be qualified with the keyspace on one side
+    """
+    if cql_type.is_udt() != rest_type.is_udt() or cql_type.field_names != rest_type.field_names:
+        return False
+    if cql_type.is_udt():
+        names_match = cql_type.name.split('.')[-1] == rest_type.name.split('.')[-1]
+    else:
+        names_match = cql_type.name == rest_type.name
+    return names_match and len(cql_type.subtypes) == len(rest_type.subtypes) and \
+        all(same_type(a, b) for a, b in zip(cql_type.subtypes, rest_type.subtypes))
+
+
+def _user_types(ks_name, user_types):
+    """
+    :return: UDTs of the keyspace by name and by name qualified with the keyspace
+    """
+    types = dict(user_types)
+    types.update({'{ks}.{n}'.format(ks=ks_name, n=name): udt for name, udt in user_types.items()})
+    return types
+
+
+def compare_table_definition(table_metadata, user_types, rest_definition):
+    """
+    Compares REST V1 table definition with driver metadata: columns with their types and static flags,
+    partition and clustering key order, default TTL and clustering order
+    :return: list of mismatch descriptions
+    """
+    ks, table = table_metadata.keyspace_name, table_metadata.name
+    user_types = _user_types(ks, user_types)
+    mismatches = []
+
+    def mismatch(what, cql_value, rest_value):
+        mismatches.append("{ks}.{t}: {w} differ, CQL: {c}, REST: {r}".format(
+            ks=ks, t=table, w=what, c=cql_value, r=rest_value))
+
+    rest_columns = {c['name']: c for c in rest_definition.get('columnDefinitions') or []}
+    if set(rest_columns) != set(table_metadata.columns):
+        mismatch('columns', sorted(table_metadata.columns), sorted(rest_columns))
+    for name, column in table_metadata.columns.items():
+        rest_column = rest_columns.get(name)
+        if rest_column is None:
+            continue
+        cql_type = parse_cql_type(column.cql_type, user_types)
+        try:
+            rest_type = parse_cql_type(rest_column.get('typeDefinition', ''), user_types)
+        except (ValueError, IndexError):
+            rest_type = None
+        if rest_type is None or not same_type(cql_type, rest_type):
+            mismatch('types of column {}'.format(name), column.cql_type, rest_column.get('typeDefinition'))
+        if bool(rest_column.get('static')) != bool(column.is_static):
+            mismatch('static flags of column {}'.format(name), column.is_static, rest_column.get('static'))
+
+    primary_key = rest_definition.get('primaryKey') or {}
+    partition_key = [c.name for c in table_metadata.partition_key]
+    if primary_key.get('partitionKey') != partition_key:
+        mismatch('partition keys', partition_key, primary_key.get('partitionKey'))
+    clustering_key = [c.name for c in table_metadata.clustering_key]
+    if (primary_key.get('clusteringKey') or []) != clustering_key:
+        mismatch('clustering keys', clustering_key, primary_key.get('clusteringKey'))
+
+    options = rest_definition.get('tableOptions') or {}
+    ttl = (table_metadata.options or {}).get('default_time_to_live', 0)
+    if options.get('defaultTimeToLive', 0) != ttl:
+        mismatch('default TTLs', ttl, options.get('defaultTimeToLive'))
+    cql_order = [(c.name, 'DESC' if c.is_reversed else 'ASC') for c in table_metadata.clustering_key]
+    rest_order = [(x.get('column'), (x.get('order') or '').upper()) for x in options.get('clusteringExpression') or []]
+    if rest_order != cql_order:
+        mismatch('clustering orders', cql_order, rest_order)
+    return mismatches
+
+
+class SchemaCrawler:
+    """
+    Fetches definitions of many tables with REST V1 on a bounded thread pool
+    and compares them with the driver metadata as they arrive
+    """
+
+    def __init__(self, cql_session, rest_v1, concurrency=None):
+        self.cql_session = cql_session
+        self.rest_v1 = rest_v1
+        self.concurrency = concurrency or TestConfig.concurrency()
+
+    def compare_tables(self, tables):
+        """
+        :param tables: list of (keyspace, table)
+        :return: list of mismatch descriptions, empty if REST and CQL schemas agree
+        """
+        mismatches = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [(ks, table, pool.submit(self.rest_v1.get_table, ks, table)) for ks, table in tables]
+            for ks, table, future in futures:
+                res = future.result()
+                if not res.ok:
+                    mismatches.append(res.error)
+                    continue
+                metadata = cql_table_metadata(self.cql_session, ks, table)
+                if metadata is None:
+                    mismatches.append("{ks}.{t}: table not found in CQL metadata".format(ks=ks, t=table))
+                    continue
+                user_types = cql_keyspaces(self.cql_session)[ks].user_types
+                mismatches.extend(compare_table_definition(metadata, user_types, res.value))
+        LOG.info("compared definitions of {n} tables, {m} mismatches".format(n=len(tables), m=len(mismatches)))
+        return mismatches
@@ -0,0 +1,274 @@
+import json
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import pytest
+
+from test.common.cql.cql_tools import cql_keyspaces, cql_schema_version, cql_table_metadata
+from test.common.cql.cql_types import parse_cql_type, cql_type_to_json, cql_type_from_json
+from test.common.rest.rest_values import compile_rest_value_encoder
+from test.common.test.checks import compile_canonical_form, compile_column_comparator, ignore_column, \
+    timestamp_rest_format
+
+LOG = logging.getLogger(__name__)
+
+WORKER_OUTPUT_KEY = 'stargate_schema_snapshot'
+
+
+def _rest_key_encoder(parsed_type):
+    if parsed_type.name == 'timestamp':
+        return timestamp_rest_format
+    return None
+
+
+class ColumnSchema:
+    """
+    Everything tests need to know about a column, precomputed from the driver metadata
+    """
+
+    __slots__ = ('name', 'cql_type', 'parsed_type', 'kind', 'ignored', 'rest_key_encoder', 'rest_value_encoder',
+                 'compare', 'cql_canonical', 'rest_canonical')
+
+    def __init__(self, name, cql_type, parsed_type, kind):
+        self.name = name
+        self.cql_type = cql_type
+        self.parsed_type = parsed_type
+        self.kind = kind
+        self.ignored = ignore_column(self)
+        self.rest_key_encoder = _rest_key_encoder(parsed_type)
+        self.rest_value_encoder = compile_rest_value_encoder(parsed_type)
+        self.compare = compile_column_comparator(parsed_type)
+        self.cql_canonical = compile_canonical_form(parsed_type, cql_side=True)
+        self.rest_canonical = compile_canonical_form(parsed_type, cql_side=False)
+
+    def __repr__(self):
+        return 'ColumnSchema({n} {t} {k})'.format(n=self.name, t=self.cql_type, k=self.kind)
+
+
+class TableSchemaIndex:
+    """
+    Snapshot of a table schema built once per table so that hot loops do not walk the driver metadata:
+    - columns in metadata order with parsed types, ignore flags, REST key and value encoders, comparators
+      and canonical forms
+    - partition key and clustering key column names
+    Can be serialized with to_json() and restored with from_json() without connecting to the cluster.
+    """
+
+    __slots__ = ('keyspace', 'table', 'columns', 'column_names', 'partition_key', 'clustering_key', '_by_name')
+
+    def __init__(self, keyspace, table, columns, partition_key, clustering_key):
+        self.keyspace = keyspace
+        self.table = table
+        self.columns = tuple(columns)
+        self.column_names = tuple(c.name for c in self.columns)
+        self.partition_key = tuple(partition_key)
+        self.clustering_key = tuple(clustering_key)
+        self._by_name = {c.name: c for c in self.columns}
+
+    @classmethod
+    def from_metadata(cls, table_metadata, user_types):
+        partition_key = [x.name for x in table_metadata.partition_key]
+        clustering_key = [x.name for x in table_metadata.clustering_key]
+        columns = []
+        for name, col in table_metadata.columns.items():
+            if name in partition_key:
+                kind = 'partition_key'
+            elif name in clustering_key:
+                kind = 'clustering'
+            else:
+                kind = 'static' if col.is_static else 'regular'
+            columns.append(ColumnSchema(name, col.cql_type, parse_cql_type(col.cql_type, user_types), kind))
+        return cls(table_metadata.keyspace_name, table_metadata.name, columns, partition_key, clustering_key)
+
+    def column(self, name):
+        return self._by_name.get(name)
+
+    def rest_key_values(self, row, key_columns):
+        """
+        :return: values of key columns from the CQL row in format expected by REST api
+        """
+        values = []
+        for name in key_columns:
+            encode = self._by_name[name].rest_key_encoder
+            values.append(encode(row[name]) if encode else row[name])
+        return values
+
+    def cql_key(self, row, key_columns):
+        """
+        :return: canonical form of key columns of a CQL row, equal to rest_key of the same row read with REST
+        """
+        return tuple(self._by_name[name].cql_canonical(row[name]) for name in key_columns)
+
+    def rest_key(self, row, key_columns):
+        """
+        :return: canonical form of key columns of a REST row, equal to cql_key of the same row read with CQL
+        """
+        return tuple(self._by_name[name].rest_canonical(row.get(name)) for name in key_columns)
+
+    def rest_canonical_row(self, row):
+        """
+        :return: canonical form of compared (not ignored) columns of a REST row, same for rows of REST V1 and V2
+        """
+        return tuple(c.rest_canonical(row.get(c.name)) for c in self.columns if not c.ignored)
+
+    def rest_row_values(self, row, columns):
+        """
+        :return: list of (column, value) from the row in format of REST write requests
+        """
+        return [(name, self._by_name[name].rest_value_encoder(row[name])) for name in columns]
+
+    def to_json(self):
+        return {
+            'keyspace': self.keyspace,
+            'table': self.table,
+            'partition_key': list(self.partition_key),
+            'clustering_key': list(self.clustering_key),
+            'columns': [[c.name, c.cql_type, cql_type_to_json(c.parsed_type), c.kind] for c in self.columns],
+        }
+
+    @classmethod
+    def from_json(cls, value):
+        columns = [ColumnSchema(name, cql_type, cql_type_from_json(parsed), kind)
+                   for name, cql_type, parsed, kind in value['columns']]
+        return cls(value['keyspace'], value['table'], columns, value['partition_key'], value['clustering_key'])
+
+
+class SchemaIndexCache:
+    """
+    Table schema indexes for a single session.
+    If SCHEMA_SNAPSHOT points to a file saved for the current schema version indexes are loaded from there,
+    so that later runs skip the metadata crawl. The file is written once at the end of the test session
+    (see SchemaSnapshotPlugin), a snapshot of another schema version is ignored and replaced.
+    """
+
+    def __init__(self, cql_session, snapshot_path=None):
+        self.cql_session = cql_session
+        self.schema_version = cql_schema_version(cql_session) if snapshot_path else None
+        self._tables = {}
+        self._lock = threading.Lock()
+        if snapshot_path and os.path.exists(snapshot_path):
+            version, tables = load_schema_snapshot(snapshot_path)
+            if self.schema_version is not None and version == self.schema_version:
+                self._tables.update(tables)
+            else:
+                LOG.info("schema snapshot {p} is for schema version {v}, cluster has {c}, rebuilding".format(
+                    p=snapshot_path, v=version, c=self.schema_version))
+
+    def get(self, ks, table):
+        with self._lock:
+            index = self._tables.get((ks, table))
+            if index is None:
+                index = self._build(ks, table)
+                self._tables[(ks, table)] = index
+            return index
+
+    def indexes(self):
+        with self._lock:
+            return list(self._tables.values())
+
+    def _build(self, ks, table):
+        metadata = cql_table_metadata(self.cql_session, ks, table)
+        if metadata is None:
+            raise KeyError("table {ks}.{t} not found in cluster metadata".format(ks=ks, t=table))
+        return TableSchemaIndex.from_metadata(metadata, cql_keyspaces(self.cql_session)[ks].user_types)
+
+
+def load_schema_snapshot(path):
+    """
+    :return: (schema version, dict (keyspace, table) -> TableSchemaIndex)
+    """
+    with open(path) as f:
+        value = json.load(f)
+    if not isinstance(value, dict):
+        # snapshot saved without schema version
+        return None, {}
+    tables = [TableSchemaIndex.from_json(x) for x in value['tables']]
+    LOG.info("loaded schema of {n} tables from {p}".format(n=len(tables), p=path))
+    return value['schema_version'], {(x.keyspace, x.table): x for x in tables}
+
+
+def save_schema_snapshot(path, schema_version, indexes):
+    tmp_path = '{p}.{pid}.tmp'.format(p=path, pid=os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump({'schema_version': schema_version, 'tables': [x.to_json() for x in indexes]}, f)
+    os.replace(tmp_path, path)
+
+
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def table_schema(cql_session, ks, table):
+    """
+    :return: TableSchemaIndex for the table, built on first use for the session
+    """
+    with _caches_lock:
+        cache = _caches.get(cql_session)
+        if cache is None:
+            cache = SchemaIndexCache(cql_session, schema_snapshot_path())
+            _caches[cql_session] = cache
+    return cache.get(ks, table)
+
+
+def schema_snapshot_path():
+    return os.environ.get('SCHEMA_SNAPSHOT')
+
+
+def snapshot_json():
+    """
+    :return: schema version and indexes of all tables indexed by sessions of this process,
+        indexes of sessions of another schema version are left out
+    """
+    with _caches_lock:
+        caches = [c for c in _caches.values() if c.schema_version is not None]
+    version = caches[-1].schema_version if caches else None
+    tables = {(x.keyspace, x.table): x.to_json()
+              for cache in caches if cache.schema_version == version for x in cache.indexes()}
+    return {'schema_version': version, 'tables': list(tables.values())}
+
+
+def is_requested(config):
+    return bool(schema_snapshot_path())
+
+
+class SchemaSnapshotPlugin:
+    """
+    Writes SCHEMA_SNAPSHOT once at the end of the session from the controller process,
+    pytest-xdist workers send indexes they built at their end
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.worker_snapshots = []
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session):
+        # before the shared CQL session (and its indexes) goes away
+        snapshot = snapshot_json()
+        workeroutput = getattr(self.config, 'workeroutput', None)
+        if workeroutput is not None:
+            workeroutput[WORKER_OUTPUT_KEY] = json.dumps(snapshot)
+            return
+        self.save([snapshot] + self.worker_snapshots)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        output = getattr(node, 'workeroutput', {}).get(WORKER_OUTPUT_KEY)
+        if output:
+            self.worker_snapshots.append(json.loads(output))
+
+    @staticmethod
+    def save(snapshots):
+        versions = {x['schema_version'] for x in snapshots if x['tables']}
+        if len(versions) != 1:
+            LOG.warning("schema snapshot not saved, indexed schema versions: {}".format(sorted(map(str, versions))))
+            return
+        tables = OrderedDict()
+        for snapshot in snapshots:
+            tables.update(((x['keyspace'], x['table']), x) for x in snapshot['tables'])
+        path = schema_snapshot_path()
+        save_schema_snapshot(path, versions.pop(), [TableSchemaIndex.from_json(x) for x in tables.values()])
+        LOG.info("saved schema of {n} tables to {p}".format(n=len(tables), p=path))
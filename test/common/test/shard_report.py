@@ -0,0 +1,238 @@
+"""
+Results of distributed runs: every client (TEST_SHARD=i/N) writes a report with its mismatches, test outcomes
+and instrumentation stats (throughput, latency histograms) and reports of all clients are merged into one:
+    python -m test.common.test.shard_report merged.json reports/*.json
+A merged report has the same format as the report of a single client, so it can be merged again.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import time
+from collections import Counter
+
+import pytest
+
+from test.common.config.test_config import TestConfig
+from test.common.perf import instrumentation
+from test.common.perf.instrumentation import StatsCollector
+
+LOG = logging.getLogger(__name__)
+
+WORKER_OUTPUT_KEY = 'stargate_shard_report'
+
+
+def addoption(parser):
+    group = parser.getgroup('stargate-fuzz')
+    group.addoption('--shard', default=None,
+                    help='part of a distributed run tested by this client as <shard>/<shards> e.g. 0/4 '
+                         '(TEST_SHARD), shards split tables and token ranges')
+    group.addoption('--fuzz-seed', type=int, default=None,
+                    help='global seed of a distributed run (TEST_SEED), rows sampled depend only on it')
+    group.addoption('--shard-report', default=None,
+                    help='json file to write results of this client to (TEST_SHARD_REPORT)')
+
+
+def configure(config):
+    """
+    Command line options take precedence over environment variables
+    """
+    if config.getoption('shard'):
+        TestConfig.SHARD = config.getoption('shard')
+    if config.getoption('fuzz_seed') is not None:
+        TestConfig.SEED = str(config.getoption('fuzz_seed'))
+    if config.getoption('shard_report'):
+        TestConfig.SHARD_REPORT = config.getoption('shard_report')
+    TestConfig.client_shard()
+
+
+def is_requested(config):
+    return bool(TestConfig.shard_report())
+
+
+class ShardReport:
+    """
+    Results of one or more clients of a distributed run
+    """
+
+    def __init__(self, shards, seed, clients=None, mismatches=None, collector=None):
+        self.shards = shards
+        self.seed = seed
+        # per client: shard, host, started and finished (epoch seconds), test outcomes
+        self.clients = clients or []
+        # per failed test: shard, test id, message
+        self.mismatches = mismatches or []
+        self.collector = collector or StatsCollector()
+
+    def covered_shards(self):
+        return sorted(c['shard'] for c in self.clients)
+
+    def missing_shards(self):
+        return sorted(set(range(self.shards)) - set(self.covered_shards()))
+
+    def duplicate_shards(self):
+        return sorted(s for s, n in Counter(self.covered_shards()).items() if n > 1)
+
+    def wall_clock(self):
+        """
+        :return: seconds from the start of the first client to the end of the last one
+        """
+        if not self.clients:
+            return 0.0
+        return max(c['finished'] for c in self.clients) - min(c['started'] for c in self.clients)
+
+    def outcomes(self):
+        outcomes = Counter()
+        for client in self.clients:
+            outcomes.update(client['outcomes'])
+        return outcomes
+
+    def throughput(self):
+        """
+        :return: list of (phase, endpoint, items per second of wall clock) of all clients together
+        """
+        seconds = self.wall_clock() or 1.0
+        return [(phase, endpoint, stats.count / seconds)
+                for (phase, endpoint), stats in sorted(self.collector.stats.items())]
+
+    def merge(self, other):
+        if other.shards != self.shards or other.seed != self.seed:
+            raise ValueError("cannot merge reports of different runs: {a}/{b} shards, seeds {c}/{d}".format(
+                a=self.shards, b=other.shards, c=self.seed, d=other.seed))
+        self.clients.extend(other.clients)
+        self.mismatches.extend(other.mismatches)
+        self.collector.merge(other.collector)
+
+    def to_json(self):
+        return {
+            'shards': self.shards,
+            'seed': self.seed,
+            'covered_shards': self.covered_shards(),
+            'missing_shards': self.missing_shards(),
+            'wall_clock': self.wall_clock(),
+            'outcomes': dict(self.outcomes()),
+            'clients': sorted(self.clients, key=lambda c: (c['shard'], c['started'])),
+            'mismatches': sorted(self.mismatches, key=lambda m: (m['test'], m['shard'])),
+            'throughput': [{'phase': phase, 'endpoint': endpoint, 'items_per_second': rate}
+                           for phase, endpoint, rate in self.throughput()],
+            'stats': self.collector.to_json(),
+        }
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(value['shards'], value['seed'], value['clients'], value['mismatches'],
+                   StatsCollector.from_json(value['stats']))
+
+    def summary_lines(self):
+        outcomes = self.outcomes()
+        lines = ['shards {c} of {n}, seed {s}, {w:.1f}s wall clock, {p} passed, {f} failed, {k} skipped'.format(
+            c=len(set(self.covered_shards())), n=self.shards, s=self.seed, w=self.wall_clock(),
+            p=outcomes['passed'], f=outcomes['failed'], k=outcomes['skipped'])]
+        if self.missing_shards():
+            lines.append('missing shards: {}'.format(self.missing_shards()))
+        if self.duplicate_shards():
+            lines.append('shards reported more than once: {}'.format(self.duplicate_shards()))
+        lines.append('{:<8} {:<48} {:>12}'.format('phase', 'endpoint', 'items/s'))
+        for phase, endpoint, rate in self.throughput():
+            lines.append('{:<8} {:<48} {:>12.1f}'.format(phase, endpoint, rate))
+        return lines
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+
+
+def read_report(path):
+    with open(path) as f:
+        return ShardReport.from_json(json.load(f))
+
+
+def merge_reports(paths):
+    """
+    :return: ShardReport of all reports in `paths`
+    """
+    reports = [read_report(path) for path in paths]
+    merged = ShardReport(reports[0].shards, reports[0].seed)
+    for report in reports:
+        merged.merge(report)
+    return merged
+
+
+class ShardReportPlugin:
+    """
+    Collects results of this client and writes them to TEST_SHARD_REPORT at the end of the run.
+    Outcomes of tests of pytest-xdist workers reach the controller as reports, instrumentation stats
+    are sent by every worker at its end.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.shard, self.shards = TestConfig.client_shard()
+        self.started = time.time()
+        self.outcomes = Counter()
+        self.mismatches = []
+        self.collector = StatsCollector()
+        instrumentation.add_listener(self.collector)
+
+    def pytest_runtest_logreport(self, report):
+        if report.when == 'call' or (report.when == 'setup' and not report.passed):
+            self.outcomes[report.outcome] += 1
+        if report.failed:
+            self.mismatches.append({'shard': self.shard, 'test': report.nodeid, 'message': report.longreprtext})
+
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(self.config, 'workeroutput', None)
+        if workeroutput is not None:
+            workeroutput[WORKER_OUTPUT_KEY] = json.dumps(self.collector.to_json())
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        output = getattr(node, 'workeroutput', {}).get(WORKER_OUTPUT_KEY)
+        if output:
+            self.collector.merge(StatsCollector.from_json(json.loads(output)))
+
+    def report(self):
+        client = {'shard': self.shard, 'host': socket.gethostname(), 'started': self.started,
+                  'finished': time.time(), 'outcomes': dict(self.outcomes)}
+        return ShardReport(self.shards, TestConfig.seed(), [client], list(self.mismatches), self.collector)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if getattr(self.config, 'workeroutput', None) is not None:
+            return
+        path = TestConfig.shard_report()
+        self.report().save(path)
+        terminalreporter.write_line('results of shard {s}/{n} saved to {p}'.format(s=self.shard, n=self.shards, p=path))
+
+    def pytest_unconfigure(self, config):
+        instrumentation.remove_listener(self.collector)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Merge reports of clients of a distributed run (TEST_SHARD_REPORT)')
+    parser.add_argument('output', help='json file to write the merged report to')
+    parser.add_argument('reports', nargs='+', help='reports of clients (or merged reports)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    merged = merge_reports(args.reports)
+    merged.save(args.output)
+    for line in merged.summary_lines():
+        print(line)
+    for mismatch in merged.mismatches:
+        print('\n[shard {s}] {t}\n{m}'.format(s=mismatch['shard'], t=mismatch['test'], m=mismatch['message']))
+    LOG.info("merged {n} reports into {o}".format(n=len(args.reports), o=args.output))
+    if merged.missing_shards() or merged.duplicate_shards():
+        return 2
+    return 1 if merged.mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import itertools
+import logging
+import time
+from collections import OrderedDict
+
+from test.common.config.test_config import TestConfig
+from test.common.cql.statements import full_scan_query, prepared_statements, FULL_SCAN_ENDPOINT
+from test.common.perf import instrumentation
+from test.common.rest.rest_v1_api import TABLE_ROWS
+from test.common.test.row_compare import RowComparator, explanation
+from test.common.test.schema_index import table_schema
+
+LOG = logging.getLogger(__name__)
+
+COMPARE_SCAN = 'full scan'
+
+
+def scan_mode_is_digest():
+    return TestConfig.scan_mode() == 'digest'
+
+
+def cql_table_scan(cql_session, ks, table, fetch_size):
+    """
+    All rows of the table in token and clustering order, paged by the driver
+    """
+    statement = prepared_statements(cql_session).full_scan(ks, table)
+    bound = statement.bind(())
+    bound.fetch_size = fetch_size
+    # generator, not iter(ResultSet): ResultSet restarts the current page on every iter() call
+    yield from cql_session.execute(bound)
+
+
+def rest_table_scan(rest_v1, ks, table, page_size):
+    """
+    Pages of all rows of the table in token and clustering order, following REST pageState
+    :return: generator of RESTResult, the last one is either without pageState or failed
+    """
+    page_state = None
+    while True:
+        res = rest_v1.get_table_rows(ks, table, page_size, page_state)
+        yield res
+        page_state = res.value.get('pageState') if res.ok else None
+        if not page_state:
+            return
+
+
+class TableScanComparator:
+    """
+    Compares whole table content streamed with CQL (fetch_size paging) and REST V1 (pageState paging).
+    Both streams come in the same token and clustering order so they are merge-joined on primary key
+    as they are read. Rows not matched yet wait in a window, a row still unmatched after the other stream
+    moved `window` rows past it is reported missing, so memory is bounded by page size and window.
+    """
+
+    def __init__(self, cql_session, rest_v1, page_size=None, window=None, max_rows=None, max_mismatches=None):
+        """
+        :param max_rows: stop after that many rows of each stream, 0 to scan whole table
+        """
+        self.cql_session = cql_session
+        self.rest_v1 = rest_v1
+        self.page_size = page_size or TestConfig.scan_page_size()
+        self.window = window or TestConfig.scan_window()
+        self.max_rows = TestConfig.scan_max_rows() if max_rows is None else max_rows
+        self.max_mismatches = max_mismatches or TestConfig.scan_max_mismatches()
+        self.row_comparator = RowComparator(cql_session, rest_v1)
+        self.rows_compared = 0
+
+    def compare_table(self, ks, table):
+        """
+        :return: list of mismatch explanations (at most max_mismatches), empty if REST and CQL agree
+        """
+        cql_rows = cql_table_scan(self.cql_session, ks, table, self.page_size)
+        rest_pages = rest_table_scan(self.rest_v1, ks, table, self.page_size)
+        return self.compare_streams(ks, table, cql_rows, rest_pages)
+
+    def compare_streams(self, ks, table, cql_rows, rest_pages):
+        """
+        :param cql_rows: iterable of CQL rows in token and clustering order
+        :param rest_pages: iterable of RESTResult pages with REST rows in the same order
+        :return: list of mismatch explanations (at most max_mismatches)
+        """
+        schema = table_schema(self.cql_session, ks, table)
+        cql_query = full_scan_query(ks, table)
+        rest_url = self.rest_v1.url(TABLE_ROWS.format(ks=ks, t=table))
+        scan = _MergeJoin(self, schema, cql_query, rest_url)
+
+        cql_rows = iter(cql_rows)
+        truncated = False
+        for res in rest_pages:
+            if not res.ok:
+                scan.mismatch(res.error)
+                return scan.result()
+            rest_rows = res.value['rows']
+            if self.max_rows:
+                rest_rows = rest_rows[:self.max_rows - scan.rest_position]
+            start = time.perf_counter()
+            # read as many CQL rows as REST returned, the driver fetches next pages when needed
+            cql_batch = list(itertools.islice(cql_rows, len(rest_rows)))
+            fetched = time.perf_counter()
+            scan.add_cql_rows(cql_batch)
+            scan.add_rest_rows(rest_rows)
+            scan.evict_outside_window()
+            if instrumentation.enabled():
+                instrumentation.emit(instrumentation.CQL, FULL_SCAN_ENDPOINT, fetched - start,
+                                     count=len(cql_batch))
+                instrumentation.emit(instrumentation.COMPARE, COMPARE_SCAN, time.perf_counter() - fetched,
+                                     count=len(rest_rows))
+            if self.max_rows and scan.rest_position >= self.max_rows:
+                truncated = True
+                break
+        if not truncated:
+            # REST stream is over, what is left in CQL stream is missing in REST
+            scan.add_cql_rows(cql_rows)
+            scan.evict_all()
+        self.rows_compared += scan.matched
+        LOG.info("scanned {ks}.{t}: {m} rows matched, {c} CQL rows, {r} REST rows".format(
+            ks=ks, t=table, m=scan.matched, c=scan.cql_position, r=scan.rest_position))
+        return scan.result()
+
+
+class _MergeJoin:
+    """
+    State of a single table scan: positions in both streams and rows waiting for their pair
+    """
+
+    def __init__(self, comparator, schema, cql_query, rest_url):
+        self.comparator = comparator
+        self.ks = schema.keyspace
+        self.table = schema.table
+        self.schema = schema
+        self.key_columns = schema.partition_key + schema.clustering_key
+        self.cql_query = cql_query
+        self.rest_url = rest_url
+        self.cql_position = 0
+        self.rest_position = 0
+        self.matched = 0
+        # canonical key (same for both APIs) -> (position, row) in stream order
+        self.cql_pending = OrderedDict()
+        self.rest_pending = OrderedDict()
+        self.mismatches = []
+        self.skipped_mismatches = 0
+
+    def add_cql_rows(self, rows):
+        for row in rows:
+            self.cql_position += 1
+            key = self.schema.cql_key(row, self.key_columns)
+            pair = self.rest_pending.pop(key, None)
+            if pair is None:
+                self.cql_pending[key] = (self.cql_position, row)
+            else:
+                self.compare(key, row, pair[1])
+
+    def add_rest_rows(self, rows):
+        for row in rows:
+            self.rest_position += 1
+            key = self.schema.rest_key(row, self.key_columns)
+            pair = self.cql_pending.pop(key, None)
+            if pair is None:
+                self.rest_pending[key] = (self.rest_position, row)
+            else:
+                self.compare(key, pair[1], row)
+
+    def compare(self, key, cql_row, rest_row):
+        self.matched += 1
+        cql_query = '{q} key={k}'.format(q=self.cql_query, k=list(key))
+        for mismatch in self.comparator.row_comparator.compare_rows(self.ks, self.table, cql_query, self.rest_url,
+                                                                    [cql_row], [rest_row]):
+            self.mismatch(mismatch)
+
+    def evict_outside_window(self):
+        window = self.comparator.window
+        self._evict(self.cql_pending, self.rest_position - window, "row missing in REST scan")
+        self._evict(self.rest_pending, self.cql_position - window, "row missing in CQL scan")
+
+    def evict_all(self):
+        self._evict(self.cql_pending, float('inf'), "row missing in REST scan")
+        self._evict(self.rest_pending, float('inf'), "row missing in CQL scan")
+
+    def _evict(self, pending, before_position, detail):
+        while pending:
+            key, (position, row) = next(iter(pending.items()))
+            if position >= before_position:
+                return
+            del pending[key]
+            cql_query = '{q} key={k}'.format(q=self.cql_query, k=list(key))
+            if pending is self.cql_pending:
+                self.mismatch(explanation(cql_query, self.rest_url, cql_out=row, rest_out=None, detail=detail))
+            else:
+                self.mismatch(explanation(cql_query, self.rest_url, cql_out=None, rest_out=row, detail=detail))
+
+    def mismatch(self, text):
+        if len(self.mismatches) < self.comparator.max_mismatches:
+            self.mismatches.append(text)
+        else:
+            self.skipped_mismatches += 1
+
+    def result(self):
+        if self.skipped_mismatches:
+            return self.mismatches + ["... and {} more mismatches".format(self.skipped_mismatches)]
+        return self.mismatches
@@ -0,0 +1,276 @@
+"""
+Write path fuzzing: random rows generated from table metadata are added with REST V1, a fraction of them is then
+updated by key, all by a pool of workers. Written rows are read back in bulk with prepared concurrent CQL queries
+and compared column by column with what was written. Latencies of REST writes are recorded per endpoint and status,
+so the same run measures write throughput and finds mismatches e.g.
+
+    python -m test.common.test.write_fuzz --rows 10000 --concurrency 32 --report write.json
+"""
+import argparse
+import bisect
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from test.common.config.rest_api_config import RESTApiConfig
+from test.common.config.test_config import TestConfig
+from test.common.cql.cql_tools import CQLConnection, cql_keyspaces, cql_table_metadata
+from test.common.cql.random_schema import RandomRowGenerator
+from test.common.cql.statements import cql_rows_by_keys, select_by_key_query, SELECT_BY_KEY_ENDPOINT
+from test.common.cql.tokens import compile_partition_token
+from test.common.perf import instrumentation
+from test.common.perf.load import LoadStats
+from test.common.rest.rest_v1_api import RESTApiV1, TABLE_ROWS, TABLE_ROWS_BY_PK
+from test.common.rest.token_provider import shared_token_provider
+from test.common.test.checks import compile_canonical_form
+from test.common.test.objects import TableShard, select_fuzz_tables, select_tables_for_test, shard_token_ranges, \
+    table_shard_seed, token_ring, MURMUR3_RING
+from test.common.test.row_compare import explanation
+from test.common.test.schema_index import table_schema
+
+LOG = logging.getLogger(__name__)
+
+COMPARE_WRITES = 'written rows'
+ADD_ROW = 'POST ' + TABLE_ROWS
+UPDATE_ROW = 'PUT ' + TABLE_ROWS_BY_PK
+# rows are generated until there are enough with distinct keys, tables with few possible keys get less
+MAX_ATTEMPTS_FACTOR = 4
+
+
+class WriteFuzzer:
+    """
+    Writes random rows of a table with REST V1 chunk by chunk, every chunk is verified with CQL once written.
+    Keys of generated rows are distinct (partition keys if the table has static columns), so that
+    every row read back has a single expected value.
+    """
+
+    CHUNK_FACTOR = 4
+
+    def __init__(self, cql_session, rest_v1, concurrency=None, update_fraction=None):
+        self.cql_session = cql_session
+        self.rest_v1 = rest_v1
+        self.concurrency = concurrency or TestConfig.concurrency()
+        self.update_fraction = TestConfig.write_update_fraction() if update_fraction is None else update_fraction
+        self.stats = LoadStats()
+
+    def row_generator(self, ks, table):
+        metadata = cql_table_metadata(self.cql_session, ks, table)
+        return RandomRowGenerator(metadata, cql_keyspaces(self.cql_session)[ks].user_types)
+
+    @staticmethod
+    def random_rows(schema, generator, n, rng, shard_keys=None):
+        """
+        :param shard_keys: ShardKeys the rows have to be in, any keys if not given
+        :return: up to n random rows with distinct keys
+        """
+        has_static = any(c.kind == 'static' for c in schema.columns)
+        key = schema.partition_key if has_static else schema.partition_key + schema.clustering_key
+        attempts = n * MAX_ATTEMPTS_FACTOR
+        if shard_keys is not None:
+            attempts = int(attempts / shard_keys.share)
+        rows, keys = [], set()
+        for _ in range(attempts):
+            if len(rows) == n:
+                break
+            row = generator.row(rng)
+            if shard_keys is not None and row not in shard_keys:
+                continue
+            row_key = tuple(str(row[c]) for c in key)
+            if row_key not in keys:
+                keys.add(row_key)
+                rows.append(row)
+        return rows
+
+    @staticmethod
+    def _random_changes(schema, generator, rng):
+        columns = [c.name for c in schema.columns if c.kind in ('regular', 'static')]
+        if not columns:
+            return None
+        changed = rng.sample(columns, rng.randint(1, len(columns)))
+        new_values = generator.row(rng)
+        return {c: new_values[c] for c in changed}
+
+    def fuzz_table(self, ks, table, n, seed=None, shard_keys=None):
+        """
+        :param n: number of rows to write, less if the table has less possible keys
+        :param shard_keys: ShardKeys written rows have to be in, any keys if not given
+        :return: list of mismatch explanations and failed writes
+        """
+        rng = random.Random(seed if seed is not None else random.getrandbits(64))
+        schema = table_schema(self.cql_session, ks, table)
+        generator = self.row_generator(ks, table)
+        writes = [(row, self._random_changes(schema, generator, rng) if rng.random() < self.update_fraction else None)
+                  for row in self.random_rows(schema, generator, n, rng, shard_keys)]
+        mismatches = []
+        chunk_size = self.concurrency * self.CHUNK_FACTOR
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for i in range(0, len(writes), chunk_size):
+                written = []
+                for expected, url, errors in pool.map(lambda w: self._write(schema, *w), writes[i:i + chunk_size]):
+                    mismatches.extend(errors)
+                    if expected is not None:
+                        written.append((expected, url))
+                mismatches.extend(self._verify(schema, written))
+        elapsed = time.perf_counter() - start
+        LOG.info("written {n} rows to {ks}.{t} in {s:.1f}s ({r:.0f} rows/s), {m} mismatches".format(
+            n=len(writes), ks=ks, t=table, s=elapsed, r=len(writes) / elapsed if elapsed else 0, m=len(mismatches)))
+        return mismatches
+
+    def _timed(self, endpoint, call):
+        start = time.monotonic()
+        try:
+            res = call()
+        except Exception:
+            self.stats.record(endpoint, 'error', time.monotonic() - start)
+            raise
+        self.stats.record(endpoint, res.status_code, time.monotonic() - start)
+        return res
+
+    def _write(self, schema, row, changes):
+        """
+        Runs on the pool: adds the row and applies changes to it by key
+        :return: (expected row or None if it was not written, url of the last write, list of errors)
+        """
+        ks, table = schema.keyspace, schema.table
+        values = schema.rest_row_values(row, schema.column_names)
+        res = self._timed(ADD_ROW, lambda: self.rest_v1.add_table_row(ks, table, values))
+        if not res.ok:
+            return None, res.url, [res.error]
+        if not changes:
+            return row, 'POST ' + res.url, []
+        key_values = schema.rest_key_values(row, schema.partition_key + schema.clustering_key)
+        changeset = schema.rest_row_values(changes, list(changes))
+        update = self._timed(UPDATE_ROW, lambda: self.rest_v1.update_table_rows_by_pk(ks, table, key_values,
+                                                                                        changeset))
+        if not update.ok:
+            return row, 'POST ' + res.url, [update.error]
+        return dict(row, **changes), 'PUT ' + update.url, []
+
+    def _verify(self, schema, written):
+        """
+        Reads written rows by full primary key in bulk and compares them with expected ones
+        :param written: list of (expected row, url of the last write)
+        """
+        if not written:
+            return []
+        ks, table = schema.keyspace, schema.table
+        key_columns = list(schema.partition_key + schema.clustering_key)
+        start = time.perf_counter()
+        results = cql_rows_by_keys(self.cql_session, ks, table, key_columns,
+                                   [tuple(row[c] for c in key_columns) for row, _ in written], self.concurrency)
+        if instrumentation.enabled():
+            instrumentation.emit(instrumentation.CQL, SELECT_BY_KEY_ENDPOINT, time.perf_counter() - start,
+                                 count=len(written))
+        start = time.perf_counter()
+        canonical = [(c, compile_canonical_form(c.parsed_type, cql_side=True)) for c in schema.columns if not c.ignored]
+        mismatches = []
+        for (expected, url), (success, cql_rows) in zip(written, results):
+            cql_query = '{q} {v}'.format(q=select_by_key_query(ks, table, key_columns),
+                                         v=[expected[c] for c in key_columns])
+            if not success:
+                found = ["CQL Query: {q} failed with {e}".format(q=cql_query, e=cql_rows)]
+            elif len(cql_rows) != 1:
+                found = [explanation(cql_query, url, cql_out=cql_rows, rest_out=expected,
+                                     detail="CQL returned {} rows for the written row".format(len(cql_rows)))]
+            else:
+                found = [explanation(cql_query, url, cql_out=cql_rows[0][c.name], rest_out=expected[c.name],
+                                     cql_column=c, detail="value read with CQL differs from the written one")
+                         for c, form in canonical if form(cql_rows[0][c.name]) != form(expected[c.name])]
+            self.stats.record_check(found)
+            mismatches.extend(found)
+        if instrumentation.enabled():
+            instrumentation.emit(instrumentation.COMPARE, COMPARE_WRITES, time.perf_counter() - start,
+                                 count=len(written))
+        return mismatches
+
+
+class ShardKeys:
+    """
+    Keys a client of a distributed run (TEST_SHARD) can write to a table: partition tokens in token ranges
+    of its TableShards of the table. Other clients sample and delete rows only in their own ranges,
+    so they never read rows while this client writes them.
+    """
+
+    def __init__(self, schema, ring, table_shards, partition_token):
+        self.partition_key = list(schema.partition_key)
+        self.partition_token = partition_token
+        self.ranges = sorted(r for s in table_shards for r in shard_token_ranges(ring, s.shard, s.shards))
+        self._starts = [start for start, _ in self.ranges]
+        self.share = sum(end - start for start, end in self.ranges) / (ring[1] - ring[0])
+
+    @classmethod
+    def of_client(cls, cql_session, ks, table):
+        """
+        :return: ShardKeys of this client, None if it is the only client (all keys are its own)
+        :raise ValueError: if tokens of the table keys can't be computed on the client
+        """
+        if TestConfig.client_shard()[1] == 1:
+            return None
+        schema = table_schema(cql_session, ks, table)
+        ring = token_ring(cql_session)
+        partition_token = compile_partition_token([schema.column(c).parsed_type for c in schema.partition_key])
+        if ring != MURMUR3_RING or partition_token is None:
+            raise ValueError("can't compute tokens of {ks}.{t} keys on the client".format(ks=ks, t=table))
+        table_shards = [s for s in select_fuzz_tables(cql_session) if (s.keyspace, s.table) == (ks, table)]
+        return cls(schema, ring, table_shards, partition_token)
+
+    def __contains__(self, row):
+        token = self.partition_token([row[c] for c in self.partition_key])
+        i = bisect.bisect_left(self._starts, token) - 1
+        return i >= 0 and token <= self.ranges[i][1]
+
+
+def write_table_seed(ks, table):
+    """
+    :return: seed of rows written to the table derived from TEST_SEED, None if it is not set
+    """
+    return table_shard_seed(TableShard(ks, table, 0, 1))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Write random rows with REST V1 and verify them with CQL')
+    parser.add_argument('--rows', type=int, default=TestConfig.write_size(),
+                        help='number of rows written to every table')
+    parser.add_argument('--concurrency', type=int, default=TestConfig.concurrency(), help='number of writes in flight')
+    parser.add_argument('--update-fraction', type=float, default=TestConfig.write_update_fraction(),
+                        help='fraction of rows updated by key after they are added')
+    parser.add_argument('--table', action='append', default=None,
+                        help='write only to given <keyspace>.<table>, can be repeated')
+    parser.add_argument('--seed', type=int, default=None, help='seed of written rows')
+    parser.add_argument('--report', default=None, help='json report file, printed to stdout if not given')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    cql_session = CQLConnection.shared_session()
+    try:
+        config = RESTApiConfig()
+        rest_v1 = RESTApiV1(config, shared_token_provider(config), pool_size=args.concurrency)
+        tables = select_tables_for_test(cql_session, skip_system=True)
+        if args.table:
+            tables = [(ks, t) for ks, t in tables if '{}.{}'.format(ks, t) in args.table]
+        fuzzer = WriteFuzzer(cql_session, rest_v1, concurrency=args.concurrency, update_fraction=args.update_fraction)
+        start = time.monotonic()
+        for ks, table in tables:
+            fuzzer.fuzz_table(ks, table, args.rows, seed='{s}:{ks}.{t}'.format(s=seed, ks=ks, t=table))
+        report = fuzzer.stats.report(time.monotonic() - start)
+        report['config'] = dict(vars(args), seed=seed)
+    finally:
+        CQLConnection.shutdown_shared()
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 1 if report['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
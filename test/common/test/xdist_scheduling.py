@@ -0,0 +1,21 @@
+"""
+pytest-xdist scheduling keeping all tests of a table on a single worker
+"""
+import re
+
+from xdist.scheduler import LoadScopeScheduling
+
+# ids of table parameters (see pytest_generate_tests): <keyspace>.<table> or <keyspace>.<table>-<shard>/<shards>
+_TABLE_ID_RE = re.compile(r'\[(\w+\.\w+)(?:-\d+/\d+)?\]$')
+
+
+class TableScheduling(LoadScopeScheduling):
+    """
+    Like `--dist load`, but tests parametrized with the same table are a single unit of work,
+    so they run one after another on one worker and deletes or writes of a table never race with comparisons.
+    Other tests are units of their own.
+    """
+
+    def _split_scope(self, nodeid):
+        match = _TABLE_ID_RE.search(nodeid)
+        return match.group(1) if match else nodeid
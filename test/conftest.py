@@ -0,0 +1,90 @@
+import logging
+
+import pytest
+
+from test.common.cql.cql_tools import CQLConnection
+from test.common.perf import instrumentation_plugin, profiling_plugin
+from test.common.test.corpus import close_recorder
+from test.common.test.fixtures import AUTH_TOKEN_KEY, token_provider
+from test.common.test.objects import select_fuzz_tables, select_scan_tables
+from test.common.test import schema_index, shard_report
+from test.common.test.scheduler import save_schedule_stats
+
+LOG = logging.getLogger(__name__)
+
+
+def pytest_addoption(parser):
+    instrumentation_plugin.addoption(parser)
+    profiling_plugin.addoption(parser)
+    shard_report.addoption(parser)
+
+
+def pytest_configure(config):
+    shard_report.configure(config)
+    if instrumentation_plugin.is_requested(config):
+        config.pluginmanager.register(instrumentation_plugin.InstrumentationPlugin(config), 'stargate-instrumentation')
+    if profiling_plugin.is_requested(config):
+        config.pluginmanager.register(profiling_plugin.ProfilingPlugin(config), 'stargate-profiling')
+    if schema_index.is_requested(config):
+        config.pluginmanager.register(schema_index.SchemaSnapshotPlugin(config), 'stargate-schema-snapshot')
+    if shard_report.is_requested(config):
+        config.pluginmanager.register(shard_report.ShardReportPlugin(config), 'stargate-shard-report')
+
+
+def _table_params(tables, ids):
+    """
+    Tests of the same table are in the same xdist group, so that they run on a single worker one after another
+    with `--dist loadgroup` as well as with -n N alone (see pytest_xdist_make_scheduler)
+    """
+    # (ks, table) pairs and TableShards both start with keyspace and table
+    return [pytest.param(x, id=i, marks=pytest.mark.xdist_group('{}.{}'.format(x[0], x[1])))
+            for x, i in zip(tables, ids)]
+
+
+def pytest_generate_tests(metafunc):
+    """
+    Tests using `fuzz_table` run once per TableShard of non-system tables,
+    tests using `scan_table` or `write_table` run once per (keyspace, table) of non-system tables,
+    so that pytest-xdist can spread them across workers and a failure points at a single table.
+    In a distributed run (TEST_SHARD) only TableShards and tables of this client are tested.
+    """
+    if 'fuzz_table' in metafunc.fixturenames:
+        params = select_fuzz_tables(CQLConnection.shared_session())
+        metafunc.parametrize('fuzz_table', _table_params(params, [str(x) for x in params]))
+    if 'scan_table' in metafunc.fixturenames:
+        params = select_scan_tables(CQLConnection.shared_session())
+        metafunc.parametrize('scan_table', _table_params(params, ['{}.{}'.format(ks, t) for ks, t in params]))
+    if 'write_table' in metafunc.fixturenames:
+        # a table is written by a single test, rows written concurrently by two tests could overwrite each other
+        params = select_scan_tables(CQLConnection.shared_session())
+        metafunc.parametrize('write_table', _table_params(params, ['{}.{}'.format(ks, t) for ks, t in params]))
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    """
+    pytest-xdist: with -n N (`--dist load`) tests of a table run on the same worker, see TableScheduling
+    """
+    if config.getvalue('dist') != 'load':
+        return None
+    from test.common.test.xdist_scheduling import TableScheduling
+    return TableScheduling(config, log)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """
+    pytest-xdist: authenticate once in the controller and pass the token to all workers
+    """
+    try:
+        token = token_provider(node.config).token()
+    except Exception as e:
+        LOG.warning("could not authenticate in controller, workers will do it: {}".format(e))
+        return
+    node.workerinput[AUTH_TOKEN_KEY] = token
+
+
+def pytest_sessionfinish(session):
+    CQLConnection.shutdown_shared()
+    close_recorder()
+    save_schedule_stats()
@@ -0,0 +1,45 @@
+import logging
+
+import pytest
+
+from test.common.test.checks import cql_row_columns_to_rest_values
+from test.common.test.fixtures import *
+from test.common.test.objects import fuzz_table_data_with_keys
+from test.common.test.schema_index import table_schema
+
+
+class TestRestV1Coordinators:
+    """
+    Same GET by key sent to every Stargate node (TEST_HOSTS), all coordinators should return the same rows
+    """
+
+    LOG = logging.getLogger(__name__)
+
+    def test_coordinators_agree(self, cql_session, rest_v1, fuzz_table):
+        if len(rest_v1.nodes) < 2:
+            pytest.skip("single Stargate node, set TEST_HOSTS to compare coordinators")
+        self.LOG.info("comparing coordinators for {}".format(fuzz_table))
+        ks, table = fuzz_table.keyspace, fuzz_table.table
+        schema = table_schema(cql_session, ks, table)
+        mismatches = []
+        for row, key_columns in fuzz_table_data_with_keys(cql_session, fuzz_table):
+            rest_values = cql_row_columns_to_rest_values(schema, row, key_columns)
+            results = rest_v1.get_table_rows_by_pk_on_all_nodes(ks, table, rest_values)
+            mismatches.extend(self._compare_nodes(results))
+        assert not mismatches, '\n\n'.join(mismatches)
+
+    @staticmethod
+    def _compare_nodes(results):
+        (first_host, first), *others = results
+        if not first.ok:
+            return [first.error]
+        mismatches = []
+        for host, res in others:
+            if not res.ok:
+                mismatches.append(res.error)
+            elif res.value['rows'] != first.value['rows']:
+                mismatches.append('\n'.join([
+                    "REST call {u} on {a} and {b} differ".format(u=first.url, a=first_host, b=host),
+                    "{h} result: {r}".format(h=first_host, r=first.value['rows']),
+                    "{h} result: {r}".format(h=host, r=res.value['rows'])]))
+        return mismatches
@@ -1,7 +1,9 @@
 import logging
 
-from test.common.cql.cql_tools import cql_keyspaces, cql_tables, cql_table_metadata
+from test.common.cql.cql_tools import cql_schema_names
 from test.common.test.fixtures import *
+from test.common.test.objects import select_tables_for_test
+from test.common.test.schema_crawl import SchemaCrawler
 
 
 class TestRestV1Keyspaces:
@@ -29,32 +31,24 @@ class TestRestV1Keyspaces:
         return set(resp.value)
 
     def test_keyspaces_names(self, cql_session, rest_v1):
-        cql_ks_names = set(cql_keyspaces(cql_session).keys())
+        cql_ks_names = set(cql_schema_names(cql_session).keys())
         rest_ks_names = self._rest_keyspaces(rest_v1)
         assert cql_ks_names == rest_ks_names
 
     def test_keyspace_tables(self, cql_session, rest_v1):
         ks_names = self._rest_keyspaces(rest_v1)
+        cql_names = cql_schema_names(cql_session)
         for ks in ks_names:
-            tables = set(cql_tables(cql_session, ks).keys())
+            tables = set(cql_names.get(ks, []))
             ks_tables = self._rest_tables(rest_v1, ks)
             assert tables == ks_tables
 
     def test_table_definitions(self, cql_session, rest_v1):
-        ks_names = self._rest_keyspaces(rest_v1)
-
-        def check(ks, table):
-            self.LOG.info("Checking {ks}.{t}".format(ks=ks, t=table))
-            cql_metadata = cql_table_metadata(cql_session, ks, table)
-            resp = rest_v1.get_table(ks, table)
-            assert resp.ok, resp.error
-            rest_metadata = resp.value
-            # all columns are present (compare sets)
-            rest_columns = set([x['name'] for x in rest_metadata['columnDefinitions']])
-            cql_colums = set(cql_metadata.columns.keys())
-            assert rest_columns == cql_colums
-            # TODO: for every column check definition (static and type)
-
-        for ks in ks_names:
-            for table in self._rest_tables(rest_v1, ks):
-                check(ks, table)
+        """
+        Definitions of all tables fetched concurrently and compared with driver metadata:
+        column types and static flags, primary key order and table options
+        """
+        tables = select_tables_for_test(cql_session, skip_system=False)
+        self.LOG.info("Checking definitions of {} tables".format(len(tables)))
+        mismatches = SchemaCrawler(cql_session, rest_v1).compare_tables(tables)
+        assert not mismatches, '\n'.join(mismatches)
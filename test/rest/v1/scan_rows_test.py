@@ -0,0 +1,23 @@
+import logging
+
+from test.common.test.fixtures import *
+from test.common.test.range_digest import DigestReconciler
+from test.common.test.table_scan import TableScanComparator, scan_mode_is_digest
+
+
+class TestRestV1Scan:
+
+    LOG = logging.getLogger(__name__)
+
+    def test_scan_table_rows(self, cql_session, rest_v1, scan_table):
+        """
+        Compare all table rows paged with CQL vs all table rows paged with REST V1,
+        row by row or by token range digests (TEST_SCAN_MODE=digest)
+        """
+        ks, table = scan_table
+        self.LOG.info("testing full scan of {}.{}".format(ks, table))
+        if scan_mode_is_digest():
+            mismatches = DigestReconciler(cql_session, rest_v1).reconcile_table(ks, table)
+        else:
+            mismatches = TableScanComparator(cql_session, rest_v1).compare_table(ks, table)
+        assert not mismatches, '\n\n'.join(mismatches)
@@ -0,0 +1,29 @@
+import logging
+
+import pytest
+
+from test.common.config.test_config import TestConfig
+from test.common.test.fixtures import *
+from test.common.test.write_fuzz import ShardKeys, WriteFuzzer, write_table_seed
+
+
+class TestRestV1Writes:
+
+    LOG = logging.getLogger(__name__)
+
+    def test_add_and_update_rows(self, cql_session, rest_v1, write_table):
+        """
+        Add TEST_WRITE_SIZE random rows with REST V1 (update some of them by key)
+        and compare them with rows read by key with CQL
+        """
+        ks, table = write_table
+        self.LOG.info("testing writes to {}.{}".format(ks, table))
+        try:
+            # in a distributed run rows are written only where other clients do not read or delete
+            shard_keys = ShardKeys.of_client(cql_session, ks, table)
+        except ValueError as e:
+            pytest.skip(str(e))
+        fuzzer = WriteFuzzer(cql_session, rest_v1)
+        mismatches = fuzzer.fuzz_table(ks, table, TestConfig.write_size(), seed=write_table_seed(ks, table),
+                                       shard_keys=shard_keys)
+        assert not mismatches, '\n\n'.join(mismatches)
@@ -0,0 +1,61 @@
+import logging
+
+from test.common.test.checks import cql_row_columns_to_rest_values
+from test.common.test.fixtures import *
+from test.common.test.objects import fuzz_table_data_with_keys
+from test.common.test.row_compare import RowComparator
+from test.common.test.schema_index import table_schema
+
+
+class TestRestV2Rows:
+
+    LOG = logging.getLogger(__name__)
+
+    def test_get_rows_by_pk(self, cql_session, rest_v2, fuzz_table, fuzz_scheduler):
+        """
+        Compare CQL query using PK and CK columns vs REST V2 `where` queries for sample rows,
+        keys are looked up in batches of REST_V2_BATCH_KEYS
+        """
+        self.LOG.info("testing GET by where for {}".format(fuzz_table))
+        ks, table = fuzz_table.keyspace, fuzz_table.table
+        if fuzz_scheduler:
+            schema = table_schema(cql_session, ks, table)
+            mismatches = fuzz_scheduler.fuzz_table(cql_session, rest_v2, fuzz_table, schema)
+        else:
+            data = fuzz_table_data_with_keys(cql_session, fuzz_table)
+            mismatches = RowComparator(cql_session, rest_v2).compare_rows_by_pk(ks, table, data)
+        assert not mismatches, '\n\n'.join(mismatches)
+
+    def test_v1_and_v2_agree(self, cql_session, rest_v1, rest_v2, fuzz_table):
+        """
+        Same keys looked up with REST V1 one by one and with REST V2 in batches should return the same rows
+        """
+        self.LOG.info("comparing REST V1 and V2 for {}".format(fuzz_table))
+        ks, table = fuzz_table.keyspace, fuzz_table.table
+        schema = table_schema(cql_session, ks, table)
+        keys_by_shape = {}
+        for row, key_columns in fuzz_table_data_with_keys(cql_session, fuzz_table):
+            keys = keys_by_shape.setdefault(tuple(key_columns), [])
+            keys.append(cql_row_columns_to_rest_values(schema, row, key_columns))
+        mismatches = []
+        for key_columns, keys in keys_by_shape.items():
+            v2_results = rest_v2.rows_by_keys(ks, table, list(key_columns), keys, schema=schema)
+            for key_values, v2 in zip(keys, v2_results):
+                v1 = rest_v1.get_table_rows_by_pk(ks, table, key_values)
+                mismatches.extend(self._compare_apis(schema, v1, v2))
+        assert not mismatches, '\n\n'.join(mismatches)
+
+    @staticmethod
+    def _compare_apis(schema, v1, v2):
+        """
+        Rows of both APIs are compared in canonical form, V1 and V2 may report the same value differently
+        (e.g. a float as 1.0 or 1, a set in another order)
+        """
+        if not v1.ok or not v2.ok:
+            return [res.error for res in (v1, v2) if not res.ok]
+        if [schema.rest_canonical_row(r) for r in v1.value['rows']] != [schema.rest_canonical_row(r) for r in v2.value]:
+            return ['\n'.join([
+                "REST calls {a} and {b} differ".format(a=v1.url, b=v2.url),
+                "V1 result: {}".format(v1.value['rows']),
+                "V2 result: {}".format(v2.value)])]
+        return []
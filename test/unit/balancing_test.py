@@ -0,0 +1,117 @@
+import pytest
+
+from test.common.rest import balancing
+from test.common.rest.balancing import NodePool
+
+
+class _Config:
+
+    def __init__(self, balancing='round_robin', hosts=('n1', 'n2', 'n3'), eject_errors=3, eject_seconds=10):
+        self.balancing = balancing
+        self.hosts = list(hosts)
+        self.eject_errors = eject_errors
+        self.eject_seconds = eject_seconds
+
+    def rest_url_base(self, host):
+        return 'http://{}:8082'.format(host)
+
+
+class _Clock:
+    """
+    Stands in for the time module of balancing, advanced by the test
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(balancing, 'time', clock)
+    return clock
+
+
+def _fail(node, times):
+    for _ in range(times):
+        node.finished(node.started(), failed=True)
+
+
+def _chosen(pool, n, exclude=()):
+    return {pool.choose(exclude).host for _ in range(n)}
+
+
+class TestNodePool:
+
+    def test_node_ejected_after_consecutive_errors(self, clock):
+        pool = NodePool(_Config(), 1)
+        n1 = pool.nodes[0]
+        _fail(n1, 2)
+        # a success resets the count of errors in a row
+        n1.finished(n1.started(), failed=False)
+        _fail(n1, 2)
+        assert _chosen(pool, 6) == {'n1', 'n2', 'n3'}
+        _fail(n1, 1)
+        assert not n1.healthy(clock.now)
+        assert _chosen(pool, 6) == {'n2', 'n3'}
+
+    def test_node_recovers_after_eject_seconds(self, clock):
+        pool = NodePool(_Config(), 1)
+        _fail(pool.nodes[0], 3)
+        clock.now += 9.9
+        assert _chosen(pool, 6) == {'n2', 'n3'}
+        clock.now += 0.1
+        assert pool.nodes[0].healthy(clock.now)
+        assert _chosen(pool, 6) == {'n1', 'n2', 'n3'}
+        # errors before the ejection do not count again
+        _fail(pool.nodes[0], 2)
+        assert pool.nodes[0].healthy(clock.now)
+
+    def test_all_nodes_ejected(self, clock):
+        pool = NodePool(_Config(), 1)
+        for node in pool:
+            _fail(node, 3)
+        # some node is better than none
+        assert _chosen(pool, 6) == {'n1', 'n2', 'n3'}
+        assert _chosen(pool, 6, exclude=pool.nodes[:1]) == {'n2', 'n3'}
+
+    def test_excluded_nodes(self, clock):
+        pool = NodePool(_Config(), 1)
+        _fail(pool.nodes[1], 3)
+        assert _chosen(pool, 6, exclude=pool.nodes[:1]) == {'n3'}
+        # ejected node rather than an excluded one
+        assert _chosen(pool, 6, exclude=[pool.nodes[0], pool.nodes[2]]) == {'n2'}
+        assert _chosen(pool, 6, exclude=pool.nodes) == {'n1', 'n2', 'n3'}
+
+    def test_ejection_disabled(self, clock):
+        pool = NodePool(_Config(eject_errors=0), 1)
+        _fail(pool.nodes[0], 100)
+        assert pool.nodes[0].healthy(clock.now)
+
+    def test_least_outstanding(self, clock):
+        pool = NodePool(_Config('least_outstanding'), 1)
+        pool.nodes[0].started()
+        pool.nodes[2].started()
+        assert _chosen(pool, 6) == {'n2'}
+
+    def test_latency_aware(self, clock):
+        pool = NodePool(_Config('latency'), 1)
+        for node, seconds in zip(pool, (0.5, 0.1, 0.3)):
+            start = node.started()
+            clock.now += seconds
+            node.finished(start, failed=False)
+        assert _chosen(pool, 6) == {'n2'}
+        # expected wait of n2 is higher with requests in flight
+        for _ in range(5):
+            pool.nodes[1].started()
+        assert _chosen(pool, 6) == {'n3'}
+
+    def test_unknown_balancing(self):
+        with pytest.raises(ValueError, match='unknown REST_BALANCING'):
+            NodePool(_Config('random'), 1)
@@ -0,0 +1,72 @@
+import json
+import random
+
+import pytest
+
+from test.common.perf.histogram import LatencyHistogram
+
+# relative width of the widest bucket
+PRECISION = 1.0 / 2 ** (LatencyHistogram.SUB_BUCKET_BITS - 1)
+
+
+def _histogram(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+def _exact_percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[max(1, int(round(len(ordered) * percentile / 100.0))) - 1]
+
+
+class TestLatencyHistogram:
+
+    @pytest.mark.parametrize('percentile', [1, 50, 90, 99, 99.9, 100])
+    def test_percentiles_within_precision(self, percentile):
+        rng = random.Random(1)
+        values = [int(rng.lognormvariate(8, 2)) for _ in range(20000)]
+        exact = _exact_percentile(values, percentile)
+        value = _histogram(values).value_at_percentile(percentile)
+        assert exact <= value <= exact * (1 + PRECISION)
+
+    def test_small_values_are_exact(self):
+        values = list(range(2 ** LatencyHistogram.SUB_BUCKET_BITS))
+        histogram = _histogram(values)
+        for value in values[1:]:
+            assert histogram.value_at_percentile(100.0 * (value + 1) / len(values)) == value
+
+    def test_merge_same_as_recording_all(self):
+        rng = random.Random(2)
+        parts = [[rng.randint(0, 10 ** 7) for _ in range(1000)] for _ in range(3)]
+        merged = LatencyHistogram()
+        for part in parts:
+            assert merged.merge(_histogram(part)) is merged
+        everything = _histogram([v for part in parts for v in part])
+        assert merged.to_json() == everything.to_json()
+        assert merged.summary() == everything.summary()
+
+    def test_merge_empty(self):
+        histogram = _histogram([5, 10])
+        histogram.merge(LatencyHistogram())
+        assert (histogram.count, histogram.min, histogram.max) == (2, 5, 10)
+        empty = LatencyHistogram().merge(histogram)
+        assert (empty.count, empty.min, empty.max) == (2, 5, 10)
+
+    def test_json_round_trip(self):
+        histogram = _histogram([1, 200, 3000, 3000, 10 ** 8])
+        restored = LatencyHistogram.from_json(json.loads(json.dumps(histogram.to_json())))
+        assert restored.to_json() == histogram.to_json()
+        assert restored.value_at_percentile(50) == histogram.value_at_percentile(50)
+
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        assert histogram.value_at_percentile(99) == 0
+        assert histogram.summary() == {'count': 0, 'mean': 0, 'p50': 0, 'p90': 0, 'p99': 0, 'p999': 0, 'max': 0}
+
+    def test_seconds_and_negative_values(self):
+        histogram = LatencyHistogram()
+        histogram.record_seconds(0.0025)
+        histogram.record(-3)
+        assert (histogram.min, histogram.max) == (0, 2500)
@@ -0,0 +1,28 @@
+from test.common.cql.statements import SELECT_BY_KEY_ENDPOINT
+from test.common.fake.stargate import FakeStargate
+from test.common.perf.load import LoadRunner, sample_keys
+
+
+class TestLoadRunner:
+
+    def test_deletes_do_not_cause_mismatches(self):
+        with FakeStargate(seed=2, tables=3, rows_per_table=200) as stargate:
+            cql_session = stargate.cql_session()
+            keys = sample_keys(cql_session, 20, seed=1)
+            runner = LoadRunner(cql_session, stargate.rest_v1(pool_size=4), keys, rate=0, concurrency=4,
+                                duration=1, check_fraction=1.0, delete_fraction=0.3, seed=1)
+            report = runner.run()
+        assert report['checked'] > 0
+        assert not report['mismatches'], '\n\n'.join(report['mismatch_examples'])
+
+    def test_checks_not_counted_as_load(self):
+        with FakeStargate(seed=2, tables=2, rows_per_table=100) as stargate:
+            cql_session = stargate.cql_session()
+            keys = sample_keys(cql_session, 10, seed=1)
+            runner = LoadRunner(cql_session, stargate.rest_v1(pool_size=2), keys, rate=0, concurrency=2,
+                                duration=0.5, check_fraction=1.0, seed=1)
+            report = runner.run()
+        assert SELECT_BY_KEY_ENDPOINT not in report['latency']
+        assert SELECT_BY_KEY_ENDPOINT in report['check_latency']
+        assert report['requests'] == sum(s['count'] for statuses in report['latency'].values()
+                                         for s in statuses.values())
@@ -0,0 +1,28 @@
+import os
+
+from test.common.perf import profiler
+from test.common.perf.profiler import HARNESS_DIR, phase_of
+
+
+def _harness_modules():
+    return {name for _, _, files in os.walk(os.path.join(HARNESS_DIR, 'common'))
+            for name in files if name.endswith('.py') and name != '__init__.py'}
+
+
+class TestHarnessPhases:
+
+    def test_every_harness_module_is_mapped(self):
+        modules = _harness_modules()
+        # a new module needs a phase in _HARNESS_PHASES or an entry in _HARNESS_OTHER
+        assert modules - set(profiler._HARNESS_PHASES) - profiler._HARNESS_OTHER == set()
+        assert set(profiler._HARNESS_PHASES) & profiler._HARNESS_OTHER == set()
+        # no entries of removed or renamed modules
+        assert set(profiler._HARNESS_PHASES) | profiler._HARNESS_OTHER <= modules
+
+    def test_phase_of_innermost_harness_frame(self):
+        stack = ('test/rest/v2/get_rows_test.py:test_get_rows_by_pk', 'test/common/test/row_compare.py:compare',
+                 'test/common/rest/rest_v2_api.py:rows_by_keys')
+        assert phase_of(stack) == profiler.REST
+        assert phase_of(stack[:2]) == profiler.COMPARE
+        assert phase_of(stack + ('[cassandra]',)) == profiler.CQL
+        assert phase_of(('test/common/test/shard_report.py:merge',)) == profiler.OTHER
@@ -0,0 +1,188 @@
+import datetime
+import random
+import time
+import uuid
+
+from cassandra import cqltypes
+from cassandra.metadata import Murmur3Token
+from cassandra.query import Statement
+from cassandra.util import Date
+
+from test.common.cql.cql_types import parse_cql_type
+from test.common.cql.tokens import PROTOCOL_VERSION, compile_partition_token
+from test.common.fake.stargate import FakeStargate
+from test.common.test.objects import MURMUR3_RING
+from test.common.test.range_digest import DigestReconciler, RangeDigestTree, RowHasher
+from test.common.test.schema_index import table_schema
+from test.common.test.table_scan import rest_table_scan
+
+
+def _driver_token(types, values):
+    # routing key the python driver builds for token aware routing
+    parts = [cqltypes._cqltypes[t].serialize(v, PROTOCOL_VERSION) for t, v in zip(types, values)]
+    key = parts[0] if len(parts) == 1 else b''.join(Statement()._key_parts_packed(parts))
+    return Murmur3Token.from_key(key).value
+
+
+class TestPartitionToken:
+
+    def test_known_cassandra_token(self):
+        # SELECT token(id) FROM t WHERE id = 1, id int
+        assert compile_partition_token([parse_cql_type('int')])([1]) == -4069959284402364209
+
+    def test_composite_key_same_as_driver_routing_key(self):
+        types = ['int', 'text', 'uuid', 'timestamp', 'date', 'bigint', 'boolean']
+        rng = random.Random(1)
+        for _ in range(100):
+            pk_types = rng.sample(types, rng.randint(2, 4))
+            values = [_value(t, rng) for t in pk_types]
+            token = compile_partition_token([parse_cql_type(t) for t in pk_types])(values)
+            assert token == _driver_token(pk_types, values)
+
+    def test_collections_not_supported(self):
+        assert compile_partition_token([parse_cql_type('int'), parse_cql_type('frozen<list<int>>')]) is None
+
+
+def _value(cql_type, rng):
+    return {
+        'int': lambda: rng.randint(-2 ** 31, 2 ** 31 - 1),
+        'bigint': lambda: rng.randint(-2 ** 63, 2 ** 63 - 1),
+        'text': lambda: ''.join(rng.choice('abcxyz') for _ in range(rng.randint(0, 10))),
+        'uuid': lambda: uuid.UUID(int=rng.getrandbits(128)),
+        'timestamp': lambda: datetime.datetime(2000, 1, 1) + datetime.timedelta(milliseconds=rng.getrandbits(40)),
+        'date': lambda: Date(rng.randint(0, 50000)),
+        'boolean': lambda: rng.random() < 0.5,
+    }[cql_type]()
+
+
+class TestRangeDigestTree:
+
+    @staticmethod
+    def _rows(n, seed=1):
+        rng = random.Random(seed)
+        return [(rng.randint(*MURMUR3_RING), rng.getrandbits(128)) for _ in range(n)]
+
+    @staticmethod
+    def _tree(rows, depth=4):
+        tree = RangeDigestTree(MURMUR3_RING, depth)
+        for token, row_hash in rows:
+            tree.add(token, row_hash)
+        return tree
+
+    def test_digests_do_not_depend_on_row_order(self):
+        rows = self._rows(500)
+        shuffled = list(rows)
+        random.Random(2).shuffle(shuffled)
+        assert self._tree(rows).levels() == self._tree(shuffled).levels()
+        assert self._tree(rows).diff(self._tree(shuffled)) == []
+
+    def test_diff_finds_changed_leaves(self):
+        rows = self._rows(500)
+        changed = list(rows)
+        tree = self._tree(rows)
+        # value changed in one leaf, row missing in another
+        changed[10] = (rows[10][0], rows[10][1] ^ 1)
+        del changed[20]
+        expected = sorted({tree.leaf(rows[10][0]), tree.leaf(rows[20][0])})
+        assert tree.diff(self._tree(changed)) == expected
+
+    def test_leaf_ranges_are_start_exclusive(self):
+        tree = RangeDigestTree(MURMUR3_RING, 2)
+        (_, end), (start, _) = tree.ranges[0], tree.ranges[1]
+        assert end == start
+        assert tree.leaf(end) == 0
+        assert tree.leaf(end + 1) == 1
+        assert tree.leaf(MURMUR3_RING[1]) == len(tree.ranges) - 1
+
+    def test_filled_in_token_order(self):
+        tree = RangeDigestTree(MURMUR3_RING, 2)
+        for token, row_hash in sorted(self._rows(100)):
+            i = tree.add(token, row_hash)
+            assert tree.filled == i
+        tree.complete()
+        assert tree.filled == 4
+
+
+class _CorruptedREST:
+    """
+    REST V1 client returning table rows with a value changed in some of them, counts requests of table rows
+    """
+
+    def __init__(self, rest_v1, corrupt):
+        self.rest_v1 = rest_v1
+        self.corrupt = corrupt
+        self.pages = 0
+
+    def url(self, resource, node=None):
+        return self.rest_v1.url(resource, node)
+
+    def get_table_rows(self, ks_name, table, page_size, page_state=None):
+        self.pages += 1
+        res = self.rest_v1.get_table_rows(ks_name, table, page_size, page_state)
+        if res.ok:
+            res.value['rows'] = [self.corrupt(row) for row in res.value['rows']]
+        return res
+
+
+class _LaggingCQLReconciler(DigestReconciler):
+    """
+    Reconciler whose CQL stream starts late and is slower than the REST one, records the most REST rows kept
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_kept = 0
+
+    def _cql_rows(self, ks, table, schema, start_token, end_token):
+        time.sleep(0.5)
+        for token, row in super()._cql_rows(ks, table, schema, start_token, end_token):
+            time.sleep(0.001)
+            yield token, row
+
+    def _drop_same(self, kept, dropped, rest_tree, cql_tree):
+        self.max_kept = max(self.max_kept, sum(len(rows) for rows in kept.values() if rows))
+        DigestReconciler._drop_same(kept, dropped, rest_tree, cql_tree)
+
+
+def _digest_table(stargate, cql_session):
+    return [(key, t) for key, t in sorted(stargate.database.tables.items())
+            if RowHasher(table_schema(cql_session, *key)).supports_rest_tokens()][0]
+
+
+class TestDigestReconciler:
+
+    def test_diverging_rows_compared_without_reading_rest_again(self):
+        with FakeStargate(seed=3, tables=2, rows_per_table=500) as stargate:
+            cql_session = stargate.cql_session()
+            (ks, table), fake_table = _digest_table(stargate, cql_session)
+            regular = [c.name for c in fake_table.metadata.columns.values()
+                       if c.name.startswith('col') and c.cql_type in ('int', 'bigint', 'text')][0]
+            changed = []
+
+            def corrupt(row):
+                if len(changed) < 3 and row[regular] is not None:
+                    changed.append(row)
+                    row = dict(row, **{regular: None})
+                return row
+
+            pages = len(list(rest_table_scan(stargate.rest_v1(), ks, table, 100)))
+            rest_v1 = _CorruptedREST(stargate.rest_v1(), corrupt)
+            reconciler = DigestReconciler(cql_session, rest_v1, depth=6, page_size=100)
+            mismatches = reconciler.reconcile_table(ks, table)
+        assert len(changed) == 3
+        assert len(mismatches) == 3
+        assert all(regular in m for m in mismatches)
+        assert 0 < reconciler.ranges_diverged <= 3
+        # single REST scan of the table
+        assert rest_v1.pages == pages
+
+    def test_rest_waits_for_lagging_cql(self):
+        with FakeStargate(seed=3, tables=2, rows_per_table=1000) as stargate:
+            cql_session = stargate.cql_session()
+            (ks, table), fake_table = _digest_table(stargate, cql_session)
+            reconciler = _LaggingCQLReconciler(cql_session, stargate.rest_v1(), depth=5, page_size=50)
+            reconciler.lead_leaves = 2
+            assert reconciler.reconcile_table(ks, table) == []
+        total = sum(len(p) for p in fake_table.partitions.values())
+        # REST rows of the lead ranges and the one being filled, out of 32 ranges
+        assert 0 < reconciler.max_kept <= total * 4 / 32 * 1.5
@@ -0,0 +1,37 @@
+import random
+
+from test.common.fake.stargate import FakeStargate
+from test.common.test.checks import cql_row_columns_to_rest_values
+from test.common.test.objects import sample_table_rows
+from test.common.test.schema_index import table_schema
+
+
+class TestRestV2BatchedLookups:
+
+    def test_batches_return_rows_of_every_key(self):
+        # tables with keys of float, double, decimal, time and inet columns among others
+        with FakeStargate(seed=5, tables=6, rows_per_table=200) as stargate:
+            cql_session = stargate.cql_session()
+            rest_v2 = stargate.rest_v2()
+            requests = []
+            get_rows = rest_v2.get_rows
+
+            def counted_get_rows(*args, **kwargs):
+                requests.append(args)
+                return get_rows(*args, **kwargs)
+
+            rest_v2.get_rows = counted_get_rows
+            for ks, table in sorted(stargate.database.tables):
+                schema = table_schema(cql_session, ks, table)
+                key_columns = list(schema.partition_key + schema.clustering_key)
+                rows = list(sample_table_rows(cql_session, ks, table, 20, random.Random(1)))
+                keys = [cql_row_columns_to_rest_values(schema, row, key_columns) for row in rows]
+                del requests[:]
+                results = rest_v2.rows_by_keys(ks, table, key_columns, keys, schema=schema)
+                assert all(res.ok for res in results)
+                # every row is found by its full key
+                assert [len(res.value) for res in results] == [1] * len(rows)
+                for row, res in zip(rows, results):
+                    assert schema.cql_key(row, key_columns) == schema.rest_key(res.value[0], key_columns)
+                # keys were looked up in batches, not one by one
+                assert len(requests) < len(keys)
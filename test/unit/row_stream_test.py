@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from test.common.rest.row_stream import RowStream
+
+ROWS = [
+    {'id': 1, 'name': 'żółw', 'value': 3.25, 'tags': ['a', 'b'], 'nested': {'x': [1, {'y': None}]}},
+    {'id': 12345678901234567890, 'name': '', 'value': -0.5e-3, 'tags': [], 'nested': {}},
+    {'id': -7, 'name': 'quote " and \\ backslash', 'value': 100, 'tags': ['日本'], 'nested': {'x': True}},
+]
+
+
+def _chunks(body, size):
+    data = body.encode('utf-8') if isinstance(body, str) else body
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _body(rows, **fields):
+    return json.dumps(dict(fields, rows=rows), ensure_ascii=False)
+
+
+class TestRowStream:
+
+    @pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 10 ** 6])
+    def test_rows_split_across_chunks(self, size):
+        stream = RowStream(_chunks(_body(ROWS, count=3), size))
+        assert list(stream) == ROWS
+        assert stream.fields == {'count': 3}
+        assert stream.size == len(_body(ROWS, count=3).encode('utf-8'))
+
+    @pytest.mark.parametrize('size', [1, 2, 5])
+    def test_numbers_at_chunk_ends(self, size):
+        # every number may be cut by a chunk boundary and continue in the next chunk
+        rows = [12345, -67890, 1.5e10, 0, 987654321]
+        assert list(RowStream(_chunks(json.dumps({'rows': rows}), size))) == rows
+        assert list(RowStream([b'{"rows":[1', b'23,4', b'56]}'])) == [123, 456]
+
+    def test_multibyte_characters_split_between_chunks(self):
+        body = _body([{'name': '日本語'}]).encode('utf-8')
+        cut = body.index('本'.encode('utf-8')) + 1
+        assert list(RowStream([body[:cut], body[cut:]])) == [{'name': '日本語'}]
+
+    def test_fields_before_and_after_rows(self):
+        body = '{"count": 2, "rows": [{"a": 1}, {"a": 2}], "pageState": "abc"}'
+        stream = RowStream(_chunks(body, 4))
+        assert next(stream) == {'a': 1}
+        # fields after the rows are known once iteration is over
+        assert stream.fields == {'count': 2}
+        assert list(stream) == [{'a': 2}]
+        assert stream.fields == {'count': 2, 'pageState': 'abc'}
+
+    def test_body_without_rows(self):
+        stream = RowStream([b' { "count" : 0 } '])
+        assert list(stream) == []
+        assert stream.fields == {'count': 0}
+
+    def test_count_and_on_close(self):
+        closed = []
+        stream = RowStream(_chunks(_body(ROWS, count=3), 5), on_close=closed.append)
+        next(stream)
+        assert stream.count() == 2
+        assert closed == [stream]
+        # called once
+        stream.close()
+        assert closed == [stream]
+
+    @pytest.mark.parametrize('body', ['', '{"rows": [{"a": 1}', '{"rows": [{"a": 1},', '{"rows": [{"a": 1}]'])
+    def test_truncated_body(self, body):
+        with pytest.raises(ValueError, match='unexpected end'):
+            list(RowStream(_chunks(body, 3)))
+
+    def test_truncated_row(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(RowStream(_chunks('{"rows": [{"a": 1}, {"a": ', 3)))
+
+    @pytest.mark.parametrize('body, expected', [
+        ('["rows"]', "expected '{'"),
+        ('{"rows": [{"a": 1} {"a": 2}]}', "expected ','"),
+        ('{"count" 1, "rows": []}', "expected ':'"),
+    ])
+    def test_unexpected_character(self, body, expected):
+        with pytest.raises(ValueError, match=expected):
+            list(RowStream(_chunks(body, 2)))
+
+    def test_invalid_json_value(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(RowStream([b'{"rows": [{"a": tru}]}']))
@@ -0,0 +1,53 @@
+import random
+
+from test.common.fake.fixtures import *
+from test.common.test.objects import TableRowSampler, sample_table_rows
+
+
+def _keys(fake_table, rows):
+    key = fake_table.partition_key + fake_table.clustering_key
+    return [tuple(str(row[c]) for c in key) for row in rows]
+
+
+class TestTableRowSampler:
+    """
+    Sampling of rows from random token sub-ranges, run against the offline stand-in
+    """
+
+    def test_seeds_reach_different_rows(self, offline_stargate):
+        cql_session = offline_stargate.cql_session()
+        for (ks, table), fake_table in offline_stargate.database.tables.items():
+            total = sum(len(p) for p in fake_table.partitions.values())
+            seen = set()
+            for seed in range(20):
+                rows = list(sample_table_rows(cql_session, ks, table, 50, random.Random(seed)))
+                assert len(rows) == min(50, total)
+                seen.update(_keys(fake_table, rows))
+            # fixed range starts would return the same 50 rows for every seed, tables with a few large
+            # partitions (keys of boolean or tinyint columns) are sampled from fewer distinct starts
+            assert len(seen) >= min(total, 250)
+
+    def test_same_seed_same_rows(self, offline_stargate):
+        cql_session = offline_stargate.cql_session()
+        (ks, table), fake_table = sorted(offline_stargate.database.tables.items())[0]
+        first = list(sample_table_rows(cql_session, ks, table, 50, random.Random(7)))
+        second = list(sample_table_rows(cql_session, ks, table, 50, random.Random(7)))
+        assert _keys(fake_table, first) == _keys(fake_table, second)
+
+    def test_continues_until_shards_are_read(self, offline_stargate):
+        """
+        Small consecutive samples of all shards return every row of the table exactly once,
+        also when a read stops inside a partition
+        """
+        cql_session = offline_stargate.cql_session()
+        for (ks, table), fake_table in offline_stargate.database.tables.items():
+            keys = []
+            for shard in range(3):
+                sampler = TableRowSampler(cql_session, ks, table, random.Random(shard), shard=shard, shards=3)
+                while True:
+                    rows = list(sampler.rows(7))
+                    if not rows:
+                        break
+                    keys.extend(_keys(fake_table, rows))
+            assert sampler.exhausted
+            assert len(keys) == len(set(keys)) == sum(len(p) for p in fake_table.partitions.values())
@@ -0,0 +1,119 @@
+from collections import namedtuple
+
+from test.common.fake.fixtures import *
+from test.common.rest.rest_v1_api import RESTApiV1
+from test.common.rest.token_provider import TokenProvider
+from test.common.test import scheduler as scheduler_module
+from test.common.test.objects import TableShard
+from test.common.test.scheduler import FuzzScheduler, ScheduleStats, scheduler_users
+from test.common.test.schema_index import table_schema
+
+Item = namedtuple('Item', ['nodeid', 'fixturenames'])
+
+
+class _RecordingRESTApiV1(RESTApiV1):
+    """
+    REST V1 client remembering keys it was asked for
+    """
+
+    def __init__(self, config, token):
+        super().__init__(config, token)
+        self.keys = []
+
+    def rows_by_keys(self, ks_name, table, key_columns, keys, **kwargs):
+        self.keys.extend(tuple(str(v) for v in key) for key in keys)
+        return super().rows_by_keys(ks_name, table, key_columns, keys, **kwargs)
+
+
+class _FullKeyScheduler(FuzzScheduler):
+    """
+    Every round looks rows up by the whole primary key, so keys of different rows differ
+    """
+
+    def choose_prefix(self, ks, table, mix, prefixes):
+        return prefixes[-1]
+
+
+class _RoundClock:
+    """
+    Stands in for the time module of scheduler, every round (between two perf_counter calls) takes `round_seconds`
+    """
+
+    def __init__(self, round_seconds):
+        self.now = 0.0
+        self.round_seconds = round_seconds
+        self._calls = 0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        self._calls += 1
+        if self._calls % 2 == 0:
+            self.now += self.round_seconds
+        return self.now
+
+
+class TestFuzzScheduler:
+
+    def test_rounds_continue_from_previous_round(self, offline_stargate):
+        cql_session = offline_stargate.cql_session()
+        config = offline_stargate.server.config()
+        rest_v1 = _RecordingRESTApiV1(config, TokenProvider(config, cache_path=''))
+        (ks, table), fake_table = sorted(offline_stargate.database.tables.items())[0]
+        total = sum(len(p) for p in fake_table.partitions.values())
+        shard = TableShard(ks, table, 0, 1)
+        # no budget: a single round per call
+        scheduler = _FullKeyScheduler(ScheduleStats(None), 0, [shard])
+        scheduler.round_keys = 100
+        schema = table_schema(cql_session, ks, table)
+        for _ in range(-(-total // scheduler.round_keys)):
+            assert not scheduler.fuzz_table(cql_session, rest_v1, shard, schema, seed=1)
+        # every row once, although every call starts with the same seed
+        assert len(rest_v1.keys) == total
+        assert len(set(rest_v1.keys)) == total
+        # whole table was read, next round starts again
+        scheduler.fuzz_table(cql_session, rest_v1, shard, schema, seed=1)
+        assert len(set(rest_v1.keys)) == total
+
+    def test_rounds_until_budget_spent(self, offline_stargate, monkeypatch):
+        cql_session = offline_stargate.cql_session()
+        rest_v1 = offline_stargate.rest_v1()
+        (ks, table), _ = sorted(offline_stargate.database.tables.items())[0]
+        shard = TableShard(ks, table, 0, 1)
+        stats = ScheduleStats(None)
+        scheduler = _FullKeyScheduler(stats, 10, [shard], users=2)
+        scheduler.round_keys = 10
+        monkeypatch.setattr(scheduler_module, 'time', _RoundClock(1.0))
+        assert not scheduler.fuzz_table(cql_session, rest_v1, shard, table_schema(cql_session, ks, table), seed=1)
+        # half of the budget of the table, a round per second
+        [cell] = stats.cells.values()
+        assert cell.keys == 5 * scheduler.round_keys
+        assert cell.seconds == pytest.approx(5.0)
+        assert cell.failures == 0
+
+    def test_budget_split_between_tables_and_tests(self):
+        shards = [TableShard('ks', 't{}'.format(i), 0, 1) for i in range(3)]
+        scheduler = FuzzScheduler(ScheduleStats(None), 60, shards, workers=2, users=2)
+        assert sum(scheduler.table_budget(s) for s in shards) == pytest.approx(120)
+        for shard in shards:
+            assert scheduler.test_budget(shard) == pytest.approx(scheduler.table_budget(shard) / 2)
+        assert sum(scheduler.test_budget(s) * scheduler.users for s in shards) == pytest.approx(120)
+
+    def test_budget_shares_follow_failures(self):
+        shards = [TableShard('ks', 't0', 0, 1), TableShard('ks', 't1', 0, 1)]
+        stats = ScheduleStats(None)
+        stats.record(('ks', 't0', 0, 'scalar'), 1000, 10.0, 50)
+        stats.record(('ks', 't1', 0, 'scalar'), 1000, 10.0, 0)
+        scheduler = FuzzScheduler(stats, 100, shards)
+        assert scheduler.table_budget(shards[0]) > scheduler.table_budget(shards[1])
+        # every table keeps at least MIN_SHARE of an even split
+        assert scheduler.table_budget(shards[1]) >= 100 * 0.1 / 2
+
+    def test_scheduler_users(self):
+        items = [Item('test/rest/v1/get_rows_test.py::TestRestV1Rows::test_get_rows_by_pk[ks.t0]', ['fuzz_scheduler']),
+                 Item('test/rest/v1/get_rows_test.py::TestRestV1Rows::test_get_rows_by_pk[ks.t1]', ['fuzz_scheduler']),
+                 Item('test/rest/v2/get_rows_test.py::TestRestV2Rows::test_get_rows_by_pk[ks.t0]', ['fuzz_scheduler']),
+                 Item('test/rest/v2/get_rows_test.py::TestRestV2Rows::test_v1_and_v2_agree[ks.t0]', ['rest_v1'])]
+        assert scheduler_users(items) == 2
+        assert scheduler_users([]) == 1
@@ -0,0 +1,101 @@
+import copy
+
+import pytest
+
+from test.common.cql.cql_tools import cql_keyspaces, cql_table_metadata
+from test.common.fake.stargate import FakeStargate
+from test.common.test.schema_crawl import SchemaCrawler, compare_table_definition
+
+KEYSPACE = 'fuzz'
+# two partition and two clustering key columns, no static ones
+TABLE = 'table2'
+
+
+@pytest.fixture(scope='module')
+def stargate():
+    with FakeStargate(seed=2, tables=6, rows_per_table=10) as stargate:
+        yield stargate
+
+
+@pytest.fixture
+def definition(stargate):
+    res = stargate.rest_v1().get_table(KEYSPACE, TABLE)
+    assert res.ok
+    return copy.deepcopy(res.value)
+
+
+def _compare(stargate, definition):
+    cql_session = stargate.cql_session()
+    metadata = cql_table_metadata(cql_session, KEYSPACE, TABLE)
+    return compare_table_definition(metadata, cql_keyspaces(cql_session)[KEYSPACE].user_types, definition)
+
+
+def _column(definition, name):
+    return [c for c in definition['columnDefinitions'] if c['name'] == name][0]
+
+
+class TestCompareTableDefinition:
+
+    def test_same_definitions(self, stargate, definition):
+        assert _compare(stargate, definition) == []
+
+    def test_column_type(self, stargate, definition):
+        column = [c for c in definition['columnDefinitions'] if c['typeDefinition'] != 'blob'][-1]
+        cql_type, column['typeDefinition'] = column['typeDefinition'], 'blob'
+        assert _compare(stargate, definition) == [
+            'fuzz.table2: types of column {n} differ, CQL: {t}, REST: blob'.format(n=column['name'], t=cql_type)]
+
+    def test_unparsable_column_type(self, stargate, definition):
+        column = definition['columnDefinitions'][-1]
+        column['typeDefinition'] = 'map<int'
+        [mismatch] = _compare(stargate, definition)
+        assert 'types of column {}'.format(column['name']) in mismatch
+
+    def test_missing_column(self, stargate, definition):
+        removed = definition['columnDefinitions'].pop()
+        [mismatch] = _compare(stargate, definition)
+        assert mismatch.startswith('fuzz.table2: columns differ')
+        assert removed['name'] in mismatch
+
+    def test_static_flag(self, stargate, definition):
+        _column(definition, 'col0')['static'] = True
+        assert _compare(stargate, definition) == [
+            'fuzz.table2: static flags of column col0 differ, CQL: False, REST: True']
+
+    def test_partition_key_order(self, stargate, definition):
+        definition['primaryKey']['partitionKey'].reverse()
+        assert _compare(stargate, definition) == [
+            "fuzz.table2: partition keys differ, CQL: ['pk0', 'pk1'], REST: ['pk1', 'pk0']"]
+
+    def test_clustering_key_order(self, stargate, definition):
+        definition['primaryKey']['clusteringKey'].reverse()
+        assert _compare(stargate, definition) == [
+            "fuzz.table2: clustering keys differ, CQL: ['ck0', 'ck1'], REST: ['ck1', 'ck0']"]
+
+    def test_clustering_order(self, stargate, definition):
+        definition['tableOptions']['clusteringExpression'][1]['order'] = 'Desc'
+        [mismatch] = _compare(stargate, definition)
+        assert mismatch.startswith('fuzz.table2: clustering orders differ')
+        assert "('ck1', 'DESC')" in mismatch
+
+    def test_default_ttl(self, stargate, definition):
+        definition['tableOptions']['defaultTimeToLive'] = 3600
+        assert _compare(stargate, definition) == ['fuzz.table2: default TTLs differ, CQL: 0, REST: 3600']
+
+    def test_empty_definition(self, stargate, definition):
+        mismatches = _compare(stargate, {'name': TABLE})
+        assert [m.split(' differ')[0] for m in mismatches] == [
+            'fuzz.table2: columns', 'fuzz.table2: partition keys', 'fuzz.table2: clustering keys',
+            'fuzz.table2: clustering orders']
+
+
+class TestSchemaCrawler:
+
+    def test_all_tables_agree(self, stargate):
+        tables = sorted(stargate.database.tables)
+        assert SchemaCrawler(stargate.cql_session(), stargate.rest_v1(), concurrency=4).compare_tables(tables) == []
+
+    def test_table_not_in_rest(self, stargate):
+        crawler = SchemaCrawler(stargate.cql_session(), stargate.rest_v1(), concurrency=4)
+        [mismatch] = crawler.compare_tables([(KEYSPACE, TABLE), (KEYSPACE, 'missing')])
+        assert 'missing' in mismatch
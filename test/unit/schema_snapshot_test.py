@@ -0,0 +1,57 @@
+import pytest
+
+from test.common.fake.stargate import FakeStargate
+from test.common.test import schema_index
+from test.common.test.schema_index import SchemaSnapshotPlugin, load_schema_snapshot, table_schema
+
+
+@pytest.fixture
+def stargate():
+    with FakeStargate(seed=1, tables=3, rows_per_table=0) as stargate:
+        yield stargate
+
+
+class TestSchemaSnapshot:
+
+    def test_saved_once_and_reused(self, stargate, tmp_path, monkeypatch):
+        path = str(tmp_path / 'schema.json')
+        monkeypatch.setenv('SCHEMA_SNAPSHOT', path)
+        cql_session = stargate.cql_session()
+        tables = sorted(stargate.database.tables)
+        for ks, table in tables:
+            table_schema(cql_session, ks, table)
+        # nothing is written while tables are indexed
+        assert not (tmp_path / 'schema.json').exists()
+
+        SchemaSnapshotPlugin.save([schema_index.snapshot_json()])
+        version, indexes = load_schema_snapshot(path)
+        assert version == str(stargate.database.schema_version)
+        assert sorted(indexes) == tables
+
+        # a new session of the same schema uses the snapshot instead of the metadata
+        cache = schema_index.SchemaIndexCache(stargate.cql_session(), path)
+        assert sorted((x.keyspace, x.table) for x in cache.indexes()) == tables
+
+    def test_ignored_after_schema_change(self, stargate, tmp_path, monkeypatch):
+        path = str(tmp_path / 'schema.json')
+        monkeypatch.setenv('SCHEMA_SNAPSHOT', path)
+        cql_session = stargate.cql_session()
+        ks, table = sorted(stargate.database.tables)[0]
+        table_schema(cql_session, ks, table)
+        SchemaSnapshotPlugin.save([schema_index.snapshot_json()])
+
+        stargate.database.add_keyspace(stargate.database.metadata.keyspaces[ks])
+        cache = schema_index.SchemaIndexCache(stargate.cql_session(), path)
+        assert cache.indexes() == []
+
+    def test_worker_snapshots_merged(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'schema.json')
+        monkeypatch.setenv('SCHEMA_SNAPSHOT', path)
+        with FakeStargate(seed=1, tables=2, rows_per_table=0) as stargate:
+            snapshots = []
+            for ks, table in sorted(stargate.database.tables):
+                cache = schema_index.SchemaIndexCache(stargate.cql_session(), path)
+                snapshots.append({'schema_version': cache.schema_version,
+                                  'tables': [cache.get(ks, table).to_json()]})
+            SchemaSnapshotPlugin.save(snapshots)
+            assert sorted(load_schema_snapshot(path)[1]) == sorted(stargate.database.tables)
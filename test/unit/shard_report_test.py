@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from test.common.perf import instrumentation
+from test.common.perf.instrumentation import StatsCollector
+from test.common.test.shard_report import ShardReport, merge_reports
+
+
+def _report(shard, shards=3, seed='1', started=100.0, finished=160.0, passed=5, failed=0, rows=1000):
+    collector = StatsCollector()
+    collector(instrumentation.REST, 'GET rows', 0.002, rows, 0, 200)
+    client = {'shard': shard, 'host': 'client{}'.format(shard), 'started': started, 'finished': finished,
+              'outcomes': {'passed': passed, 'failed': failed}}
+    mismatches = [{'shard': shard, 'test': 'test_{}_{}'.format(shard, i), 'message': 'differs'} for i in range(failed)]
+    return ShardReport(shards, seed, [client], mismatches, collector)
+
+
+def _save(report, tmp_path, name):
+    path = str(tmp_path / name)
+    report.save(path)
+    return path
+
+
+class TestShardReport:
+
+    def test_merge_reports_of_all_clients(self, tmp_path):
+        paths = [_save(_report(0, started=100.0, finished=150.0), tmp_path, 'r0.json'),
+                 _save(_report(1, started=110.0, finished=170.0, failed=2), tmp_path, 'r1.json'),
+                 _save(_report(2, started=105.0, finished=160.0, rows=500), tmp_path, 'r2.json')]
+        merged = merge_reports(paths)
+        assert merged.covered_shards() == [0, 1, 2]
+        assert merged.missing_shards() == []
+        assert merged.duplicate_shards() == []
+        # from the first start to the last end
+        assert merged.wall_clock() == pytest.approx(70.0)
+        assert merged.outcomes() == {'passed': 15, 'failed': 2}
+        assert [m['test'] for m in merged.to_json()['mismatches']] == ['test_1_0', 'test_1_1']
+        [(_, _, rate)] = merged.throughput()
+        assert rate == pytest.approx(2500 / 70.0)
+        [stats] = merged.collector.stats.values()
+        assert (stats.calls, stats.count, stats.histogram.count) == (3, 2500, 3)
+
+    def test_merged_report_merges_again(self, tmp_path):
+        first = merge_reports([_save(_report(0), tmp_path, 'r0.json'), _save(_report(1), tmp_path, 'r1.json')])
+        merged = merge_reports([_save(first, tmp_path, 'first.json'), _save(_report(2), tmp_path, 'r2.json')])
+        everything = merge_reports([str(tmp_path / 'r{}.json'.format(i)) for i in range(3)])
+        assert json.dumps(merged.to_json(), sort_keys=True) == json.dumps(everything.to_json(), sort_keys=True)
+
+    def test_missing_and_duplicate_shards(self):
+        report = _report(0, shards=4)
+        report.merge(_report(2, shards=4))
+        report.merge(_report(2, shards=4))
+        assert report.missing_shards() == [1, 3]
+        assert report.duplicate_shards() == [2]
+        lines = report.summary_lines()
+        assert 'missing shards: [1, 3]' in lines
+        assert 'shards reported more than once: [2]' in lines
+
+    @pytest.mark.parametrize('other', [_report(1, shards=4), _report(1, seed='2')])
+    def test_reports_of_different_runs(self, other):
+        with pytest.raises(ValueError, match='different runs'):
+            _report(0).merge(other)
+
+    def test_empty_report(self):
+        report = ShardReport(2, '1')
+        assert report.wall_clock() == 0.0
+        assert report.missing_shards() == [0, 1]
+        assert ShardReport.from_json(report.to_json()).to_json() == report.to_json()
@@ -0,0 +1,49 @@
+import json
+import random
+from collections import namedtuple
+
+import pytest
+
+from test.common.cql.cql_types import parse_cql_type
+from test.common.cql.random_schema import compile_value_generator
+from test.common.fake.rest_server import compile_rest_encoder
+from test.common.test.schema_index import ColumnSchema, TableSchemaIndex
+
+UserType = namedtuple('UserType', ['field_names', 'field_types'])
+
+USER_TYPES = {'point': UserType(['x', 'label'], ['int', 'text'])}
+
+KEY_TYPES = ['blob', 'decimal', 'inet', 'varint', 'tinyint', 'time', 'double', 'float', 'ascii',
+             'frozen<tuple<int, text>>', 'frozen<point>', 'frozen<set<uuid>>', 'frozen<list<blob>>',
+             'frozen<map<timestamp, text>>']
+
+
+def _schema(cql_type):
+    columns = [ColumnSchema('pk0', cql_type, parse_cql_type(cql_type, USER_TYPES), 'partition_key'),
+               ColumnSchema('ck0', 'int', parse_cql_type('int'), 'clustering')]
+    return TableSchemaIndex('ks', 't', columns, ['pk0'], ['ck0'])
+
+
+class TestScanJoinKeys:
+
+    @pytest.mark.parametrize('cql_type', KEY_TYPES)
+    def test_cql_and_rest_keys_match(self, cql_type):
+        schema = _schema(cql_type)
+        generate = compile_value_generator(parse_cql_type(cql_type, USER_TYPES))
+        encode = compile_rest_encoder(parse_cql_type(cql_type, USER_TYPES))
+        rng = random.Random(cql_type)
+        values, cql_keys = set(), set()
+        for ck in range(50):
+            cql_row = {'pk0': generate(rng), 'ck0': ck}
+            # as parsed from the REST response
+            rest_row = json.loads(json.dumps({'pk0': encode(cql_row['pk0']), 'ck0': ck}))
+            key = schema.cql_key(cql_row, ['pk0', 'ck0'])
+            assert key == schema.rest_key(rest_row, ['pk0', 'ck0'])
+            values.add(repr(cql_row['pk0']))
+            cql_keys.add(key[0])
+        # canonical form does not merge different keys
+        assert len(cql_keys) == len(values)
+
+    def test_missing_column_of_rest_row(self):
+        schema = _schema('blob')
+        assert schema.rest_key({'ck0': 1}, ['pk0', 'ck0']) != schema.cql_key({'pk0': b'', 'ck0': 1}, ['pk0', 'ck0'])
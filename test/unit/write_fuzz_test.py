@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from test.common.config import test_config
+from test.common.fake.stargate import FakeStargate
+from test.common.test.objects import TableRowSampler, select_fuzz_tables
+from test.common.test.schema_index import table_schema
+from test.common.test.write_fuzz import ShardKeys, WriteFuzzer
+
+
+@pytest.fixture
+def stargate():
+    with FakeStargate(seed=4, tables=3, rows_per_table=300) as stargate:
+        yield stargate
+
+
+def _keys(fake_table, rows):
+    return {tuple(str(row[c]) for c in fake_table.partition_key + fake_table.clustering_key) for row in rows}
+
+
+class TestShardKeys:
+
+    def test_single_client_writes_anywhere(self, stargate):
+        (ks, table), _ = sorted(stargate.database.tables.items())[0]
+        assert ShardKeys.of_client(stargate.cql_session(), ks, table) is None
+
+    def test_rows_written_where_other_clients_do_not_read(self, stargate, monkeypatch):
+        cql_session = stargate.cql_session()
+        monkeypatch.setattr(test_config.TestConfig, 'SHARD', '1/3')
+        (ks, table), fake_table = sorted(stargate.database.tables.items())[0]
+        shard_keys = ShardKeys.of_client(cql_session, ks, table)
+        # every third of TEST_SAMPLE_SPLITS token ranges
+        assert 0.25 < shard_keys.share < 0.4
+
+        fuzzer = WriteFuzzer(cql_session, stargate.rest_v1(), concurrency=4, update_fraction=0)
+        # same rows as fuzz_table writes with the seed
+        rows = fuzzer.random_rows(table_schema(cql_session, ks, table), fuzzer.row_generator(ks, table), 50,
+                                  random.Random(1), shard_keys)
+        assert len(rows) == 50
+        assert all(row in shard_keys for row in rows)
+        assert not fuzzer.fuzz_table(ks, table, 50, seed=1, shard_keys=shard_keys)
+        written = _keys(fake_table, rows)
+        stored = _keys(fake_table, [row for partition in fake_table.partitions.values() for row in partition.values()])
+        assert written <= stored
+
+        for client in (0, 2):
+            monkeypatch.setattr(test_config.TestConfig, 'SHARD', '{}/3'.format(client))
+            for table_shard in select_fuzz_tables(cql_session):
+                if (table_shard.keyspace, table_shard.table) != (ks, table):
+                    continue
+                sampler = TableRowSampler(cql_session, ks, table, random.Random(1), table_shard.shard,
+                                          table_shard.shards)
+                assert not written & _keys(fake_table, sampler.rows(10 ** 6))
@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip('xdist')
+
+from test.common.test.xdist_scheduling import TableScheduling
+
+
+class TestTableScheduling:
+
+    @pytest.mark.parametrize('nodeid, scope', [
+        ('test/rest/v1/get_rows_test.py::TestRestV1Rows::test_get_rows_by_pk[ks1.table4]', 'ks1.table4'),
+        ('test/rest/v1/delete_rows_test.py::TestRestV1Rows::test_delete_rows_by_pk[ks1.table4-1/4]', 'ks1.table4'),
+        ('test/rest/v1/write_rows_test.py::TestRestV1Writes::test_add_and_update_rows[ks1.table4]', 'ks1.table4'),
+        ('test/rest/v1/scan_rows_test.py::TestRestV1Scan::test_scan_table_rows[ks1.table4]', 'ks1.table4'),
+        ('test/rest/v1/keyspaces_test.py::TestRestV1Keyspaces::test_keyspaces_names',
+         'test/rest/v1/keyspaces_test.py::TestRestV1Keyspaces::test_keyspaces_names'),
+    ])
+    def test_tests_of_a_table_share_scope(self, nodeid, scope):
+        assert TableScheduling._split_scope(None, nodeid) == scope